@@ -0,0 +1,310 @@
+"""
+Backfill ISO-NE history into the archive from the web services day routes:
+
+    python -m app.backfill --datasets rt_final_lmp da_demand --start 2022-01-01 --end 2025-01-01
+
+Every (dataset, day[, location]) is one unit of work. Units are fetched concurrently
+on the async ingestion engine, so the configured limit for webservices.iso-ne.com
+bounds both concurrency and request rate. Each response is cached on disk before it
+is archived, and completed units are checkpointed to a manifest under
+<archive root>/_state. An interrupted run picks up where it stopped, and a rerun over
+a range that is already done makes no requests at all. Units whose response has no
+records yet (final prices publish days late) are not checkpointed, so later runs
+fetch them again.
+
+Archive files are named after their unit. Rewriting a unit that was archived but not
+yet checkpointed replaces its files rather than duplicating its rows.
+
+The backfilled types hold typed columns and no features, they are training targets:
+set training.target_type to lmp_rt_final (target_column lmp) or demand_da (target_column
+mw) to label archived feature rows with them.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+import pyarrow as pa
+
+from .config import Config, load_config
+from .data_integration.async_engine import AsyncIngestionEngine
+from .data_integration.clients.ne_iso_client import ISONEClient
+from .feature_vectorization.archive import compact_partition, write_partitioned
+from .logging_helper import setup_logging
+from .utils.atomic_json import write_json_atomically
+
+log = logging.getLogger(__name__)
+
+# Statuses worth retrying, anything else >= 400 fails the unit right away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BackfillDataset:
+    """One ISO-NE day route and how its records map onto archive rows."""
+
+    def __init__(self, name: str, msg_type: str, route: str, collection: str, item: str,
+                 columns: Callable[[List[dict]], Dict[str, Any]], per_location: bool = False):
+        self.name = name
+        self.msg_type = msg_type
+        self.route = route
+        self.collection = collection
+        self.item = item
+        self.columns = columns
+        self.per_location = per_location
+
+    def units(self, days: List[date], location_ids: List[str]) -> List[Tuple[str, str]]:
+        """(unit key, route) for every day, and every location for per-location routes."""
+        if not self.per_location:
+            return [(f"{day:%Y%m%d}", self.route.format(day=f"{day:%Y%m%d}")) for day in days]
+        return [
+            (f"{day:%Y%m%d}-{location_id}", self.route.format(day=f"{day:%Y%m%d}", location=location_id))
+            for day in days for location_id in location_ids
+        ]
+
+    def has_records(self, payload: Optional[dict]) -> bool:
+        return bool(ISONEClient.response_entries(payload, self.collection, self.item))
+
+    def to_table(self, payload: Optional[dict]) -> Optional[pa.Table]:
+        columns = self.columns(ISONEClient.response_entries(payload, self.collection, self.item))
+        if not columns:
+            return None
+        columns["event_time"] = columns.pop("interval_start")
+        columns["location_id"] = columns["location_id"].astype(str)
+        return pa.table({"event_time": columns.pop("event_time"), **columns})
+
+
+DATASETS = {
+    dataset.name: dataset for dataset in (
+        BackfillDataset(
+            name="rt_final_lmp",
+            msg_type="lmp_rt_final",
+            route="/hourlylmp/rt/final/day/{day}",
+            collection="HourlyLmps",
+            item="HourlyLmp",
+            columns=ISONEClient.lmp_columns,
+        ),
+        BackfillDataset(
+            name="da_demand",
+            msg_type="demand_da",
+            route="/dayaheadhourlydemand/day/{day}/location/{location}",
+            collection="HourlyDaDemands",
+            item="HourlyDaDemand",
+            columns=ISONEClient.demand_columns,
+            per_location=True,
+        ),
+    )
+}
+
+
+class BackfillManifest:
+    """The set of completed unit keys of one dataset, persisted as JSON with atomic replaces."""
+
+    def __init__(self, path: str, checkpoint_interval_sec: float = 5):
+        self.path = path
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+        self.completed: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.completed = set(json.load(f)["completed"])
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def mark_done(self, key: str):
+        self.completed.add(key)
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.checkpoint_interval_sec:
+            self.save()
+
+    def save(self):
+        if not self._dirty:
+            return
+        write_json_atomically(self.path, {"completed": sorted(self.completed)})
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+
+class ResponseCache:
+    """Raw day responses as <root>/<dataset>/<unit key>.json.gz."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, dataset: str, key: str) -> str:
+        return os.path.join(self.root, dataset, f"{key}.json.gz")
+
+    def get(self, dataset: str, key: str) -> Tuple[bool, Optional[dict]]:
+        path = self.path(dataset, key)
+        if not os.path.exists(path):
+            return False, None
+        with gzip.open(path, "rt") as f:
+            return True, json.load(f)
+
+    def put(self, dataset: str, key: str, payload: Optional[dict]):
+        path = self.path(dataset, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}")
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+
+class Backfill:
+
+    def __init__(self, config: Config, cache_path: Optional[str] = None, concurrency: Optional[int] = None):
+        self.config = config
+        self.archive_root = config.training.training_data_volume_path
+        self.state_dir = os.path.join(self.archive_root, "_state")
+        self.cache = ResponseCache(cache_path or config.backfill.cache_path)
+        self.client = ISONEClient(
+            os.environ.get("ISO_NE_API_USERNAME"),
+            os.environ.get("ISO_NE_API_PASSWORD"),
+            base_url=config.data_ingestion.iso_ne_base_url,
+        )
+        host = urlsplit(self.client.base_url).hostname
+        host_limit = config.data_ingestion.host_limits.get(host, config.data_ingestion.default_host_limit)
+        # More workers than the host allows in flight would only queue on its semaphore
+        self.concurrency = concurrency or host_limit.max_concurrency
+
+    def manifest(self, dataset: BackfillDataset) -> BackfillManifest:
+        return BackfillManifest(
+            os.path.join(self.state_dir, f"backfill_{dataset.name}.json"),
+            self.config.backfill.checkpoint_interval_sec,
+        )
+
+    def run(self, dataset: BackfillDataset, days: List[date], compact: bool = True) -> Dict[str, Any]:
+        manifest = self.manifest(dataset)
+        units = [unit for unit in dataset.units(days, self.config.backfill.demand_location_ids)
+                 if unit[0] not in manifest.completed]
+        stats = {"dataset": dataset.name, "units": len(units), "fetched": 0, "cached": 0, "rows": 0, "empty": 0,
+                 "failed": 0}
+        log.info(f"Backfilling {len(units)} {dataset.name} units ({len(manifest.completed)} already done) "
+                 f"with {self.concurrency} concurrent requests")
+        if not units:
+            return stats
+
+        touched = set()
+        engine = AsyncIngestionEngine(self.config.data_ingestion)
+        engine.start()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_units(engine, dataset, units, manifest, stats, touched), engine.loop
+        )
+        try:
+            future.result()
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            engine.stop()
+            manifest.save()
+
+        if compact:
+            # One file per hour instead of one per unit and hour
+            for directory in sorted(touched):
+                compact_partition(directory, self.config.archive.compression, self.config.archive.row_group_size)
+        log.info(f"Backfilled {dataset.name}: {stats}")
+        return stats
+
+    async def _run_units(self, engine: AsyncIngestionEngine, dataset: BackfillDataset, units: List[Tuple[str, str]],
+                         manifest: BackfillManifest, stats: Dict[str, Any], touched: Set[str]):
+        pending = asyncio.Queue()
+        for unit in units:
+            pending.put_nowait(unit)
+        await asyncio.gather(*(
+            self._worker(engine, dataset, pending, manifest, stats, touched) for _ in range(self.concurrency)
+        ))
+
+    async def _worker(self, engine: AsyncIngestionEngine, dataset: BackfillDataset, pending: asyncio.Queue,
+                      manifest: BackfillManifest, stats: Dict[str, Any], touched: Set[str]):
+        while not pending.empty():
+            key, route = pending.get_nowait()
+            try:
+                hit, payload = await engine.run_blocking(self.cache.get, dataset.name, key)
+                if hit and dataset.has_records(payload):
+                    stats["cached"] += 1
+                else:
+                    payload = await self._fetch(engine, f"{self.client.base_url}{route}")
+                    stats["fetched"] += 1
+                    if not dataset.has_records(payload):
+                        # e.g. final LMPs of the last few days, which publish late. Neither cached nor
+                        # checkpointed, so the next run asks again.
+                        stats["empty"] += 1
+                        log.info(f"No {dataset.name} records for {key} yet, it will be fetched again on the next run")
+                        continue
+                    await engine.run_blocking(self.cache.put, dataset.name, key, payload)
+                rows, written = await engine.run_blocking(self._archive, dataset, key, payload)
+                stats["rows"] += rows
+                touched.update(os.path.dirname(path) for path in written)
+                manifest.mark_done(key)
+            except Exception as e:
+                stats["failed"] += 1
+                log.error(f"Backfill of {dataset.name} {key} failed, it will be retried on the next run: {e}")
+
+    async def _fetch(self, engine: AsyncIngestionEngine, url: str) -> Optional[dict]:
+        backfill_config = self.config.backfill
+        for attempt in range(backfill_config.max_retries + 1):
+            try:
+                status, payload = await engine.get(
+                    url, headers=self.client.headers, auth=self.client.auth, conditional=False
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, payload = None, None
+                log.warning(f"Request to {url} failed: {e!r}")
+            if status is not None and status < 400:
+                return payload
+            if status is not None and status not in RETRY_STATUSES:
+                raise RuntimeError(f"HTTP {status} from {url}")
+            if attempt < backfill_config.max_retries:
+                await asyncio.sleep(backfill_config.retry_backoff_sec * 2 ** attempt)
+        raise RuntimeError(f"Giving up on {url} after {backfill_config.max_retries + 1} attempts")
+
+    def _archive(self, dataset: BackfillDataset, key: str, payload: Optional[dict]) -> Tuple[int, List[str]]:
+        table = dataset.to_table(payload)
+        if table is None:
+            return 0, []
+        written = write_partitioned(
+            table,
+            self.archive_root,
+            dataset.msg_type,
+            f"backfill-{dataset.name}-{key}.parquet",
+            self.config.archive.compression,
+            self.config.archive.row_group_size,
+        )
+        return table.num_rows, written
+
+
+def day_range(start: date, end: date) -> List[date]:
+    """Days from start up to, not including, end."""
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--start", required=True, help="First market day to backfill, YYYY-MM-DD")
+    parser.add_argument("--end", help="Backfill up to, not including, this day (default: today)")
+    parser.add_argument("--cache-dir", help="Raw response cache, backfill.cache_path if unset")
+    parser.add_argument("--concurrency", type=int, help="Concurrent requests, the ISO-NE host limit if unset")
+    parser.add_argument("--no-compact", action="store_true", help="Leave one archive file per unit and hour")
+    return parser.parse_args()
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    config = load_config()
+    start = date.fromisoformat(args.start)
+    end = date.fromisoformat(args.end) if args.end else datetime.now().date()
+    backfill = Backfill(config, cache_path=args.cache_dir, concurrency=args.concurrency)
+    for name in args.datasets:
+        backfill.run(DATASETS[name], day_range(start, end), compact=not args.no_compact)
+
+
+if __name__ == "__main__":
+    main()
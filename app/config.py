@@ -6,6 +6,7 @@ import yaml
 import os
 import logging
 from pathlib import Path
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 
@@ -19,7 +20,11 @@ dot_env = load_dotenv()
 class GeneralConfig(BaseModel):
     max_disk: str = Field(default="5g", description="Max disk usage, e.g. '10g', '500m'")
     max_ram: str = Field(default="1g", description="Max RAM usage, e.g. '2g', '512m'")
-    iso: str = Field(default=["ISO_NE"])
+    iso: str = Field(default="ISO_NE")
+    # Pricing node reference CSV, defaults to the one bundled for the ISO
+    nodes_path: Optional[str] = Field(default=None)
+    # Futures contracts after the front month on the natural gas curve
+    natural_gas_future_horizon_months: int = Field(default=6)
 
     # Parse the raw strings into bytes (humanfriendly.parse_size returns bytes)
     @property
@@ -31,15 +36,170 @@ class GeneralConfig(BaseModel):
         return humanfriendly.parse_size(self.max_ram)
 
 
+class HostLimitConfig(BaseModel):
+    requests_per_second: float = Field(default=10.0)
+    burst: float = Field(default=20.0)
+    max_concurrency: int = Field(default=50)
+
+
+class EIARouteConfig(BaseModel):
+    # natural-gas/{route1}/{route2}
+    route1: str
+    route2: str
+    frequency: str = Field(default="daily")
+
+
 class DataIngestionConfig(BaseModel):
     enable_weather_data: bool = True
+    enable_natural_gas_data: bool = True
+    enable_eia_data: bool = True
     eia_api_key: str = Field(default=os.environ.get("EIA_API_KEY"))
+    nws_points_cache_path: str = Field(default="/data/cache/nws_points.json")
+    # e.g. '7d', '12h'
+    nws_points_cache_ttl: str = Field(default="7d")
+    weather_poll_interval_sec: float = Field(default=10)
+    # Five-minute LMPs publish every 5 minutes, polling more often only shortens the lag
+    lmp_poll_interval_sec: float = Field(default=60)
+    natural_gas_poll_interval_sec: float = Field(default=60)
+    noaa_base_url: str = Field(default="https://api.weather.gov")
+    eia_poll_interval_sec: float = Field(default=3600)
+    eia_routes: List[EIARouteConfig] = Field(default_factory=lambda: [
+        EIARouteConfig(route1="pri", route2="fut", frequency="daily"),
+        EIARouteConfig(route1="stor", route2="wkly", frequency="weekly"),
+    ])
+    # How far back the first poll of a route without a watermark reaches
+    eia_initial_lookback_days: int = Field(default=30)
+    eia_page_size: int = Field(default=5000)
+    iso_ne_base_url: str = Field(default="https://webservices.iso-ne.com/api/v1.1")
+    # Archive raw source payloads (NWS forecasts as "weather_raw") from the ingestion process
+    archive_raw_payloads: bool = Field(default=True)
+
+    # Polling scheduler, polls start up to poll_jitter_sec late so sources aren't hit in lockstep
+    poll_jitter_sec: float = Field(default=1.0)
+    # Follow each source's observed update cadence instead of polling at the fixed intervals above
+    adaptive_polling: bool = Field(default=True)
+    min_poll_interval_sec: float = Field(default=1.0)
+    max_poll_interval_sec: float = Field(default=3600)
+
+    # Async ingestion engine limits
+    max_in_flight_requests: int = Field(default=1000)
+    request_timeout_sec: float = Field(default=30.0)
+    default_host_limit: HostLimitConfig = HostLimitConfig()
+    host_limits: Dict[str, HostLimitConfig] = Field(default_factory=lambda: {
+        "api.weather.gov": HostLimitConfig(requests_per_second=15, burst=30, max_concurrency=100),
+        "webservices.iso-ne.com": HostLimitConfig(requests_per_second=5, burst=10, max_concurrency=8),
+    })
+
+    @property
+    def nws_points_cache_ttl_seconds(self) -> int:
+        parsed = pytimeparse.parse(self.nws_points_cache_ttl)
+        if parsed is None:
+            raise ValueError(f"Invalid time interval string '{self.nws_points_cache_ttl}'")
+        return parsed
+
+
+class FeatureStoreConfig(BaseModel):
+    # Upper bounds on a single vectorization batch: whichever is hit first closes it
+    batch_max_size: int = Field(default=2048)
+    batch_max_latency_ms: int = Field(default=250)
+    # Vectorization processes, each owning a consistent-hash shard of the locations
+    shards: int = Field(default=1)
+    # Points per shard on the hash ring, more even out the share of locations per shard
+    virtual_nodes: int = Field(default=64)
+
+    @property
+    def batch_max_latency_sec(self) -> float:
+        return self.batch_max_latency_ms / 1000
+
+
+class ChannelConfig(BaseModel):
+    maxsize: int = Field(default=10_000)
+    # block | drop_oldest | coalesce, see utils.channel.BoundedChannel
+    policy: str = Field(default="block")
+    # Message fields identifying an update for the coalesce policy
+    key_fields: List[str] = Field(default_factory=list)
+    # Messages with one of priority_values in priority_field skip ahead of everything else
+    priority_field: str = Field(default="type")
+    priority_values: List[str] = Field(default_factory=list)
+
+
+class ChannelsConfig(BaseModel):
+    # Ingestion -> feature store, one per feature store shard. Raw messages are all archived, so
+    # producers wait rather than lose them
+    data: ChannelConfig = ChannelConfig(maxsize=10_000, policy="block", priority_values=["lmp"])
+    # Feature store -> inference. Only the latest handle per (location, horizon) matters. shard keeps
+    # the handles of an LMP interval split across shards, which all have location_id None, apart
+    inference: ChannelConfig = ChannelConfig(
+        maxsize=50_000, policy="coalesce", key_fields=["location_id", "horizon", "shard"],
+        priority_field="msg_type", priority_values=["lmp"],
+    )
+
+
+class InferenceConfig(BaseModel):
+    batch_max_size: int = Field(default=4096)
+    batch_max_latency_ms: int = Field(default=250)
+    # A (location, horizon) is not re-scored more often than this, keyed by Horizon value
+    min_refresh_seconds: Dict[str, float] = Field(default_factory=lambda: {
+        "FIVE_MINUTE": 60,
+        "ONE_HOUR": 300,
+        "ONE_DAY": 1800,
+    })
+    # How often the model registry is checked for newly published versions
+    model_poll_interval_sec: float = Field(default=30)
+    # Locations scored by a newly loaded model before it may replace the live one
+    canary_size: int = Field(default=64)
+
+    @property
+    def batch_max_latency_sec(self) -> float:
+        return self.batch_max_latency_ms / 1000
+
+
+class ArchiveConfig(BaseModel):
+    row_group_size: int = Field(default=50_000)
+    flush_interval_sec: float = Field(default=60)
+    compression: str = Field(default="zstd")
+    compaction_interval_sec: float = Field(default=3600)
+    # Hour partitions are compacted once they closed at least this long ago
+    compaction_grace_sec: float = Field(default=900)
+
+
+class RetentionConfig(BaseModel):
+    check_interval_sec: float = Field(default=300)
+    # Start downsampling above high_watermark * max_disk, stop below low_watermark * max_disk
+    high_watermark: float = Field(default=0.9)
+    low_watermark: float = Field(default=0.8)
+    # Partitions younger than this always keep full resolution
+    full_resolution_days: float = Field(default=7)
+    # Partitions older than this are rolled up to daily aggregates
+    hourly_resolution_days: float = Field(default=90)
+    io_throttle_bytes_per_sec: str = Field(default="20m", description="Max rewrite I/O, e.g. '20m'")
+
+    @property
+    def io_throttle_bytes_per_sec_value(self) -> int:
+        return humanfriendly.parse_size(self.io_throttle_bytes_per_sec)
 
 
 class TrainingConfig(BaseModel):
     # e.g. '6h', '30m'
     training_interval: str = Field(default="6h")
     training_data_volume_path: str = Field(default="/data/training")
+    # Share of general.max_ram the dataset builder may hold in memory at once
+    dataset_memory_fraction: float = Field(default=0.25)
+    # Archived type and column the realized targets are read from. Set lmp_rt_final to train
+    # against the final hourly LMPs app.backfill archives (with target_tolerance_sec >= 3600)
+    target_type: str = Field(default="lmp")
+    target_column: str = Field(default="lmp")
+    # How far a realized target may lag the exact horizon time and still count
+    target_tolerance_sec: float = Field(default=600)
+    # How far back to look for the latest snapshot of secondary feature types
+    feature_lookback_sec: float = Field(default=6 * 3600)
+    model_path: str = Field(default="/data/models")
+    # Published model versions kept per horizon, the live one is never removed
+    keep_model_versions: int = Field(default=3)
+    batch_size: int = Field(default=4096)
+    l2_penalty: float = Field(default=1.0)
+    # Weight kept by everything learned before a retrain cycle, < 1 to follow drift
+    forgetting_factor: float = Field(default=0.98)
 
     @property
     def training_interval_seconds(self) -> int:
@@ -50,10 +210,34 @@ class TrainingConfig(BaseModel):
         return parsed
 
 
+class BackfillConfig(BaseModel):
+    # Raw day responses, a rerun over a cached range makes no requests
+    cache_path: str = Field(default="/data/cache/isone_backfill")
+    # Load zones whose day-ahead demand is backfilled, the demand routes are per location
+    demand_location_ids: List[str] = Field(default_factory=lambda: [str(loc) for loc in range(4001, 4009)])
+    max_retries: int = Field(default=3)
+    retry_backoff_sec: float = Field(default=2)
+    # Completed days are written to the manifest at most this often
+    checkpoint_interval_sec: float = Field(default=5)
+
+
+class ObservabilityConfig(BaseModel):
+    metrics_enabled: bool = Field(default=True)
+    # Main process serves metrics here, the others on the following ports
+    metrics_base_port: int = Field(default=8000)
+
+
 class Config(BaseModel):
     general: GeneralConfig = GeneralConfig()
     data_ingestion: DataIngestionConfig = DataIngestionConfig()
+    feature_store: FeatureStoreConfig = FeatureStoreConfig()
+    inference: InferenceConfig = InferenceConfig()
+    channels: ChannelsConfig = ChannelsConfig()
+    archive: ArchiveConfig = ArchiveConfig()
+    retention: RetentionConfig = RetentionConfig()
     training: TrainingConfig = TrainingConfig()
+    backfill: BackfillConfig = BackfillConfig()
+    observability: ObservabilityConfig = ObservabilityConfig()
 
 def load_config(config_path: str = default_config_path) -> Config:
     """
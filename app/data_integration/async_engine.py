@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from ..config import DataIngestionConfig, HostLimitConfig
+from ..observability.metrics import SOURCE_POLL_DURATION, SOURCE_POLL_INTERVAL, SOURCE_POLLS_SKIPPED
+from ..utils.token_bucket import TokenBucket
+from .http_session import NOT_MODIFIED, ConditionalValidators
+from .polling_thread import BasePollingThread
+from .scheduling import AdaptiveSchedule
+
+log = logging.getLogger(__name__)
+
+
+class HostLimiter:
+    """Bounded concurrency plus a request-rate token bucket for a single upstream host."""
+
+    def __init__(self, limit: HostLimitConfig):
+        self.bucket = TokenBucket(rate=limit.requests_per_second, capacity=limit.burst)
+        self.semaphore = asyncio.Semaphore(limit.max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self.semaphore:
+            await self.bucket.acquire()
+            yield
+
+
+class AsyncIngestionEngine:
+    """
+    A single asyncio event loop, run on its own thread inside IngestionProcess,
+    that all polling tasks share.
+
+    - HTTP goes through one aiohttp session, capped at max_in_flight_requests
+      overall and by a HostLimiter (token bucket + semaphore) per upstream host.
+    - Polling tasks are jobs of one AsyncIOScheduler on the same loop: tasks
+      implementing native async I/O override BasePollingThread.poll_action_async,
+      everything else has its blocking poll_action run on the loop's default executor.
+      Triggers are fixed-rate, so poll duration doesn't add to the period, and a
+      poll still running when its next run is due is skipped rather than stacked.
+      With adaptive_polling each task's interval follows the update cadence its
+      polls observe (see AdaptiveSchedule).
+    """
+
+    def __init__(self, config: DataIngestionConfig):
+        self.config = config
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.validators = ConditionalValidators()
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._limiters: Dict[str, HostLimiter] = {}
+        self.scheduler: Optional[AsyncIOScheduler] = None
+        self._tasks: Dict[str, BasePollingThread] = {}
+        # Task name -> (interval, first run) of its current trigger
+        self._timings: Dict[str, Tuple[float, Optional[float]]] = {}
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="AsyncIngestionEngine", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        log.info(f"Async ingestion engine started (max in-flight requests: {self.config.max_in_flight_requests})")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _open(self):
+        self.scheduler = AsyncIOScheduler(
+            event_loop=self.loop,
+            timezone=timezone.utc,
+            # Runs missed while a poll was slow collapse into one, however late
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": None},
+        )
+        self.scheduler.add_listener(self._on_poll_skipped, EVENT_JOB_MAX_INSTANCES)
+        self.scheduler.start()
+        connector = aiohttp.TCPConnector(
+            limit=self.config.max_in_flight_requests,
+            limit_per_host=0,
+            ttl_dns_cache=300,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.config.request_timeout_sec),
+        )
+
+    def _limiter(self, host: str) -> HostLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limit = self.config.host_limits.get(host, self.config.default_host_limit)
+            limiter = HostLimiter(limit)
+            self._limiters[host] = limiter
+        return limiter
+
+    async def get(self, url: str, headers: Optional[dict] = None, auth: Optional[Tuple[str, str]] = None,
+                  conditional: bool = True) -> Tuple[int, Optional[Any]]:
+        """
+        Rate limited GET returning (status, parsed JSON body). The body is None for
+        a 304 (unchanged since the last 200 for url) or any error status.
+        """
+        request_headers = dict(headers or {})
+        if conditional:
+            request_headers.update(self.validators.request_headers(url))
+
+        async with self._limiter(urlsplit(url).hostname).slot():
+            async with self._session.get(
+                url,
+                headers=request_headers,
+                auth=aiohttp.BasicAuth(*auth) if auth else None,
+            ) as response:
+                if response.status == NOT_MODIFIED or response.status >= 400:
+                    return response.status, None
+                body = await response.json(content_type=None)
+                if conditional:
+                    self.validators.update(url, response.headers)
+                return response.status, body
+
+    def forget(self, url: str):
+        self.validators.forget(url)
+
+    async def run_blocking(self, fn, *args):
+        return await self.loop.run_in_executor(None, fn, *args)
+
+    def _trigger(self, interval_sec: float, start: Optional[float] = None) -> IntervalTrigger:
+        return IntervalTrigger(
+            seconds=interval_sec,
+            start_date=datetime.fromtimestamp(start, tz=timezone.utc) if start is not None else None,
+            jitter=self.config.poll_jitter_sec or None,
+            timezone=timezone.utc,
+        )
+
+    def add_polling_task(self, task: BasePollingThread):
+        """Poll task now and then every task.interval_sec (or its adaptive interval) on the engine loop."""
+        if self.config.adaptive_polling and task.schedule is None:
+            task.schedule = AdaptiveSchedule(
+                task.interval_sec,
+                self.config.min_poll_interval_sec,
+                self.config.max_poll_interval_sec,
+                aligned=task.ALIGN_TO_UPDATES,
+            )
+        self._tasks[task.name] = task
+        self._timings[task.name] = (task.interval_sec, None)
+        SOURCE_POLL_INTERVAL.labels(task.SOURCE).set(task.interval_sec)
+        self.scheduler.add_job(
+            self._poll,
+            self._trigger(task.interval_sec),
+            args=[task],
+            id=task.name,
+            name=task.name,
+            next_run_time=datetime.now(timezone.utc),
+        )
+
+    async def _poll(self, task: BasePollingThread):
+        try:
+            with SOURCE_POLL_DURATION.labels(task.SOURCE).time():
+                await task.poll_action_async(self)
+        except asyncio.CancelledError:
+            # Shutting down mid-poll
+            return
+        except Exception as e:
+            log.error(f"Polling task {task.name} failed: {e}", exc_info=True)
+        if task.schedule is not None:
+            self._retime(task)
+
+    def _on_poll_skipped(self, event):
+        task = self._tasks[event.job_id]
+        SOURCE_POLLS_SKIPPED.labels(task.SOURCE).inc()
+        log.debug(f"Skipped a poll of {task.name}, the previous one is still running")
+
+    def _retime(self, task: BasePollingThread):
+        timing = task.schedule.next_poll(time.time())
+        if timing == self._timings.get(task.name):
+            return
+        self._timings[task.name] = timing
+        interval, start = timing
+        self.scheduler.reschedule_job(task.name, trigger=self._trigger(interval, start))
+        SOURCE_POLL_INTERVAL.labels(task.SOURCE).set(interval)
+        log.debug(f"Polling {task.name} every {interval:.1f}s"
+                  + (f" from {datetime.fromtimestamp(start, tz=timezone.utc):%H:%M:%S}" if start else ""))
+
+    def stop(self):
+        if self.loop is None:
+            return
+
+        async def _close():
+            # Also cancels polls still in flight
+            self.scheduler.shutdown(wait=False)
+            await self._session.close()
+
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        log.info("Async ingestion engine stopped")
@@ -1,23 +1,63 @@
-from eia_client import ApiClient, Configuration, DataParams
-from eia_client.api.ng_api import NGApi
+import json
 import os
 import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from app.config import Config
+try:
+    # Generated by generate_eia_client.sh
+    from eia_client import ApiClient, Configuration, DataParams, Sort
+    from eia_client.api.ng_api import NGApi
+except ImportError:
+    ApiClient = None
+
+from app.config import Config, EIARouteConfig
+from app.messages import encode_message
+from app.observability.metrics import SOURCE_REQUESTS
+from app.utils.atomic_json import write_json_atomically
 from ..polling_thread import BasePollingThread
 
 log = logging.getLogger(__name__)
 
+# Most rows the EIA API returns per request
+MAX_PAGE_SIZE = 5000
+# start/end parameter format by route frequency
+PERIOD_FORMATS = {"daily": "%Y-%m-%d", "weekly": "%Y-%m-%d", "monthly": "%Y-%m", "annual": "%Y"}
+# Length of a period by route frequency, in days (upper bound)
+PERIOD_DAYS = {"daily": 1, "weekly": 7, "monthly": 31, "annual": 366}
+# A series this many periods behind the newest of its route has stopped publishing
+STALE_PERIODS = 3
+
+
+def route_key(route: EIARouteConfig) -> str:
+    return f"natural-gas/{route.route1}/{route.route2}"
+
+
 class EIAClient:
+    """
+    Incremental natural gas data fetcher. The last period seen for every series
+    of every route is kept as a watermark (persisted to watermark_path when set),
+    and each fetch asks only for periods from the oldest watermark of the route on.
+    """
+    SOURCE = "eia"
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, watermark_path: Optional[str] = None, page_size: int = MAX_PAGE_SIZE,
+                 initial_lookback_days: int = 30):
+        if ApiClient is None:
+            raise RuntimeError("eia_client is not installed, run generate_eia_client.sh")
         api_client_config = Configuration(api_key={"api_key":api_key})
         self.api_client = ApiClient(configuration=api_client_config)
         self.ng_api_client: NGApi = NGApi(api_client=self.api_client)
         self.executor = ThreadPoolExecutor(max_workers=10)
         self._shutdown = False
+        self.watermark_path = watermark_path
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.initial_lookback_days = initial_lookback_days
+        # route key -> series -> last observed period
+        self.watermarks: Dict[str, Dict[str, str]] = self.load_watermarks()
 
     def shutdown_executor(self, wait=True):
         if not self._shutdown:
@@ -25,32 +65,158 @@ class EIAClient:
             self.executor.shutdown(wait=wait)
             self._shutdown = True
 
-    def get_natural_gas_prices(self):
-        # Start and end date
-        response = self.ng_api_client.v2_natural_gas_route1_route2_data_post(
-            route1="pri",
-            route2="fut",
-            data_params=DataParams(
-                start="2025-04-01",
-                end="2025-04-15",
-                frequency="daily",
-                data=['value']
+    def load_watermarks(self) -> Dict[str, Dict[str, str]]:
+        if not self.watermark_path or not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path, "r") as f:
+            return json.load(f)
+
+    def save_watermarks(self):
+        if not self.watermark_path:
+            return
+        write_json_atomically(self.watermark_path, self.watermarks)
+
+    def _start_period(self, route: EIARouteConfig) -> str:
+        """
+        The oldest watermark of the route's live series. Series more than STALE_PERIODS
+        behind the newest are left out, and the start never goes further back than the
+        initial lookback (or STALE_PERIODS periods, if longer).
+        """
+        period_format = PERIOD_FORMATS.get(route.frequency, "%Y-%m-%d")
+        period_days = PERIOD_DAYS.get(route.frequency, 1)
+        now = datetime.now(timezone.utc)
+        series_watermarks = self.watermarks.get(route_key(route))
+        if not series_watermarks:
+            return (now - timedelta(days=self.initial_lookback_days)).strftime(period_format)
+
+        # Periods of one format order like their strings
+        newest = datetime.strptime(max(series_watermarks.values()), period_format)
+        stale_before = (newest - timedelta(days=STALE_PERIODS * period_days)).strftime(period_format)
+        earliest = (now - timedelta(days=max(self.initial_lookback_days, STALE_PERIODS * period_days))
+                    ).strftime(period_format)
+        # start is inclusive, the overlap is dropped in fetch_route
+        return max(min(period for period in series_watermarks.values() if period >= stale_before), earliest)
+
+    def _fetch_page(self, route: EIARouteConfig, start: str, offset: int):
+        try:
+            response = self.ng_api_client.v2_natural_gas_route1_route2_data_post(
+                route1=route.route1,
+                route2=route.route2,
+                data_params=DataParams(
+                    start=start,
+                    frequency=route.frequency,
+                    data=['value'],
+                    sort=[Sort(column="period", direction="asc")],
+                    offset=offset,
+                    length=self.page_size,
+                )
             )
-        )
-        return response
+        except Exception:
+            SOURCE_REQUESTS.labels(self.SOURCE, "error").inc()
+            raise
+        SOURCE_REQUESTS.labels(self.SOURCE, "ok").inc()
+        return response.response
+
+    def fetch_route(self, route: EIARouteConfig) -> List[Dict[str, Any]]:
+        """
+        Rows of route newer than its series watermarks, oldest first, paging through
+        the response page_size rows at a time. Watermarks are not advanced here,
+        see commit().
+        """
+        series_watermarks = self.watermarks.get(route_key(route), {})
+        start = self._start_period(route)
+        rows, offset = [], 0
+        while True:
+            page = self._fetch_page(route, start, offset)
+            page_rows = page.data or []
+            rows.extend(
+                row for row in page_rows
+                if row["period"] > series_watermarks.get(row.get("series", ""), "")
+            )
+            offset += len(page_rows)
+            # total comes back as a string on some routes
+            total = int(page.total) if page.total is not None else None
+            if len(page_rows) < self.page_size or (total is not None and offset >= total):
+                break
+        log.info(f"Fetched {len(rows)} new rows from {route_key(route)} since {start} ({offset} rows read)")
+        return rows
+
+    def fetch_updates(self, routes: List[EIARouteConfig]) -> Dict[str, List[Dict[str, Any]]]:
+        """New rows of every route, fetched concurrently on the executor. Failed routes are left out."""
+        futures = {self.executor.submit(self.fetch_route, route): route for route in routes}
+        updates = {}
+        for future in as_completed(futures):
+            route = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                log.error(f"Error fetching EIA route {route_key(route)}: {e}")
+                continue
+            if rows:
+                updates[route_key(route)] = rows
+        return updates
+
+    def commit(self, key: str, rows: List[Dict[str, Any]]):
+        """Advance the watermarks of route key past rows, once they were handed downstream."""
+        series_watermarks = self.watermarks.setdefault(key, {})
+        for row in rows:
+            series = row.get("series", "")
+            if row["period"] > series_watermarks.get(series, ""):
+                series_watermarks[series] = row["period"]
 
 
 class EIAPollingThread(BasePollingThread):
+    """
+    Emits the rows each EIA route gained since the last poll, one "eia" message per
+    route with the route as location_id. Watermarks are persisted after the
+    messages are queued, so a crash in between re-sends a delta rather than losing it.
+    """
+    SOURCE = EIAClient.SOURCE
+
     def __init__(self, config: Config, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.config = config
         eia_api_key = os.environ.get("EIA_API_KEY")
-        self.eia_client = EIAClient(api_key=eia_api_key)
+        self.eia_client = EIAClient(
+            api_key=eia_api_key,
+            watermark_path=os.path.join(config.training.training_data_volume_path, "_state", "eia_watermarks.json"),
+            page_size=config.data_ingestion.eia_page_size,
+            initial_lookback_days=config.data_ingestion.eia_initial_lookback_days,
+        )
+
+    def poll_action(self):
+        try:
+            updates = self.eia_client.fetch_updates(self.config.data_ingestion.eia_routes)
+            for key, rows in updates.items():
+                self.output_queue.put(encode_message({
+                    "type": "eia",
+                    "location_id": key,
+                    "ingestion_timestamp": time.time(),
+                    "data": {"route": key, "rows": rows},
+                }))
+                self.eia_client.commit(key, rows)
+                self.observe_update(self._period_epoch(key, rows[-1]["period"]), key=key)
+            if updates:
+                self.eia_client.save_watermarks()
+        except Exception as e:
+            log.error(f"Error polling EIA natural gas data: {e}")
+
+    def _period_epoch(self, key: str, period: str) -> float:
+        frequency = next((route.frequency for route in self.config.data_ingestion.eia_routes
+                          if route_key(route) == key), "daily")
+        period_format = PERIOD_FORMATS.get(frequency, "%Y-%m-%d")
+        return datetime.strptime(period, period_format).replace(tzinfo=timezone.utc).timestamp()
+
+    def stop_gracefully(self):
+        log.info("Stopping gracefully...")
+        self.eia_client.shutdown_executor()
 
 
 if __name__ == "__main__":
     load_dotenv()
     client = EIAClient(api_key=os.environ.get("EIA_API_KEY"))
-    print(client.get_natural_gas_prices())
+    for route, rows in client.fetch_updates(Config().data_ingestion.eia_routes).items():
+        print(route, rows[-1] if rows else None)
     # # start=2025-04-01&end=2025-04-02
     # response = ng_api_client.v2_natural_gas_route1_route2_data_post(
     #     route1="pri",
@@ -1,71 +1,240 @@
 import os
 
-import requests
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 import logging
 import json
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 from dotenv import load_dotenv
 
 from app.logging_helper import setup_logging
-from isone_client import ApiClient
-from isone_client.api import (
-    DayaheadhourlydemandApi,
-    FiveminutelmpApi,
-    HourlylmpApi
-)
-from isone_client.configuration import Configuration
+try:
+    # Generated by generate_isone_client.sh, only the typed API helpers need it;
+    # the polled routes go through the pooled session
+    from isone_client import ApiClient
+    from isone_client.api import (
+        DayaheadhourlydemandApi,
+        FiveminutelmpApi,
+        HourlylmpApi
+    )
+    from isone_client.configuration import Configuration
+except ImportError:
+    ApiClient = None
 
+from app.config import Config
+from ...messages import encode_message
+from ...observability.metrics import SOURCE_REQUESTS
+from ..http_session import NOT_MODIFIED, PooledHTTPSession, get_shared_session
 from ..polling_thread import BasePollingThread
 
+log = logging.getLogger(__name__)
+
+FIVE_MINUTE_LMP_PATH = "/fiveminutelmp/current/all"
+# Column name -> field of an ISO-NE LMP record
+LMP_FIELDS = {
+    "lmp": "LmpTotal",
+    "energy": "EnergyComponent",
+    "congestion": "CongestionComponent",
+    "loss": "LossComponent",
+}
+
+
 class ISONEClient:
     """
     Fetches real-time LMP prices for all nodes in ISO-NE.
     """
+    BASE_URL = "https://webservices.iso-ne.com/api/v1.1"
+    SOURCE = "iso_ne"
+
+    def __init__(self, username: str, password: str, session: Optional[PooledHTTPSession] = None,
+                 base_url: Optional[str] = None):
+        self.base_url = base_url or self.BASE_URL
+        self.session = session or get_shared_session()
+        self.auth = (username, password) if username else None
+        self.headers = {"Accept": "application/json"}
+        self.api_client = None
+        if ApiClient is not None:
+            self.configuration = Configuration(
+                username=username,
+                password=password,
+            )
+            self.api_client = ApiClient(configuration=self.configuration)
+            self.day_ahead_hourly_demand_api = DayaheadhourlydemandApi(api_client=self.api_client)
+            self.five_minute_lmp_api = FiveminutelmpApi(api_client=self.api_client)
+            self.hourly_lmp_api = HourlylmpApi(api_client=self.api_client)
 
-    def __init__(self, username: str, password: str):
-        self.configuration = Configuration(
-            username=username,
-            password=password,
+    def _require_api_client(self):
+        if self.api_client is None:
+            raise RuntimeError("isone_client is not installed, run generate_isone_client.sh")
+
+    def get_json(self, path: str, conditional: bool = True) -> Optional[dict]:
+        """
+        GET a raw ISO-NE web services route through the pooled session.
+        Returns None when the resource is unchanged since the last call (304).
+        """
+        status, payload = self.session.get_json(
+            f"{self.base_url}{path}",
+            headers=self.headers,
+            auth=self.auth,
+            conditional=conditional,
         )
-        self.api_client = ApiClient(configuration=self.configuration)
-        self.day_ahead_hourly_demand_api = DayaheadhourlydemandApi(api_client=self.api_client)
-        self.five_minute_lmp_api = FiveminutelmpApi(api_client=self.api_client)
-        self.hourly_lmp_api = HourlylmpApi(api_client=self.api_client)
-
-    def fetch_prelim_prices(self):
-        data = self.five_minute_lmp_api.fiveminutelmp_current_all_get()
-        return data
-
-    def fetch_final_prices(self):
-        data = self.hourly_lmp_api.hourlylmp_rt_final_day_day_get(
-            day="2025-04-23T00:00:00"
+        SOURCE_REQUESTS.labels(self.SOURCE, str(status)).inc()
+        if status == NOT_MODIFIED:
+            return None
+        if payload is None:
+            raise ValueError(f"{path} returned HTTP {status}")
+        return payload
+
+    def fetch_prelim_prices(self) -> Optional[dict]:
+        # Same route as five_minute_lmp_api.fiveminutelmp_current_all_get, but with
+        # keep-alive and conditional GETs since it is polled far more often than it changes
+        return self.get_json(FIVE_MINUTE_LMP_PATH)
+
+    @staticmethod
+    def response_entries(payload: Optional[dict], collection: str, item: str) -> List[dict]:
+        """The records of a response, e.g. payload["FiveMinLmps"]["FiveMinLmp"], as a list."""
+        # Empty days come back as "" instead of an object
+        entries = ((payload or {}).get(collection) or {}).get(item) or []
+        if isinstance(entries, dict):
+            # Single-element responses come back as a bare object
+            entries = [entries]
+        return entries
+
+    @staticmethod
+    def begin_timestamps(entries: List[dict]) -> np.ndarray:
+        """Epoch seconds of every record's BeginDate, parsing each distinct date once."""
+        begin_dates = np.array([entry["BeginDate"] for entry in entries])
+        unique_dates, inverse = np.unique(begin_dates, return_inverse=True)
+        starts = np.array([datetime.fromisoformat(str(d)).timestamp() for d in unique_dates], dtype=np.float64)
+        return starts[inverse.reshape(-1)]
+
+    @staticmethod
+    def lmp_columns(entries: List[dict]) -> Dict[str, np.ndarray]:
+        """
+        Flatten LMP records (five-minute or hourly) into columns: interval_start,
+        location_id and one float32 array per price component.
+        """
+        if not entries:
+            return {}
+        return {
+            "interval_start": ISONEClient.begin_timestamps(entries),
+            "location_id": np.array([entry["Location"]["@LocId"] for entry in entries]),
+            **{
+                name: np.array([entry[field] for entry in entries], dtype=np.float32)
+                for name, field in LMP_FIELDS.items()
+            },
+        }
+
+    @staticmethod
+    def demand_columns(entries: List[dict]) -> Dict[str, np.ndarray]:
+        """Flatten hourly demand records into interval_start, location_id and mw columns."""
+        if not entries:
+            return {}
+        return {
+            "interval_start": ISONEClient.begin_timestamps(entries),
+            "location_id": np.array([entry["Location"]["@LocId"] for entry in entries]),
+            "mw": np.array([entry["Load"] for entry in entries], dtype=np.float32),
+        }
+
+    @staticmethod
+    def parse_five_minute_lmps(payload: Optional[dict]) -> List[Dict[str, Any]]:
+        """
+        Parse a FiveMinLmps response into one columnar interval per BeginDate, oldest
+        first: {"interval_start", "location_ids", "lmp", "energy", "congestion", "loss"}
+        with the per-node values as arrays.
+        """
+        columns = ISONEClient.lmp_columns(ISONEClient.response_entries(payload, "FiveMinLmps", "FiveMinLmp"))
+        if not columns:
+            return []
+
+        starts = columns.pop("interval_start")
+        location_ids = columns.pop("location_id")
+        intervals = []
+        # np.unique sorts, so intervals come out oldest first
+        for interval_start in np.unique(starts):
+            rows = starts == interval_start
+            intervals.append({
+                "interval_start": float(interval_start),
+                "location_ids": location_ids[rows],
+                **{name: values[rows] for name, values in columns.items()},
+            })
+        return intervals
+
+    def fetch_final_prices(self, day: Optional[date] = None):
+        """Final real-time hourly LMPs for day, yesterday by default."""
+        self._require_api_client()
+        day = day or (datetime.now(tz=timezone.utc) - timedelta(days=1)).date()
+        return self.hourly_lmp_api.hourlylmp_rt_final_day_day_get(
+            day=f"{day:%Y-%m-%d}T00:00:00"
         )
-        # self.hourly_lmp_api.hourlylmp_rt_final_day_day_location_location_id_get(
-        #
-        # )
-        data = self.hourly_lmp_api.hourlylmp_rt_final_info_get()
-        return data
 
     def fetch_demand(self) -> dict:
+        self._require_api_client()
         data = self.day_ahead_hourly_demand_api.dayaheadhourlydemand_current_get()
         print(data)
 
 class NEISOPollingThread(BasePollingThread):
+    """
+    Polls the current five-minute LMPs for every ISO-NE pnode and emits each new
+    interval once, as a single columnar "lmp" message. The start of the last
+    emitted interval is remembered, so repeated polls of the same interval (and
+    304s from the conditional GET) send nothing downstream.
+    """
+    SOURCE = ISONEClient.SOURCE
+    ALIGN_TO_UPDATES = True
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, config: Config, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.config = config
+        self.iso_ne_client = ISONEClient(
+            os.environ.get("ISO_NE_API_USERNAME"),
+            os.environ.get("ISO_NE_API_PASSWORD"),
+            base_url=config.data_ingestion.iso_ne_base_url,
+        )
+        self.last_interval_start: Optional[float] = None
+
+    def _emit_new_intervals(self, payload: Optional[dict]):
+        for interval in self.iso_ne_client.parse_five_minute_lmps(payload):
+            if self.last_interval_start is not None and interval["interval_start"] <= self.last_interval_start:
+                continue
+            self.output_queue.put(encode_message({
+                "type": "lmp",
+                "location_id": None,
+                "ingestion_timestamp": interval["interval_start"],
+                "data": interval,
+            }))
+            self.last_interval_start = interval["interval_start"]
+            self.observe_update(interval["interval_start"])
+            log.info(f"Emitted five-minute LMPs for {len(interval['location_ids'])} nodes at "
+                     f"{datetime.fromtimestamp(interval['interval_start'], tz=timezone.utc):%Y-%m-%d %H:%M}")
 
     def poll_action(self):
-        pass
+        try:
+            self._emit_new_intervals(self.iso_ne_client.fetch_prelim_prices())
+        except Exception as e:
+            log.error(f"Error fetching five-minute LMPs: {e}")
+
+    async def poll_action_async(self, engine):
+        status, payload = await engine.get(
+            f"{self.iso_ne_client.base_url}{FIVE_MINUTE_LMP_PATH}",
+            headers=self.iso_ne_client.headers,
+            auth=self.iso_ne_client.auth,
+        )
+        SOURCE_REQUESTS.labels(self.SOURCE, str(status)).inc()
+        if payload is None:
+            if status != NOT_MODIFIED:
+                log.warning(f"Five-minute LMP poll returned HTTP {status}")
+            return
+        # Queue puts go through the manager proxy, keep them off the event loop
+        await engine.run_blocking(self._emit_new_intervals, payload)
 
     def stop_gracefully(self):
-        pass
+        log.info("Stopping gracefully...")
 
 if __name__ == "__main__":
     load_dotenv()
     setup_logging()
-    log = logging.getLogger(__name__)
     client = ISONEClient(
         os.environ.get("ISO_NE_API_USERNAME"),
         os.environ.get("ISO_NE_API_PASSWORD")
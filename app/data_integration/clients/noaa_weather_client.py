@@ -1,121 +1,341 @@
-import requests
+import asyncio
 import json
 import pandas as pd
 import logging
-import os
 import time
-from datetime import datetime, timezone
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 
 from app.config import Config
+from .nws_points_cache import NWSPointsCache
+from ...feature_vectorization.archive import ColumnarArchiveWriter
+from ...messages import encode_message, weather_forecast_data
+from ...observability.metrics import SOURCE_REQUESTS
+from ..http_session import NOT_MODIFIED, PooledHTTPSession, get_shared_session
 from ..polling_thread import BasePollingThread
+from ..reference_data import load_iso_ne_nodes, load_iso_nodes
 
 log = logging.getLogger(__name__)
 
+# NWS /points rounds coordinates to 4 decimal places, so anything finer
+# than that resolves to the same grid cell anyway.
+COORD_PRECISION = 4
+
 class NOAAWeatherClient:
     BASE_URL = "https://api.weather.gov"
+    SOURCE = "noaa_weather"
 
-    def __init__(self, user_agent="(energy_price_forecasting_app)"):
+    def __init__(self, user_agent="(energy_price_forecasting_app)", points_cache: Optional[NWSPointsCache] = None,
+                 session: Optional[PooledHTTPSession] = None, base_url: Optional[str] = None,
+                 nodes_path: Optional[str] = None):
+        self.base_url = base_url or self.BASE_URL
+        self.nodes_path = nodes_path
         self.headers = {
             "User-Agent": user_agent,
             "Accept": "application/ld+json"
         }
+        self.session = session or get_shared_session()
         self.executor = ThreadPoolExecutor(max_workers=10)
         self._shutdown = False
 
+        # (lat, lon) -> grid cell metadata from /points. Without a persistent cache
+        # we still avoid re-resolving for the lifetime of the client.
+        self.points_cache = points_cache or NWSPointsCache(path=None, ttl_seconds=float("inf"))
+
     def shutdown_executor(self, wait=True):
         if not self._shutdown:
             log.info("Shutting down NOAAWeatherClient thread pool executor...")
             self.executor.shutdown(wait=wait)
             self._shutdown = True
 
-    def get_forecast(self, lat, lon):
+    @staticmethod
+    def _grid_cell_from_point(point_data: dict) -> dict:
+        location = point_data["relativeLocation"]
+        return {
+            "grid_id": f"{point_data['gridId']}/{point_data['gridX']},{point_data['gridY']}",
+            "forecast_url": point_data["forecast"],
+            "city": location["city"],
+            "state": location["state"],
+        }
+
+    @staticmethod
+    def _unique_coords(nodes: pd.DataFrame) -> Tuple[pd.DataFrame, List[Tuple[float, float]]]:
+        coords = nodes[["Latitude", "Longitude"]].round(COORD_PRECISION)
+        return coords, list(coords.drop_duplicates().itertuples(index=False, name=None))
+
+    @staticmethod
+    def _group_nodes_by_cell(nodes: pd.DataFrame, coords: pd.DataFrame,
+                             resolved: Dict[Tuple[float, float], dict]) -> Dict[str, dict]:
+        grid_cells: Dict[str, dict] = {}
+        nodes_by_cell = defaultdict(list)
+        for node_id, lat, lon in zip(nodes["Node/Unit ID"], coords["Latitude"], coords["Longitude"]):
+            grid_cell = resolved.get((lat, lon))
+            if grid_cell is None:
+                continue
+            grid_cells.setdefault(grid_cell["grid_id"], grid_cell)
+            nodes_by_cell[grid_cell["grid_id"]].append((str(node_id), lat, lon))
+
+        return {
+            grid_id: {**grid_cell, "nodes": nodes_by_cell[grid_id]}
+            for grid_id, grid_cell in grid_cells.items()
+        }
+
+    def _record_request(self, status):
+        SOURCE_REQUESTS.labels(self.SOURCE, str(status)).inc()
+
+    def _save_points_cache(self):
+        try:
+            self.points_cache.save()
+        except Exception as e:
+            log.warning(f"Failed persisting NWS points cache: {e}")
+
+    def _invalidate_grid_cell(self, grid_cell: dict):
+        # The grid cell moved (NWS occasionally re-grids offices), so make
+        # the nodes behind it re-resolve /points on the next poll.
+        dropped = self.points_cache.invalidate_grid_cell(grid_cell["grid_id"])
+        self.session.forget(grid_cell["forecast_url"])
+        log.warning(f"Forecast for {grid_cell['grid_id']} returned 404, invalidated {dropped} cached points")
+
+    def resolve_point(self, lat, lon) -> dict:
+        """
+        Resolve a coordinate to its NWS grid cell via /points/{lat},{lon}.
+        Served from the points cache unless the entry is missing or expired.
+        """
+        cached = self.points_cache.get(lat, lon)
+        if cached is not None:
+            return cached
+
+        url = f"{self.base_url}/points/{lat},{lon}"
+        response = self.session.get(url, headers=self.headers, conditional=False)
+        self._record_request(response.status_code)
+        response.raise_for_status()
+        grid_cell = self._grid_cell_from_point(response.json())
+        self.points_cache.put(lat, lon, grid_cell)
+        return grid_cell
+
+    def resolve_grid_cells(self, nodes: pd.DataFrame) -> Dict[str, dict]:
+        """
+        Collapse nodes onto the unique NWS grid cells that cover them.
+
+        Duplicate coordinates are resolved once, and every node whose coordinate
+        lands in the same grid cell is grouped under that cell. Returns a mapping of
+        grid_id -> {forecast_url, city, state, nodes: [(node_id, lat, lon), ...]}.
+        """
+        coords, unique_coords = self._unique_coords(nodes)
+
+        resolved: Dict[Tuple[float, float], dict] = {}
+        futures = {
+            self.executor.submit(self.resolve_point, lat, lon): (lat, lon)
+            for lat, lon in unique_coords
+        }
+        for future in as_completed(futures):
+            lat, lon = futures[future]
+            try:
+                resolved[(lat, lon)] = future.result()
+            except Exception as e:
+                log.warning(f"Failed resolving grid cell for {lat},{lon}: {e}")
+
+        self._save_points_cache()
+        return self._group_nodes_by_cell(nodes, coords, resolved)
+
+    def get_forecast(self, grid_cell: dict):
         if self._shutdown:
-            return {"lat": lat, "lon": lon, "error": "Executor has been shut down"}
+            return {**grid_cell, "error": "Executor has been shut down"}
         try:
             start = time.time()
-            url = f"{self.BASE_URL}/points/{lat},{lon}"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            point_data = response.json()
-            # log.info(f"Point data: {json.dumps(point_data, indent=4)}")
-
-            forecast_url = point_data["forecast"]
-            location = point_data["relativeLocation"]
-            city = location["city"]
-            state = location["state"]
-
-            forecast_resp = requests.get(forecast_url, headers=self.headers)
-            forecast_resp.raise_for_status()
-            forecast = forecast_resp.json()
+            status, forecast = self.session.get_json(grid_cell["forecast_url"], headers=self.headers)
+            self._record_request(status)
+            if status == NOT_MODIFIED:
+                return {**grid_cell, "not_modified": True}
+            if status == 404:
+                self._invalidate_grid_cell(grid_cell)
+            if forecast is None:
+                return {**grid_cell, "error": f"Forecast returned HTTP {status}"}
             end = time.time()
-            log.info(f"Weather forecast fetched in {end - start} seconds")
+            log.debug(f"Weather forecast for {grid_cell['grid_id']} fetched in {end - start} seconds")
             # log.info(f"Forecast data: {json.dumps(forecast, indent=4)}")
 
-            return {
-                "lat": lat,
-                "lon": lon,
-                "city": city,
-                "state": state,
-                "forecast": forecast
-            }
+            return {**grid_cell, "forecast": forecast}
         except Exception as e:
-            return {
-                "lat": lat,
-                "lon": lon,
-                "error": str(e)
-            }
+            return {**grid_cell, "error": str(e)}
 
     def get_iso_forecast(self, iso):
         iso = iso.upper()
-        coords = {
-            "ISO_NE": self.get_iso_ne_points()
-        }[iso]
+        nodes = self.get_iso_nodes(iso)
 
-        log.info(f"Fetching weather data using {len(coords)} coordinates for iso {iso}")
-        futures = [self.executor.submit(self.get_forecast, lat, lon) for lat, lon in coords]
+        grid_cells = self.resolve_grid_cells(nodes)
+        log.info(f"Fetching weather data for {len(nodes)} nodes across {len(grid_cells)} grid cells for iso {iso}")
+        futures = [self.executor.submit(self.get_forecast, grid_cell) for grid_cell in grid_cells.values()]
 
         for future in as_completed(futures):
-            log.info("New weather data ingested")
             yield future.result()
 
+    async def resolve_point_async(self, lat, lon, engine) -> dict:
+        cached = self.points_cache.get(lat, lon)
+        if cached is not None:
+            return cached
+
+        url = f"{self.base_url}/points/{lat},{lon}"
+        status, point_data = await engine.get(url, headers=self.headers, conditional=False)
+        self._record_request(status)
+        if point_data is None:
+            raise ValueError(f"/points returned HTTP {status}")
+        grid_cell = self._grid_cell_from_point(point_data)
+        self.points_cache.put(lat, lon, grid_cell)
+        return grid_cell
+
+    async def get_forecast_async(self, grid_cell: dict, engine) -> dict:
+        try:
+            status, forecast = await engine.get(grid_cell["forecast_url"], headers=self.headers)
+        except Exception as e:
+            self._record_request("error")
+            return {**grid_cell, "error": str(e)}
+        self._record_request(status)
+
+        if status == NOT_MODIFIED:
+            return {**grid_cell, "not_modified": True}
+        if status == 404:
+            self._invalidate_grid_cell(grid_cell)
+            engine.forget(grid_cell["forecast_url"])
+        if forecast is None:
+            return {**grid_cell, "error": f"Forecast returned HTTP {status}"}
+        return {**grid_cell, "forecast": forecast}
+
+    async def get_iso_forecast_async(self, iso, engine) -> List[dict]:
+        """
+        Same as get_iso_forecast, but every /points and forecast request is in
+        flight at once on the engine loop, bounded only by its host limits.
+        """
+        iso = iso.upper()
+        nodes = self.get_iso_nodes(iso)
+        coords, unique_coords = self._unique_coords(nodes)
+
+        results = await asyncio.gather(
+            *(self.resolve_point_async(lat, lon, engine) for lat, lon in unique_coords),
+            return_exceptions=True,
+        )
+        resolved: Dict[Tuple[float, float], dict] = {}
+        for (lat, lon), result in zip(unique_coords, results):
+            if isinstance(result, BaseException):
+                log.warning(f"Failed resolving grid cell for {lat},{lon}: {result}")
+                continue
+            resolved[(lat, lon)] = result
+        self._save_points_cache()
+
+        grid_cells = self._group_nodes_by_cell(nodes, coords, resolved)
+        log.info(f"Fetching weather data for {len(nodes)} nodes across {len(grid_cells)} grid cells for iso {iso}")
+        return await asyncio.gather(*(self.get_forecast_async(grid_cell, engine) for grid_cell in grid_cells.values()))
+
+    def get_iso_nodes(self, iso: str) -> pd.DataFrame:
+        return load_iso_nodes(iso, self.nodes_path)
+
     def get_iso_ne_points(self):
-        iso_ne_csv_path = os.path.join(os.getcwd(), "data", "reference", "iso_ne_nodes_april_2025.csv")
-        df = pd.read_csv(iso_ne_csv_path)
-        df = df.dropna(subset=["Latitude", "Longitude"])
+        df = load_iso_ne_nodes()
         return list(zip(df["Latitude"], df["Longitude"]))
 
 
 class WeatherPollingThread(BasePollingThread):
+    SOURCE = NOAAWeatherClient.SOURCE
+
     def __init__(self, config: Config, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config = config
-        self.weather_client = NOAAWeatherClient()
+        self.weather_client = NOAAWeatherClient(
+            points_cache=NWSPointsCache(
+                path=config.data_ingestion.nws_points_cache_path,
+                ttl_seconds=config.data_ingestion.nws_points_cache_ttl_seconds,
+            ),
+            base_url=config.data_ingestion.noaa_base_url,
+            nodes_path=config.general.nodes_path,
+        )
+        # Raw forecasts go straight to the archive, downstream only gets the extracted periods
+        self.raw_archive: Optional[ColumnarArchiveWriter] = None
+        if config.data_ingestion.archive_raw_payloads:
+            self.raw_archive = ColumnarArchiveWriter(
+                root=config.training.training_data_volume_path,
+                msg_type="weather_raw",
+                row_group_size=config.archive.row_group_size,
+                flush_interval_sec=config.archive.flush_interval_sec,
+                compression=config.archive.compression,
+                compaction_interval_sec=config.archive.compaction_interval_sec,
+                compaction_grace_sec=config.archive.compaction_grace_sec,
+            )
+
+    def _emit_weather_data(self, weather_data: dict, output_queue):
+        if "error" in weather_data:
+            log.warning(f"Error fetching forecast for grid cell {weather_data['grid_id']}: {weather_data['error']}")
+            return
+        if weather_data.get("not_modified"):
+            # Unchanged since the last poll, nothing new to send downstream
+            return
+
+        ingestion_timestamp = time.time()
+        forecast = weather_forecast_data(weather_data["forecast"])
+        if forecast["update_time"] is not None:
+            # Grid cells update independently, each is its own stream of the schedule
+            self.observe_update(forecast["update_time"], key=weather_data["grid_id"])
+        if self.raw_archive is not None:
+            self.raw_archive.append({
+                "event_time": forecast["update_time"] or ingestion_timestamp,
+                "location_id": weather_data["grid_id"],
+                "payload": json.dumps({
+                    "city": weather_data["city"],
+                    "state": weather_data["state"],
+                    "forecast": weather_data["forecast"],
+                }),
+            })
+
+        # Fan the grid cell forecast out to every node that maps to it
+        for node_id, lat, lon in weather_data["nodes"]:
+            output_queue.put(encode_message({
+                "type": "weather",
+                "location_id": node_id,
+                "ingestion_timestamp": ingestion_timestamp,
+                "data": {"lat": lat, "lon": lon, "grid_id": weather_data["grid_id"], **forecast},
+            }))
 
     def _fetch_weather_data(self, iso, output_queue):
         log.info("Fetching data...")
         try:
             for weather_data in self.weather_client.get_iso_forecast(iso):
-                output_queue.put(
-                    {
-                        "type": "weather",
-                        "location_id": f"{weather_data['lat']},{weather_data['lon']}",
-                        "ingestion_timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
-                        "data": weather_data,
-                    }
-                )
+                self._emit_weather_data(weather_data, output_queue)
         except Exception as e:
             log.error(f"Error: {e}")
 
+    def _flush_raw_archive(self, force: bool = False):
+        if self.raw_archive is None:
+            return
+        try:
+            if force:
+                self.raw_archive.flush()
+            else:
+                self.raw_archive.flush_if_due()
+        except Exception as e:
+            log.error(f"Failed archiving raw forecasts: {e}", exc_info=True)
+
     def poll_action(self):
         log.info(f"Polling weather after {self.interval_sec} seconds...")
         self._fetch_weather_data(self.config.general.iso, self.output_queue)
+        self._flush_raw_archive()
+
+    async def poll_action_async(self, engine):
+        log.info(f"Polling weather after {self.interval_sec} seconds...")
+        results = await self.weather_client.get_iso_forecast_async(self.config.general.iso, engine)
+        # Queue puts go through the manager proxy, keep them off the event loop
+        await engine.run_blocking(self._emit_all, results)
+
+    def _emit_all(self, results: List[dict]):
+        for weather_data in results:
+            self._emit_weather_data(weather_data, self.output_queue)
+        self._flush_raw_archive()
 
     def stop_gracefully(self):
         log.info("Stopping gracefully...")
         self.weather_client.shutdown_executor()
+        self._flush_raw_archive(force=True)
 
 if __name__ == "__main__":
     client = NOAAWeatherClient()
-    forecasts = client.get_iso_forecast("ISO-NE")
+    forecasts = list(client.get_iso_forecast("ISO_NE"))
     print(json.dumps(forecasts[:3], indent=2))  # Show only first 3 results for brevity
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ...utils.atomic_json import write_json_atomically
+
+log = logging.getLogger(__name__)
+
+
+class NWSPointsCache:
+    """
+    Disk-backed cache of NWS /points metadata keyed by (lat, lon).
+
+    The coordinate -> grid cell mapping almost never changes, so entries are kept
+    until they are older than ttl_seconds or are explicitly invalidated (e.g. when
+    the forecast URL they point at starts returning 404). A path of None keeps the
+    cache in memory only.
+    """
+
+    def __init__(self, path: Optional[str], ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[float, float], dict] = {}
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key_to_str(key: Tuple[float, float]) -> str:
+        return f"{key[0]},{key[1]}"
+
+    @staticmethod
+    def _str_to_key(raw: str) -> Tuple[float, float]:
+        lat, lon = raw.split(",")
+        return float(lat), float(lon)
+
+    def load(self):
+        if self.path is None:
+            return
+        if not os.path.exists(self.path):
+            log.info(f"No NWS points cache found at {self.path}, starting empty")
+            return
+        try:
+            with open(self.path, "r") as f:
+                raw_entries = json.load(f)
+            with self._lock:
+                self._entries = {self._str_to_key(k): v for k, v in raw_entries.items()}
+            log.info(f"Loaded {len(self._entries)} NWS points from {self.path}")
+        except Exception as e:
+            log.warning(f"Failed loading NWS points cache from {self.path}, starting empty: {e}")
+
+    def save(self):
+        """Atomically persist the cache if anything changed since the last save."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            raw_entries = {self._key_to_str(k): v for k, v in self._entries.items()}
+            self._dirty = False
+
+        write_json_atomically(self.path, raw_entries)
+
+    def get(self, lat: float, lon: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get((lat, lon))
+        if entry is None:
+            return None
+        if time.time() - entry["resolved_at"] > self.ttl_seconds:
+            return None
+        return entry["grid_cell"]
+
+    def put(self, lat: float, lon: float, grid_cell: dict):
+        with self._lock:
+            self._entries[(lat, lon)] = {"resolved_at": time.time(), "grid_cell": grid_cell}
+            self._dirty = True
+
+    def invalidate_grid_cell(self, grid_id: str) -> int:
+        """Drop every coordinate resolved to grid_id so it is re-resolved on next use."""
+        with self._lock:
+            stale = [k for k, v in self._entries.items() if v["grid_cell"]["grid_id"] == grid_id]
+            for k in stale:
+                del self._entries[k]
+            if stale:
+                self._dirty = True
+        return len(stale)
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,19 +1,27 @@
-import traceback
-
 import yfinance as yf
 import logging
 import time
 import json
 from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
 from dateutil.relativedelta import relativedelta
 
 from app.config import Config
+from app.messages import encode_message
+from app.observability.metrics import SOURCE_REQUESTS
 from ..polling_thread import BasePollingThread
 from app.logging_helper import setup_logging
 
 log = logging.getLogger(__name__)
 
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+# Yahoo only serves 1-minute bars of about the last 7 days
+MAX_BAR_LOOKBACK_SEC = 7 * 24 * 3600
+# A contract whose last bar is this much older than the newest one no longer moves the download start
+STALE_BAR_SEC = 3600
+
 FUTURES_MONTH_CODES = {
     1: "F", 2: "G", 3: "H", 4: "J", 5: "K", 6: "M",
     7: "N", 8: "Q", 9: "U", 10: "V", 11: "X", 12: "Z"
@@ -34,79 +42,115 @@ def generate_ng_future_tickers(months_ahead=6, include_front_month=True):
 
 
 class NaturalGasClient:
+    """
+    Downloads 1-minute bars for a whole futures strip in one yf.download call and
+    remembers the last bar seen per ticker, so each poll returns only new bars.
+    """
+    SOURCE = "natural_gas"
+
     def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=5)
-        self._shutdown = False
-
-    def shutdown_executor(self, wait=True):
-        if not self._shutdown:
-            log.info("Shutting down NaturalGasClient thread pool executor...")
-            self.executor.shutdown(wait=wait)
-            self._shutdown = True
-
-    def get_price(self, ticker="NG=F"):
-        if self._shutdown:
-            return {"ticker": ticker, "error": "Executor has been shut down"}
+        # ticker -> epoch seconds of the newest bar already returned
+        self.last_bar: Dict[str, float] = {}
+        # ticker -> close of that bar, so contracts without new bars keep their place on the curve
+        self.last_close: Dict[str, float] = {}
+
+    def download_bars(self, tickers: List[str]) -> pd.DataFrame:
+        """
+        1-minute bars for every ticker, columns (ticker, field). After the first call
+        the download starts at the oldest last bar instead of covering the whole day.
+        Contracts whose last bar is over STALE_BAR_SEC behind the newest are left out
+        of that minimum, and the start is never more than MAX_BAR_LOOKBACK_SEC ago.
+        """
+        known = [self.last_bar[ticker] for ticker in tickers if ticker in self.last_bar]
+        if known:
+            newest = max(known)
+            oldest = min(last_bar for last_bar in known if last_bar >= newest - STALE_BAR_SEC)
+            oldest = max(oldest, time.time() - MAX_BAR_LOOKBACK_SEC)
+            window = {"start": datetime.fromtimestamp(oldest, tz=timezone.utc)}
+        else:
+            window = {"period": "1d"}
+        start = time.time()
         try:
-            start = time.time()
-            data = yf.Ticker(ticker).history(period="1d", interval="1m")
-            end = time.time()
-            log.info(f"{ticker} price fetched in {end - start:.2f} seconds")
-
-            for _, row in data.iterrows():
-                yield {
-                    "ingestion_timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
-                    "location_id": None,
-                    "data": row.to_dict()
-                }
-        except Exception as e:
-            yield {"ticker": ticker, "error": str(e), "traceback": traceback.format_exc()}
-
-    def get_bulk_prices(self, tickers):
-        log.info(f"Fetching prices for tickers {tickers}")
-        futures = [self.executor.submit(self.get_price, ticker) for ticker in tickers]
-        for future in as_completed(futures):
-            yield from future.result()
+            frame = yf.download(tickers, interval="1m", group_by="ticker", auto_adjust=False, progress=False,
+                                threads=True, **window)
+        except Exception:
+            SOURCE_REQUESTS.labels(self.SOURCE, "error").inc()
+            raise
+        SOURCE_REQUESTS.labels(self.SOURCE, "ok").inc()
+        log.info(f"Bars for {len(tickers)} tickers fetched in {time.time() - start:.2f} seconds")
+        return frame
+
+    def new_bars(self, frame: pd.DataFrame, tickers: List[str]) -> Dict[str, Dict[str, list]]:
+        """Columnar bars newer than each ticker's last bar, {ticker: {"time": [...], "open": [...], ...}}."""
+        bars = {}
+        available = set(frame.columns.get_level_values(0)) if not frame.empty else set()
+        for ticker in tickers:
+            if ticker not in available:
+                continue
+            ticker_frame = frame[ticker].dropna(subset=["Close"])
+            times = ticker_frame.index.as_unit("ns").asi8 / 1e9
+            fresh = times > self.last_bar.get(ticker, float("-inf"))
+            if not fresh.any():
+                continue
+            bars[ticker] = {
+                "time": times[fresh].tolist(),
+                **{field.lower(): ticker_frame[field].to_numpy()[fresh].tolist() for field in BAR_FIELDS},
+            }
+            self.last_bar[ticker] = bars[ticker]["time"][-1]
+            self.last_close[ticker] = bars[ticker]["close"][-1]
+        return bars
+
+    def get_curve_snapshot(self, tickers: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        The strip as one columnar snapshot: the latest close of every ticker in
+        order (None if it never traded) plus the bars added since the last call.
+        None when no ticker has a new bar.
+        """
+        bars = self.new_bars(self.download_bars(tickers), tickers)
+        if not bars:
+            return None
+        return {
+            "as_of": max(self.last_bar[ticker] for ticker in bars),
+            "tickers": tickers,
+            "close": [self.last_close.get(ticker) for ticker in tickers],
+            "bars": bars,
+        }
 
 
 class NaturalGasPollingThread(BasePollingThread):
+    """Emits one "natural_gas" curve snapshot per poll that saw new bars."""
+    SOURCE = NaturalGasClient.SOURCE
+    ALIGN_TO_UPDATES = True
+
     def __init__(self, config: Config, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config = config
         self.gas_client = NaturalGasClient()
 
-    def _fetch_gas_prices(self, output_queue):
+    def poll_action(self):
         try:
-            horizon = getattr(self.config.general, "natural_gas_future_horizon_months", 6)
-            tickers = generate_ng_future_tickers(horizon)
-            for gas_data in self.gas_client.get_bulk_prices(tickers):
-
-                if "error" not in gas_data:
-                    output_queue.put({
-                        "type": "natural_gas",
-                        "location_id": gas_data["ticker"],
-                        "ingestion_timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
-                        "data": gas_data,
-                    })
-                else:
-                    log.warning(f"Error fetching natural gas prices {gas_data['error']}")
+            tickers = generate_ng_future_tickers(self.config.general.natural_gas_future_horizon_months)
+            snapshot = self.gas_client.get_curve_snapshot(tickers)
+            if snapshot is None:
+                log.debug("No new natural gas bars")
+                return
+            self.output_queue.put(encode_message({
+                "type": "natural_gas",
+                "location_id": None,
+                "ingestion_timestamp": snapshot["as_of"],
+                "data": snapshot,
+            }))
+            self.observe_update(snapshot["as_of"])
         except Exception as e:
             log.error(f"Error fetching natural gas prices: {e}")
 
-    def poll_action(self):
-        log.info(f"Polling natural gas prices after {self.interval_sec} seconds...")
-        self._fetch_gas_prices(self.output_queue)
-
     def stop_gracefully(self):
         log.info("Stopping gracefully...")
-        self.gas_client.shutdown_executor()
 
 if __name__ == "__main__":
     setup_logging()
     client = NaturalGasClient()
-    data = client.get_bulk_prices(tickers=generate_ng_future_tickers(
+    snapshot = client.get_curve_snapshot(generate_ng_future_tickers(
         months_ahead=6, include_front_month=True
     ))
-
-    for item in data:
-        log.info(json.dumps(item, indent=2))
\ No newline at end of file
+    log.info(json.dumps(snapshot and {k: v for k, v in snapshot.items() if k != "bars"}, indent=2))
\ No newline at end of file
@@ -6,21 +6,27 @@ import time
 from abc import ABC, abstractmethod
 from typing import List
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from .noaa_weather_client import WeatherPollingThread
+from .async_engine import AsyncIngestionEngine
+from .clients.eia_data_client import EIAPollingThread
+from .clients.ne_iso_client import NEISOPollingThread
+from .clients.noaa_weather_client import WeatherPollingThread
+from .clients.yahoo_finance_client import NaturalGasPollingThread
 from ..config import Config
 from .polling_thread import BasePollingThread
 from .streaming_thread import BaseStreamingThread
 from ..logging_helper import setup_logging
+from ..observability.prometheus import start_process_metrics_server
 
 log = logging.getLogger(__name__)
 
 
 class IngestionProcess(mp.Process):
     """
-    A multiprocessing.Process that orchestrates multiple ingestion threads:
-    - Polling tasks: run periodically at a fixed interval
-    - Streaming tasks: run continuously until stopped
+    A multiprocessing.Process that orchestrates multiple ingestion tasks:
+    - Polling tasks: run periodically as jobs of one scheduler on a shared
+      AsyncIngestionEngine (one event loop, per-host rate limits), at fixed-rate
+      intervals that adapt to each source's update cadence
+    - Streaming tasks: run continuously on their own threads until stopped
     """
     def __init__(self, output_queue: mp.Queue, config: Config):
         log.info(f"Constructing Data Ingestion Process Class")
@@ -31,6 +37,7 @@ class IngestionProcess(mp.Process):
         # We'll keep track of threads in lists
         self.polling_threads: List[BasePollingThread] = []
         self.streaming_threads: List[BaseStreamingThread] = []
+        self.engine: AsyncIngestionEngine = None
 
     def add_polling_task(self, polling_thread: BasePollingThread):
         """
@@ -47,16 +54,45 @@ class IngestionProcess(mp.Process):
         self.streaming_threads.append(streaming_thread)
 
     def configure_tasks(self):
-        for iso in self.config.general.isos_enabled:
+        for iso in [self.config.general.iso]:
             if iso == "ISO_NE":
                 self.polling_threads.append(
                     WeatherPollingThread(
                         self.config,
                         self.output_queue,
-                        interval_sec=10,
+                        interval_sec=self.config.data_ingestion.weather_poll_interval_sec,
                         name="WeatherPollingThread"
                     )
                 )
+                self.polling_threads.append(
+                    NEISOPollingThread(
+                        self.config,
+                        self.output_queue,
+                        interval_sec=self.config.data_ingestion.lmp_poll_interval_sec,
+                        name="NEISOPollingThread"
+                    )
+                )
+        if self.config.data_ingestion.enable_natural_gas_data:
+            self.polling_threads.append(
+                NaturalGasPollingThread(
+                    self.config,
+                    self.output_queue,
+                    interval_sec=self.config.data_ingestion.natural_gas_poll_interval_sec,
+                    name="NaturalGasPollingThread"
+                )
+            )
+        if self.config.data_ingestion.enable_eia_data:
+            try:
+                self.polling_threads.append(
+                    EIAPollingThread(
+                        self.config,
+                        self.output_queue,
+                        interval_sec=self.config.data_ingestion.eia_poll_interval_sec,
+                        name="EIAPollingThread"
+                    )
+                )
+            except RuntimeError as e:
+                log.warning(f"EIA data is enabled but not available, skipping it: {e}")
         log.info(f"Configuring Data Ingestion Processes")
         pass
 
@@ -64,12 +100,13 @@ class IngestionProcess(mp.Process):
     def run(self):
         """
         Invoked in the child process after ingestion_proc.start().
-        1) Start all threads.
+        1) Start the async engine and schedule polling tasks on it, start streaming threads.
         2) Wait until self._stop_event is set.
-        3) Join all threads gracefully.
+        3) Stop the engine and join all threads gracefully.
         """
         # Create a local threading.Event to control them:
         setup_logging()
+        start_process_metrics_server(self.config, "ingestion")
         log.info("Beginning ingestion process.")
         local_stop_event = threading.Event()
 
@@ -88,10 +125,12 @@ class IngestionProcess(mp.Process):
         bridging_thread = threading.Thread(target=mirror_stop_signals, daemon=True)
         bridging_thread.start()
 
-        # Actually start the ingestion threads
+        # Polling tasks are scheduled on the engine loop instead of owning a thread each
+        self.engine = AsyncIngestionEngine(self.config.data_ingestion)
+        self.engine.start()
         for t in self.polling_threads:
             t.stop_event = local_stop_event  # ensure it has the correct event reference
-            t.start()
+            self.engine.add_polling_task(t)
         for t in self.streaming_threads:
             t.stop_event = local_stop_event
             t.start()
@@ -102,10 +141,11 @@ class IngestionProcess(mp.Process):
                 time.sleep(1)
         finally:
             log.info(f"Attempting to stop sub-threads gracefully...")
-            for t in self.polling_threads + self.streaming_threads:
+            self.engine.stop()
+            for t in self.polling_threads:
                 t.stop_gracefully()
             # Join threads to clean up
-            for t in self.polling_threads + self.streaming_threads:
+            for t in self.streaming_threads:
                 t.join()
 
     def stop(self):
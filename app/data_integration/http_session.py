@@ -0,0 +1,125 @@
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+NOT_MODIFIED = 304
+
+
+class ConditionalValidators:
+    """
+    Thread-safe store of the ETag / Last-Modified validators seen per URL, used to
+    turn repeat GETs into If-None-Match / If-Modified-Since requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # url -> (etag, last_modified)
+        self._validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        with self._lock:
+            etag, last_modified = self._validators.get(url, (None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def update(self, url: str, response_headers):
+        """Record validators from a 200 response's headers."""
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                self._validators[url] = (etag, last_modified)
+
+    def forget(self, url: str):
+        with self._lock:
+            self._validators.pop(url, None)
+
+
+class PooledHTTPSession:
+    """
+    Thread-safe, connection-pooled HTTP session shared by the ingestion clients.
+
+    Connections are kept alive per host, so the executor threads reuse TCP/TLS
+    connections instead of handshaking on every request. Conditional GETs are
+    tracked per URL: the ETag / Last-Modified of the last 200 response whose body
+    get_json() parsed is sent back as If-None-Match / If-Modified-Since, and an
+    unchanged resource comes back as a cheap 304 with no body.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32, max_retries: int = 2,
+                 timeout: float = 30.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=max_retries,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=("GET",),
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.validators = ConditionalValidators()
+
+    def get(self, url: str, headers: Optional[dict] = None, conditional: bool = True, **kwargs) -> requests.Response:
+        """
+        GET url through the pooled session. When conditional is set, the validators
+        recorded by get_json() are sent, so the response may be a 304 (check
+        response.status_code == NOT_MODIFIED) meaning the body is unchanged.
+        """
+        request_headers = dict(headers or {})
+        if conditional:
+            request_headers.update(self.validators.request_headers(url))
+
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, headers=request_headers, **kwargs)
+
+    def get_json(self, url: str, headers: Optional[dict] = None, conditional: bool = True,
+                 **kwargs) -> Tuple[int, Optional[Any]]:
+        """
+        GET returning (status, parsed JSON body), like AsyncIngestionEngine.get. The
+        body is None for a 304 (unchanged since the last 200 for url) or any error
+        status. Validators are only recorded once the body parsed, so a response
+        that fails to parse is downloaded in full again on the next call.
+        """
+        response = self.get(url, headers=headers, conditional=conditional, **kwargs)
+        if response.status_code == NOT_MODIFIED or response.status_code >= 400:
+            return response.status_code, None
+        body = response.json()
+        if conditional:
+            self.validators.update(url, response.headers)
+        return response.status_code, body
+
+    def forget(self, url: str):
+        """Drop validators for url so the next GET downloads the full body."""
+        self.validators.forget(url)
+
+    def close(self):
+        self.session.close()
+
+
+_shared_session: Optional[PooledHTTPSession] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> PooledHTTPSession:
+    """Process-wide PooledHTTPSession, created on first use."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = PooledHTTPSession()
+        return _shared_session
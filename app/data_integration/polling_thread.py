@@ -1,6 +1,11 @@
+import math
 import threading
 from abc import ABC, abstractmethod
 import time
+from typing import Any, Optional
+
+from ..observability.metrics import SOURCE_POLL_DURATION
+from .scheduling import AdaptiveSchedule
 
 
 class BasePollingThread(threading.Thread, ABC):
@@ -8,12 +13,18 @@ class BasePollingThread(threading.Thread, ABC):
     Base class for polling tasks. Subclass this to implement your specific
     'fetch API every X seconds' logic.
     """
+    # Label of the data source in poll metrics
+    SOURCE = "unknown"
+    # Single-stream sources whose polls can be timed to the next expected update
+    ALIGN_TO_UPDATES = False
 
     def __init__(self, output_queue, interval_sec: float, name=None):
         super().__init__(name=name)
         self.output_queue = output_queue
         self.interval_sec = interval_sec
         self.stop_event = None
+        # Set by the engine when polling is adaptive
+        self.schedule: Optional[AdaptiveSchedule] = None
 
     @abstractmethod
     def poll_action(self):
@@ -23,18 +34,41 @@ class BasePollingThread(threading.Thread, ABC):
         """
         pass
 
+    async def poll_action_async(self, engine):
+        """
+        Coroutine form of poll_action, used when the task runs on the
+        AsyncIngestionEngine. Override this for native async I/O through
+        engine.get(); by default the blocking poll_action runs on the engine's
+        executor so existing tasks plug in unchanged.
+        """
+        await engine.run_blocking(self.poll_action)
+
+    def observe_update(self, source_time: float, key: Any = None):
+        """
+        Report the source timestamp of new data a poll saw, so an adaptive schedule
+        can follow the source's real update cadence. key separates independently
+        updating streams of one source.
+        """
+        if self.schedule is not None:
+            self.schedule.observe(source_time, key=key)
+
     def run(self):
         """
-        Loop until stop_event is set, calling poll_action() every interval_sec seconds.
+        Loop until stop_event is set, calling poll_action() every interval_sec seconds
+        at a fixed rate. A poll that overruns delays the next one but doesn't shift
+        the rest, and missed polls are skipped rather than run back to back.
         """
+        next_poll = time.monotonic()
         while not self.stop_event.is_set():
-            self.poll_action()
-            # Sleep, but check periodically if we've been signaled to stop
-            for _ in range(int(self.interval_sec)):
-                if self.stop_event.is_set():
-                    self.stop_gracefully()
-                    break
-                time.sleep(1)
+            with SOURCE_POLL_DURATION.labels(self.SOURCE).time():
+                self.poll_action()
+            next_poll += self.interval_sec
+            now = time.monotonic()
+            if next_poll < now and self.interval_sec > 0:
+                next_poll += math.ceil((now - next_poll) / self.interval_sec) * self.interval_sec
+            if self.stop_event.wait(max(0.0, next_poll - now)):
+                break
+        self.stop_gracefully()
 
 
     @abstractmethod
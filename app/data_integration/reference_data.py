@@ -0,0 +1,22 @@
+import os
+from typing import Optional
+
+import pandas as pd
+
+
+def load_iso_ne_nodes(path: Optional[str] = None) -> pd.DataFrame:
+    """ISO-NE pricing nodes that have coordinates, from the bundled reference CSV unless path is given."""
+    iso_ne_csv_path = path or os.path.join(os.getcwd(), "data", "reference", "iso_ne_nodes_april_2025.csv")
+    df = pd.read_csv(iso_ne_csv_path)
+    return df.dropna(subset=["Latitude", "Longitude"])
+
+
+def load_iso_nodes(iso: str, path: Optional[str] = None) -> pd.DataFrame:
+    return {
+        "ISO_NE": load_iso_ne_nodes
+    }[iso.upper()](path)
+
+
+def load_iso_location_ids(iso: str, path: Optional[str] = None) -> list:
+    """Unique node ids for an ISO, as the string location_ids used on ingestion messages."""
+    return list(dict.fromkeys(str(node_id) for node_id in load_iso_nodes(iso, path)["Node/Unit ID"]))
@@ -0,0 +1,71 @@
+import statistics
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+
+class AdaptiveSchedule:
+    """
+    Learns how often a source really publishes, from the source timestamps its polls
+    observe (forecast updateTime, LMP interval start, ...), and picks the next poll
+    interval from that.
+
+    - Single-stream sources (aligned=True) are polled once per update, at the time
+      the next update is expected to be visible: last source time + cadence +
+      publication lag. Until it shows up they are re-polled at a tenth of the cadence.
+    - Sources made of many independently updating streams, observed with a key
+      (e.g. one per NWS grid cell), have no single phase and are polled once per
+      cadence.
+
+    The base interval applies until the second update is seen, and again once the
+    source has been quiet for more than STALL_CADENCES cadences.
+    """
+    STALL_CADENCES = 3
+    RETRY_FRACTION = 0.1
+
+    def __init__(self, base_interval_sec: float, min_interval_sec: float, max_interval_sec: float,
+                 aligned: bool = False, history: int = 16):
+        self.base_interval_sec = base_interval_sec
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.aligned = aligned
+        # Time between consecutive updates of the same stream
+        self.cadences = deque(maxlen=history)
+        # Time from an update's source timestamp to the poll that first saw it
+        self.lags = deque(maxlen=history)
+        self.last_source_time: Dict[Any, float] = {}
+        self.latest_source_time: Optional[float] = None
+
+    def observe(self, source_time: float, seen_at: Optional[float] = None, key: Any = None):
+        previous = self.last_source_time.get(key)
+        if previous is not None and source_time <= previous:
+            return
+        self.last_source_time[key] = source_time
+        self.latest_source_time = max(self.latest_source_time or source_time, source_time)
+        if previous is None:
+            # The first update seen may be arbitrarily old, it says nothing about lag
+            return
+        self.cadences.append(source_time - previous)
+        self.lags.append(max(0.0, (seen_at or time.time()) - source_time))
+
+    @property
+    def cadence(self) -> Optional[float]:
+        return statistics.median(self.cadences) if self.cadences else None
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, self.min_interval_sec), self.max_interval_sec)
+
+    def next_poll(self, now: float) -> Tuple[float, Optional[float]]:
+        """(poll interval, epoch seconds of the next poll or None for one interval from now)"""
+        cadence = self.cadence
+        # The smallest lag is the closest to the real publication delay, later polls only add to it
+        lag = min(self.lags) if self.lags else 0.0
+        if cadence is None or now - self.latest_source_time > self.STALL_CADENCES * cadence + lag:
+            return self.base_interval_sec, None
+        if not self.aligned:
+            return self._clamp(cadence), None
+        expected = self.latest_source_time + cadence + lag
+        if expected > now:
+            return self._clamp(cadence), expected
+        # Due but not visible yet
+        return self._clamp(cadence * self.RETRY_FRACTION), None
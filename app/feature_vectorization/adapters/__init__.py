@@ -1 +1,3 @@
-from feature_adapter_weather import WeatherFeatureAdapter
\ No newline at end of file
+from .feature_adapter_weather import WeatherFeatureAdapter
+from .feature_adapter_lmp import LmpFeatureAdapter
+from .feature_adapter_natural_gas import NaturalGasFeatureAdapter
@@ -0,0 +1,82 @@
+from typing import Any, Dict, List, Tuple
+import logging
+
+import numpy as np
+import pyarrow as pa
+
+from ..feature_adapter import FeatureAdapter
+from ..archive import message_event_time
+from ..horizons import Horizon
+from ...messages import LMP_COMPONENTS
+
+log = logging.getLogger(__name__)
+
+
+class LmpFeatureAdapter(FeatureAdapter):
+    """
+    Five-minute LMPs. Each message is one interval for every pnode, as arrays:
+
+        {"type": "lmp", "location_id": None, "ingestion_timestamp": <interval start>,
+         "data": {"interval_start": epoch seconds, "location_ids": [...],
+                  "lmp": [...], "energy": [...], "congestion": [...], "loss": [...]}}
+
+    The latest components are the feature vector of each node. The archive is long
+    format, one row per (interval, node) with the components as typed columns, which
+    is what training reads its realized targets from.
+    """
+    columnar = True
+    replay_columns = ["event_time", "location_id", *LMP_COMPONENTS]
+
+    def __init__(self, config, *args, **kwargs):
+        super().__init__(config, "lmp", *args, **kwargs)
+        self.feature_vector_size = len(LMP_COMPONENTS)
+
+    def can_handle(self, msg_type: str) -> bool:
+        return msg_type == "lmp"
+
+    def vectorize(self, data: Any, past_data: Any) -> Tuple[List[Horizon], List[float]]:
+        raise NotImplementedError("LMP messages are columnar, use vectorize_columnar()")
+
+    def vectorize_columnar(self, data: Any) -> Tuple[List[Any], List[Horizon], np.ndarray]:
+        interval = data["data"]
+        block = np.column_stack([np.asarray(interval[c], dtype=np.float32) for c in LMP_COMPONENTS])
+        return list(interval["location_ids"]), list(Horizon), block
+
+    def fingerprint(self, data: Any) -> str:
+        # An interval's prices don't change once published on the current/all route
+        return str(data["data"]["interval_start"])
+
+    def archive(self, data: Any, feature_vector: Any = None) -> None:
+        interval = data["data"]
+        columns = {"location_id": pa.array(np.asarray(interval["location_ids"], dtype=str))}
+        for component in LMP_COMPONENTS:
+            columns[component] = pa.array(np.asarray(interval[component], dtype=np.float32))
+        if feature_vector is not None:
+            block = np.asarray(feature_vector, dtype=np.float32)
+            offsets = np.arange(0, block.size + 1, block.shape[1], dtype=np.int32)
+            columns["features"] = pa.ListArray.from_arrays(pa.array(offsets), pa.array(block.ravel()))
+        self.archive_writer.append_columns(message_event_time(data), columns)
+
+    @classmethod
+    def messages_from_table(cls, table: pa.Table, message_type: str) -> List[Tuple[float, Dict[str, Any]]]:
+        # One columnar message per archived interval
+        event_times = table.column("event_time").to_numpy()
+        order = np.argsort(event_times, kind="stable")
+        event_times = event_times[order]
+        location_ids = np.asarray(table.column("location_id").to_numpy(zero_copy_only=False)[order], dtype=str)
+        components = {c: table.column(c).to_numpy().astype(np.float32)[order] for c in LMP_COMPONENTS}
+        starts = np.flatnonzero(np.r_[True, event_times[1:] != event_times[:-1]])
+        messages = []
+        for start, end in zip(starts, np.r_[starts[1:], len(event_times)]):
+            interval_start = float(event_times[start])
+            messages.append((interval_start, {
+                "type": message_type,
+                "location_id": None,
+                "ingestion_timestamp": interval_start,
+                "data": {
+                    "interval_start": interval_start,
+                    "location_ids": location_ids[start:end],
+                    **{c: values[start:end] for c, values in components.items()},
+                },
+            }))
+        return messages
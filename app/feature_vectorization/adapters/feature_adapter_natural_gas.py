@@ -0,0 +1,59 @@
+from typing import Any, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from ..feature_adapter import FeatureAdapter
+from ..horizons import Horizon
+
+log = logging.getLogger(__name__)
+
+
+class NaturalGasFeatureAdapter(FeatureAdapter):
+    """
+    Henry Hub futures curve. Each message is one snapshot of the whole strip:
+
+        {"type": "natural_gas", "location_id": None, "ingestion_timestamp": <newest bar>,
+         "data": {"as_of": epoch seconds, "tickers": [front, M+1, ...],
+                  "close": [...], "bars": {ticker: {"time": [...], "close": [...], ...}}}}
+
+    The feature vector is the latest close by position on the curve (front month
+    first), so it keeps its meaning across contract rolls. The curve isn't tied to
+    a pricing node and is stored in the tensor's global row, which every location
+    reads.
+    """
+    columnar = True
+
+    def __init__(self, config, *args, **kwargs):
+        super().__init__(config, "natural_gas", *args, **kwargs)
+        # Front month plus the months ahead
+        self.feature_vector_size = config.general.natural_gas_future_horizon_months + 1
+
+    def can_handle(self, msg_type: str) -> bool:
+        return msg_type == "natural_gas"
+
+    def vectorize(self, data: Any, past_data: Any) -> Tuple[List[Horizon], List[float]]:
+        raise NotImplementedError("Natural gas messages are columnar, use vectorize_columnar()")
+
+    def vectorize_columnar(self, data: Any) -> Tuple[List[Optional[str]], List[Horizon], np.ndarray]:
+        closes = [np.nan if close is None else close for close in data["data"]["close"]]
+        curve = np.full(self.feature_vector_size, np.nan, dtype=np.float32)
+        n = min(len(closes), self.feature_vector_size)
+        curve[:n] = closes[:n]
+        # Contracts that haven't traded yet take the nearest earlier (or later) price on the curve
+        known = np.flatnonzero(~np.isnan(curve))
+        if known.size:
+            nearest = known[np.clip(np.searchsorted(known, np.arange(curve.size), side="right") - 1, 0, None)]
+            curve = curve[nearest]
+        else:
+            curve[:] = 0.0
+        return [None], list(Horizon), curve[None, :]
+
+    def fingerprint(self, data: Any) -> str:
+        return str(data["data"]["as_of"])
+
+    def archive(self, data: Any, feature_vector: Any = None) -> None:
+        # The columnar path hands over a (1, width) block
+        if feature_vector is not None:
+            feature_vector = np.asarray(feature_vector).ravel()
+        super().archive(data, feature_vector)
@@ -1,23 +1,41 @@
-from typing import List, Any, Tuple
-import re
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
 import logging
+
+import numpy as np
+
+from ..archive import message_event_time
 from ..feature_adapter import FeatureAdapter
 from ..horizons import Horizon
+from ...messages import WEATHER_PERIOD_FIELDS, weather_forecast_data
 
 log = logging.getLogger(__name__)
 
+FEATURES_PER_PERIOD = 12
+MAX_PERIODS = 14
+
+
 class WeatherFeatureAdapter(FeatureAdapter):
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.feature_vector_size = 168 # 12 features * 14 days
+    def __init__(self, config, *args, **kwargs):
+        super().__init__(config, "weather", *args, **kwargs)
+        self.feature_vector_size = FEATURES_PER_PERIOD * MAX_PERIODS # 12 features * 14 days
 
     def can_handle(self, msg_type: str) -> bool:
         return msg_type == "weather"
 
     def vectorize(self, data: Any, past_data: Any) ->  Tuple[List[Horizon], List[float]]:
         """
-        Converts a weather.gov-style forecast JSON into a fixed-length vector.
+        Converts one weather message into a fixed-length vector.
+        Thin wrapper over vectorize_batch for a single message.
+        """
+        horizons, block = self.vectorize_batch([data], [past_data])
+        return horizons[0], block[0].tolist()
+
+    def vectorize_batch(self, data: List[Any], past_data: List[Any]) -> Tuple[List[List[Horizon]], np.ndarray]:
+        """
+        Converts many weather messages into an (N, 168) float32 block.
 
         Each period produces 12 features:
         - temperature (F)
@@ -30,97 +48,81 @@ class WeatherFeatureAdapter(FeatureAdapter):
         - temperature trend (-1/0/1)
         - rain, snow, cloud, storm indicators (0/1 each)
 
-        Total vector = [features for N periods], padded with 0.0 to match self.feature_vector_size.
+        Messages arrive with the period fields already extracted into a float block
+        (see app.messages), so this only stacks them and derives the dew point on
+        whole arrays. Nodes fanned out from the same grid cell forecast share one
+        row. Rows are zero padded past the last period.
         """
+        n = len(data)
         # Throw exception quickly if the data is not formatted as expected (ValueError)
-        periods = data.get('data').get('forecast').get('periods')
-        vector = []
-
-        for period in periods:
-            # 1. Temperature
-            temperature = self._safe_float(period.get("temperature"))
-
-            # 2. Crude dew point estimate (temp - 4 if high RH, else temp - 10)
-            pop = self._safe_float(period.get("probabilityOfPrecipitation", {}).get("value"), 0)
-            dew_point = temperature - 4 if pop >= 80 else temperature - 10
-
-            # 3. Precipitation Probability
-            precip_prob = pop
-
-            # 4. Wind Speed (average)
-            wind_speed_avg = self._parse_avg_wind_speed(period.get("windSpeed", "0 mph"))
-
-            # 5. Wind Speed (gust max)
-            wind_speed_max = self._parse_max_wind_speed(period.get("windSpeed", "0 mph"))
-
-            # 6. Wind Direction (° from N)
-            wind_dir = self._wind_direction_to_deg(period.get("windDirection", "N"))
-
-            # 7. isDaytime
-            is_daytime = 1 if period.get("isDaytime", False) else 0
-
-            # 8. Temp trend: rising=1, falling=-1, else 0
-            trend = {"rising": 1, "falling": -1}.get(period.get("temperatureTrend", "").lower(), 0)
-
-            # 9–12. Condition Indicators
-            forecast = period.get("shortForecast", "").lower()
-            is_rain = 1 if "rain" in forecast else 0
-            is_snow = 1 if "snow" in forecast else 0
-            is_cloud = 1 if any(k in forecast for k in ["cloud", "overcast"]) else 0
-            is_storm = 1 if any(k in forecast for k in ["thunder", "storm", "lightning"]) else 0
-
-            vector.extend([
-                temperature,
-                dew_point,
-                precip_prob,
-                wind_speed_avg,
-                wind_speed_max,
-                wind_dir,
-                is_daytime,
-                trend,
-                is_rain,
-                is_snow,
-                is_cloud,
-                is_storm,
-            ])
-
-            if len(vector) >= self.feature_vector_size:
-                break
-
-        # Pad if shorter than expected
-        if len(vector) < self.feature_vector_size:
-            log.info(f"Padding feature vector from {len(vector)} to {self.feature_vector_size}")
-            vector.extend([0.0] * (self.feature_vector_size - len(vector)))
-
-        return [Horizon.five_minute, Horizon.one_hour, Horizon.one_day], vector[:self.feature_vector_size]
-
-    def _parse_avg_wind_speed(self, wind_str: str) -> float:
-        speeds = re.findall(r'\d+', wind_str)
-        if not speeds:
-            return 0.0
-        values = list(map(int, speeds))
-        return sum(values) / len(values)
-
-    def _parse_max_wind_speed(self, wind_str: str) -> float:
-        speeds = re.findall(r'\d+', wind_str)
-        if not speeds:
-            return 0.0
-        return max(map(int, speeds))
-
-    def _wind_direction_to_deg(self, direction: str) -> float:
-        dir_map = {
-            'N': 0, 'NNE': 22.5, 'NE': 45, 'ENE': 67.5,
-            'E': 90, 'ESE': 112.5, 'SE': 135, 'SSE': 157.5,
-            'S': 180, 'SSW': 202.5, 'SW': 225, 'WSW': 247.5,
-            'W': 270, 'WNW': 292.5, 'NW': 315, 'NNW': 337.5
+        forecasts = [self._forecast_data(msg) for msg in data]
+
+        # Messages carrying the same forecast share one extracted row
+        unique_rows = {}
+        row_of_msg = np.empty(n, dtype=np.int64)
+        for i, msg in enumerate(data):
+            key = self._forecast_key(msg, forecasts[i])
+            row_of_msg[i] = unique_rows.setdefault(key, len(unique_rows))
+        periods = np.zeros((len(unique_rows), MAX_PERIODS, len(WEATHER_PERIOD_FIELDS)), dtype=np.float32)
+        valid = np.zeros((len(unique_rows), MAX_PERIODS), dtype=bool)
+        for i in range(n):
+            values = np.asarray(forecasts[i]["periods"], dtype=np.float32)[:MAX_PERIODS]
+            periods[row_of_msg[i], :len(values)] = values
+            valid[row_of_msg[i], :len(values)] = True
+
+        features = self._period_features(periods, valid)
+        block = features.reshape(len(unique_rows), self.feature_vector_size)[row_of_msg]
+
+        horizons = [Horizon.five_minute, Horizon.one_hour, Horizon.one_day]
+        return [horizons] * n, block
+
+    @staticmethod
+    def _forecast_data(msg: Any) -> Dict[str, Any]:
+        payload = msg.get('data')
+        if 'periods' in payload:
+            return payload
+        # Archived before messages carried extracted periods
+        return weather_forecast_data(payload.get('forecast'))
+
+    def fingerprint(self, data: Any) -> str:
+        # NWS stamps every forecast with updateTime, which is all we need to know
+        # whether it changed since the last poll
+        forecast = self._forecast_data(data)
+        if forecast.get('update_time') is not None:
+            return f"{data.get('data').get('grid_id')}|{forecast['update_time']}"
+        periods = np.ascontiguousarray(forecast['periods'], dtype=np.float32)
+        return hashlib.blake2b(periods.tobytes(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _forecast_key(msg: Any, forecast: Dict[str, Any]):
+        grid_id = msg.get('data').get('grid_id')
+        if grid_id and forecast.get('update_time') is not None:
+            return grid_id, forecast['update_time']
+        return id(forecast['periods'])
+
+    @staticmethod
+    def _period_features(periods: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """(rows, MAX_PERIODS, FEATURES_PER_PERIOD) features from extracted period values."""
+        temperature, pop = periods[..., 0], periods[..., 1]
+        # Crude dew point estimate (temp - 4 if high RH, else temp - 10)
+        dew_point = np.where(pop >= 80, temperature - 4, temperature - 10) * valid
+        return np.concatenate([temperature[..., None], dew_point[..., None], periods[..., 1:]], axis=-1)
+
+    def archive_row(self, data: Any, feature_vector: Optional[np.ndarray]) -> Dict[str, Any]:
+        # The raw forecast is archived by the polling thread as "weather_raw", once per
+        # grid cell update. This row keeps the extracted periods it was vectorized from.
+        payload = data.get('data')
+        forecast = self._forecast_data(data)
+        return {
+            "event_time": message_event_time(data),
+            "location_id": data.get("location_id"),
+            "payload": json.dumps({
+                "lat": payload.get('lat'),
+                "lon": payload.get('lon'),
+                "grid_id": payload.get('grid_id'),
+                "update_time": forecast.get('update_time'),
+                "period_start": np.asarray(forecast['period_start'], dtype=np.float64).tolist(),
+                "periods": np.asarray(forecast['periods'], dtype=np.float32).tolist(),
+            }),
+            "features": None if feature_vector is None else np.asarray(feature_vector, dtype=np.float32).tolist(),
         }
-        return dir_map.get(direction.upper(), 0.0)
-
-    def _safe_float(self, value: Any, default: float = 0.0) -> float:
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            return default
-
-    def archive(self, msg: Any) -> None:
-        pass
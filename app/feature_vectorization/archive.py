@@ -0,0 +1,274 @@
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+log = logging.getLogger(__name__)
+
+# Files with these prefixes are ignored by pyarrow datasets, so in-progress
+# writes are never visible to readers
+TMP_PREFIX = "."
+COMPACTED_PREFIX = "compacted-"
+
+
+def message_event_time(msg: Dict[str, Any]) -> float:
+    """Epoch seconds of an ingestion message, from its ingestion_timestamp if present."""
+    timestamp = msg.get("ingestion_timestamp")
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if timestamp:
+        return datetime.fromisoformat(timestamp).timestamp()
+    return time.time()
+
+
+def partition_dir(root: str, msg_type: str, event_time: float) -> str:
+    ts = datetime.fromtimestamp(event_time, tz=timezone.utc)
+    return os.path.join(root, msg_type, f"date={ts:%Y-%m-%d}", f"hour={ts:%H}")
+
+
+def _write_table_atomically(table: pa.Table, directory: str, file_name: str, compression: str,
+                            row_group_size: int) -> str:
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{TMP_PREFIX}{file_name}")
+    path = os.path.join(directory, file_name)
+    pq.write_table(table, tmp_path, compression=compression, row_group_size=row_group_size)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_partitioned(table: pa.Table, root: str, msg_type: str, file_name: str, compression: str = "zstd",
+                      row_group_size: int = 50_000) -> List[str]:
+    """
+    Write a table with an event_time column into its hour partitions, as file_name in
+    each one. Writing the same file_name again replaces those files instead of adding
+    rows, which makes re-running an import idempotent.
+    """
+    hours = table.column("event_time").to_numpy() // 3600
+    written = []
+    for hour in np.unique(hours):
+        written.append(_write_table_atomically(
+            table.filter(pa.array(hours == hour)),
+            partition_dir(root, msg_type, float(hour) * 3600),
+            file_name,
+            compression,
+            row_group_size,
+        ))
+    return written
+
+
+class ColumnarArchiveWriter:
+    """
+    Append-only Parquet archive for one message type, partitioned as
+    <root>/<msg_type>/date=YYYY-MM-DD/hour=HH/*.parquet.
+
+    Rows are buffered in memory per partition and flushed as one compressed file
+    per partition once row_group_size rows are buffered or flush_interval_sec has
+    passed. Closed hours are periodically compacted into a single file so the
+    number of files stays proportional to hours, not flushes.
+
+    Every row needs an `event_time` column (epoch seconds, UTC).
+    """
+
+    def __init__(self, root: str, msg_type: str, row_group_size: int = 50_000, flush_interval_sec: float = 60,
+                 compression: str = "zstd", compaction_interval_sec: float = 3600,
+                 compaction_grace_sec: float = 900):
+        self.root = root
+        self.msg_type = msg_type
+        self.row_group_size = row_group_size
+        self.flush_interval_sec = flush_interval_sec
+        self.compression = compression
+        self.compaction_interval_sec = compaction_interval_sec
+        self.compaction_grace_sec = compaction_grace_sec
+
+        self._buffers: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # Whole column blocks from append_columns, written alongside the row buffers
+        self._tables: Dict[str, List[pa.Table]] = defaultdict(list)
+        # Epoch hour -> partition directory, formatting it per row is measurable at replay speed
+        self._partition_dirs: Dict[int, str] = {}
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        self._last_compaction = time.monotonic()
+        self._seq = 0
+
+    def _partition_dir(self, event_time: float) -> str:
+        hour = int(event_time // 3600)
+        directory = self._partition_dirs.get(hour)
+        if directory is None:
+            directory = self._partition_dirs[hour] = partition_dir(self.root, self.msg_type, hour * 3600)
+        return directory
+
+    def append(self, row: Dict[str, Any]):
+        self._buffers[self._partition_dir(row["event_time"])].append(row)
+        self._buffered_rows += 1
+        if self._buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def append_columns(self, event_time: float, columns: Dict[str, Any]):
+        """
+        Append many rows sharing one event_time, given as equal-length columns
+        (NumPy or Arrow arrays), without going through per-row dicts.
+        """
+        table = pa.table(columns)
+        table = table.add_column(0, "event_time", pa.array([float(event_time)] * table.num_rows, pa.float64()))
+        self._tables[self._partition_dir(event_time)].append(table)
+        self._buffered_rows += table.num_rows
+        if self._buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def flush_if_due(self):
+        now = time.monotonic()
+        if self._buffered_rows and now - self._last_flush >= self.flush_interval_sec:
+            self.flush()
+        if now - self._last_compaction >= self.compaction_interval_sec:
+            self._last_compaction = now
+            self.compact()
+
+    def flush(self) -> List[str]:
+        written = []
+        for directory in set(self._buffers) | set(self._tables):
+            self._seq += 1
+            file_name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._seq}.parquet"
+            rows = self._buffers.get(directory)
+            tables = ([pa.Table.from_pylist(rows)] if rows else []) + self._tables.get(directory, [])
+            table = pa.concat_tables(tables, promote_options="default") if len(tables) > 1 else tables[0]
+            written.append(_write_table_atomically(
+                table, directory, file_name, self.compression, self.row_group_size
+            ))
+        if written:
+            log.debug(f"Flushed {self._buffered_rows} {self.msg_type} rows into {len(written)} archive files")
+        self._buffers.clear()
+        self._tables.clear()
+        self._partition_dirs.clear()
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        return written
+
+    def compact(self):
+        """Merge the part files of every hour partition that closed more than compaction_grace_sec ago."""
+        type_root = os.path.join(self.root, self.msg_type)
+        if not os.path.isdir(type_root):
+            return
+        cutoff = time.time() - self.compaction_grace_sec
+        for date_entry in os.scandir(type_root):
+            if not date_entry.is_dir() or not date_entry.name.startswith("date="):
+                continue
+            for hour_entry in os.scandir(date_entry.path):
+                if not hour_entry.is_dir() or not hour_entry.name.startswith("hour="):
+                    continue
+                hour_start = datetime.strptime(
+                    f"{date_entry.name[5:]} {hour_entry.name[5:]}", "%Y-%m-%d %H"
+                ).replace(tzinfo=timezone.utc).timestamp()
+                if hour_start + 3600 > cutoff:
+                    continue
+                try:
+                    compact_partition(hour_entry.path, self.compression, self.row_group_size)
+                except Exception as e:
+                    log.error(f"Failed compacting archive partition {hour_entry.path}: {e}", exc_info=True)
+
+    def close(self):
+        self.flush()
+
+
+def compact_partition(directory: str, compression: str = "zstd", row_group_size: int = 50_000) -> Optional[str]:
+    """Rewrite every visible parquet file in a partition directory as one file."""
+    parts = sorted(
+        entry.path for entry in os.scandir(directory)
+        if entry.name.endswith(".parquet") and not entry.name.startswith(TMP_PREFIX)
+    )
+    if len(parts) < 2:
+        return None
+    table = pa.concat_tables([pq.read_table(part) for part in parts], promote_options="default")
+    path = _write_table_atomically(
+        table, directory, f"{COMPACTED_PREFIX}{int(time.time() * 1000)}.parquet", compression, row_group_size
+    )
+    for part in parts:
+        os.remove(part)
+    log.info(f"Compacted {len(parts)} files into {path}")
+    return path
+
+
+class ArchiveReader:
+    """
+    Reads the archive written by ColumnarArchiveWriter. Column selection and time
+    ranges are pushed down: date/hour partitions outside the range are never
+    opened and only the requested columns are decoded.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def partitions(self, msg_type: str) -> List[Tuple[str, str]]:
+        """Every (date, hour) partition archived for msg_type, oldest first."""
+        type_root = os.path.join(self.root, msg_type)
+        if not os.path.isdir(type_root):
+            return []
+        found = []
+        for date_entry in os.scandir(type_root):
+            if not date_entry.is_dir() or not date_entry.name.startswith("date="):
+                continue
+            for hour_entry in os.scandir(date_entry.path):
+                if hour_entry.is_dir() and hour_entry.name.startswith("hour="):
+                    found.append((date_entry.name[5:], hour_entry.name[5:]))
+        return sorted(found)
+
+    @staticmethod
+    def partition_filter(date: str, hour: str) -> ds.Expression:
+        return (ds.field("date") == date) & (ds.field("hour") == hour)
+
+    def dataset(self, msg_type: str) -> Optional[ds.Dataset]:
+        type_root = os.path.join(self.root, msg_type)
+        if not os.path.isdir(type_root):
+            return None
+        return ds.dataset(
+            type_root,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("date", pa.string()), ("hour", pa.string())]), flavor="hive"),
+        )
+
+    @staticmethod
+    def time_filter(start: Optional[float] = None, end: Optional[float] = None) -> Optional[ds.Expression]:
+        """Filter on [start, end) epoch seconds, including the matching partition filter."""
+        expression = None
+
+        def _and(a, b):
+            return b if a is None else a & b
+
+        if start is not None:
+            ts = datetime.fromtimestamp(start, tz=timezone.utc)
+            date, hour = f"{ts:%Y-%m-%d}", f"{ts:%H}"
+            partitions = (ds.field("date") > date) | ((ds.field("date") == date) & (ds.field("hour") >= hour))
+            expression = _and(expression, partitions & (ds.field("event_time") >= start))
+        if end is not None:
+            ts = datetime.fromtimestamp(end, tz=timezone.utc)
+            date, hour = f"{ts:%Y-%m-%d}", f"{ts:%H}"
+            partitions = (ds.field("date") < date) | ((ds.field("date") == date) & (ds.field("hour") <= hour))
+            expression = _and(expression, partitions & (ds.field("event_time") < end))
+        return expression
+
+    def _filter(self, start, end, filter):
+        expression = self.time_filter(start, end)
+        if filter is not None:
+            expression = filter if expression is None else expression & filter
+        return expression
+
+    def read(self, msg_type: str, columns: Optional[List[str]] = None, start: Optional[float] = None,
+             end: Optional[float] = None, filter: Optional[ds.Expression] = None) -> Optional[pa.Table]:
+        dataset = self.dataset(msg_type)
+        if dataset is None:
+            return None
+        return dataset.to_table(columns=columns, filter=self._filter(start, end, filter))
+
+    def iter_batches(self, msg_type: str, columns: Optional[List[str]] = None, start: Optional[float] = None,
+                     end: Optional[float] = None, filter: Optional[ds.Expression] = None,
+                     batch_size: int = 65_536) -> Iterator[pa.RecordBatch]:
+        dataset = self.dataset(msg_type)
+        if dataset is None:
+            return
+        yield from dataset.to_batches(columns=columns, filter=self._filter(start, end, filter), batch_size=batch_size)
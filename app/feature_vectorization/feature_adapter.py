@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import json
-from datetime import datetime, timezone
+import math
+import hashlib
+import numpy as np
+import pyarrow as pa
+from .archive import ColumnarArchiveWriter, message_event_time
 from .horizons import Horizon
 from ..config import Config
 
@@ -17,10 +21,22 @@ class FeatureAdapter(ABC):
     """
     feature_vector_size: int
     training_data_volume_path: str
+    # Columnar adapters take one message carrying many locations (location_id None,
+    # per-location arrays in data) and are vectorized with vectorize_columnar()
+    columnar: bool = False
+    # Only one of the processes archiving a message type should compact its partitions
+    compact_archive: bool = True
+    # Archived columns messages_from_table() needs to rebuild ingestion messages
+    replay_columns: List[str] = ["event_time", "location_id", "payload"]
 
     def __init__(self, config:Config, message_type: str):
         self.training_data_volume_path = config.training.training_data_volume_path
         self.message_type = message_type
+        self.archive_config = config.archive
+
+        # Created on first use, so it (and its row buffers) belong to whichever
+        # process does the archiving rather than the one that built the adapter
+        self._archive_writer: Optional[ColumnarArchiveWriter] = None
 
         # Ensure archive path exists
         os.makedirs(os.path.join(
@@ -38,13 +54,96 @@ class FeatureAdapter(ABC):
         """ Vectorize the input and list horizons affected"""
         pass
 
-    @abstractmethod
-    def archive(self, data: Any) -> None:
+    def vectorize_batch(self, data: List[Any], past_data: List[Any]) -> Tuple[List[List[Horizon]], np.ndarray]:
+        """
+        Vectorize many messages at once. Returns the horizons affected by each message
+        and an (N, feature_vector_size) float32 block, one row per message.
+
+        The default just loops over vectorize(); adapters on hot paths should override it.
+        """
+        block = np.zeros((len(data), self.feature_vector_size), dtype=np.float32)
+        horizons = []
+        for i, (msg, past) in enumerate(zip(data, past_data)):
+            msg_horizons, vector = self.vectorize(msg, past_data=past)
+            horizons.append(msg_horizons)
+            block[i, :len(vector)] = vector
+        return horizons, block
+
+    def vectorize_columnar(self, data: Any) -> Tuple[List[Any], List[Horizon], np.ndarray]:
+        """
+        Vectorize one columnar message. Returns the location_ids it covers, the
+        horizons affected and an (len(location_ids), feature_vector_size) float32 block.
+        """
+        raise NotImplementedError(f"{type(self).__name__} is not a columnar adapter")
+
+    def fingerprint(self, data: Any) -> str:
+        """
+        Content fingerprint of a message's payload. Two messages with the same
+        fingerprint for the same location produce the same features, so the feature
+        store skips the second one. Adapters whose sources carry an update timestamp
+        should override this with something cheaper than hashing the payload.
+        """
+        payload = json.dumps(data.get("data"), sort_keys=True, default=str).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    @property
+    def archive_writer(self) -> ColumnarArchiveWriter:
+        if self._archive_writer is None:
+            self._archive_writer = ColumnarArchiveWriter(
+                root=self.training_data_volume_path,
+                msg_type=self.message_type,
+                row_group_size=self.archive_config.row_group_size,
+                flush_interval_sec=self.archive_config.flush_interval_sec,
+                compression=self.archive_config.compression,
+                compaction_interval_sec=(
+                    self.archive_config.compaction_interval_sec if self.compact_archive else math.inf
+                ),
+                compaction_grace_sec=self.archive_config.compaction_grace_sec,
+            )
+        return self._archive_writer
+
+    def archive_row(self, data: Any, feature_vector: Optional[np.ndarray]) -> Dict[str, Any]:
+        """
+        The archive row for one message: event time, location, the raw payload and the
+        features it produced. Override to archive typed columns instead of raw JSON.
+        """
+        return {
+            "event_time": message_event_time(data),
+            "location_id": data.get("location_id"),
+            "payload": json.dumps(data.get("data"), default=str),
+            "features": None if feature_vector is None else np.asarray(feature_vector, dtype=np.float32).tolist(),
+        }
+
+    @classmethod
+    def messages_from_table(cls, table: pa.Table, message_type: str) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Rebuild the ingestion messages an archive table of message_type was written
+        from, as (event_time, message) pairs in event-time order. The default reads
+        back the rows of archive_row(); adapters archiving typed columns override it.
+        A classmethod, so replay workers decode without the (stateful) adapter.
+        """
+        event_times = table.column("event_time").to_numpy()
+        location_ids = table.column("location_id").to_pylist()
+        payloads = table.column("payload").to_pylist()
+        return [
+            (float(event_times[i]), {
+                "type": message_type,
+                "location_id": location_ids[i],
+                "ingestion_timestamp": float(event_times[i]),
+                "data": json.loads(payloads[i]),
+            })
+            for i in np.argsort(event_times, kind="stable")
+        ]
+
+    def archive(self, data: Any, feature_vector: Optional[np.ndarray] = None) -> None:
         """Save an archived format for this message type"""
-        with open(
-            os.path.join(self.training_data_volume_path,
-                        self.message_type,
-                         f"{datetime.now(tz=timezone.utc).isoformat()}.json"),
-            "w"
-        ) as output_f:
-            json.dump(data, output_f)
+        self.archive_writer.append(self.archive_row(data, feature_vector))
+
+    def flush_archive(self, force: bool = False) -> None:
+        """Flush buffered archive rows if due (or unconditionally with force)."""
+        if self._archive_writer is None:
+            return
+        if force:
+            self._archive_writer.flush()
+        else:
+            self._archive_writer.flush_if_due()
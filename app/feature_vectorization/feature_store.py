@@ -1,12 +1,13 @@
 import multiprocessing as mp
+import queue
 import time
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Tuple
 import logging
-import random  # only if simulating data
 from collections import defaultdict
 
 from .feature_adapter import FeatureAdapter
+from .shared_feature_tensor import SharedFeatureTensor
 from .adapters.feature_adapter_weather import WeatherFeatureAdapter
 # from .feature_adapter_load import LoadForecastFeatureAdapter
 # from .feature_adapter_generation import GenerationMixFeatureAdapter
@@ -16,6 +17,9 @@ from .adapters.feature_adapter_weather import WeatherFeatureAdapter
 
 from ..config import Config
 from ..logging_helper import setup_logging
+from ..messages import COLUMNAR_FIELDS, decode_message
+from ..observability.metrics import FEATURE_STORE_MESSAGES, FEATURE_STORE_UPDATES, VECTORIZE_BATCH_SIZE, VECTORIZE_LATENCY
+from ..observability.prometheus import start_process_metrics_server
 
 log = logging.getLogger(__name__)
 
@@ -28,108 +32,281 @@ def default_utcnow() -> datetime:
 class FeatureStoreProcess(mp.Process):
     """
     A multiprocessing process that receives raw data messages, vectorizes them,
-    and places each vector into shared_feature_store[(location_id, horizon)].
+    and writes each vector into the shared feature tensor at (msg_type, location_id, horizon).
+
+    Messages are consumed in micro-batches bounded by feature_store.batch_max_size and
+    feature_store.batch_max_latency_ms. Within a batch only the newest message per
+    (msg_type, location_id) is kept, and each adapter vectorizes its share of the
+    batch in one vectorize_batch() call.
+
+    The last vectorized content fingerprint per (msg_type, location_id) is kept, and
+    messages whose fingerprint hasn't changed are dropped before vectorization, so
+    downstream load follows real data changes rather than poll frequency.
 
     Instead of sending large vectors to downstream processes, it sends small
     "update handle" messages with (location_id, horizon) to output_queue.
+
+    With feature_store.shards > 1 one process runs per shard, each fed by its own
+    input channel through a sharding.ShardRouter, so it only ever sees (and writes
+    the tensor rows of) the locations it owns.
     """
 
     def __init__(
         self,
         config: Config,
-        input_queue: mp.Queue,             # raw data from ingestion
+        input_queue: mp.Queue,             # encoded messages from ingestion (app.messages)
         output_queue: mp.Queue,            # lightweight update handles
-        shared_feature_store: Dict[Any, Any],  # manager dict for actual feature storage
+        shared_feature_store: SharedFeatureTensor,  # shared memory feature storage
         vectorizers: Dict[str, FeatureAdapter], # A registry of adapters, keyed by message type
+        archive: bool = True,                   # hand vectorized messages to the adapters' archives
+        shard: int = 0,                         # which shard of the locations input_queue carries
     ):
-        super().__init__()
+        super().__init__(name=f"feature_store-{shard}")
         self.config = config
         self.input_queue = input_queue
         self.output_queue = output_queue
         self.shared_feature_store = shared_feature_store
+        self.archive = archive
+        self.shard = shard
         self._stop_event = mp.Event()
 
         # Registry of adapters, keyed by message type
         self.vectorizers: Dict[str, FeatureAdapter] = vectorizers
 
+        # (msg_type, location_id) -> fingerprint of the last vectorized payload
+        self._fingerprints: Dict[Tuple[str, Any], str] = {}
+
     def stop(self):
         """Signal this process to terminate gracefully."""
         self._stop_event.set()
 
     def run(self):
         setup_logging()
-        log.info("[FeatureStoreProcess] Starting vectorization loop...")
+        start_process_metrics_server(self.config, "feature_store", instance=self.shard)
+        # Every shard archives its locations into the same partitions, the first one compacts them
+        for adapter in self.vectorizers.values():
+            adapter.compact_archive = self.shard == 0
+        log.info(f"[FeatureStoreProcess] Starting vectorization loop of shard {self.shard}...")
         while not self._stop_event.is_set():
             self._read_input_queue()
-            time.sleep(0.5)
+            for adapter in self.vectorizers.values():
+                self._flush_archive(adapter)
 
+        for adapter in self.vectorizers.values():
+            self._flush_archive(adapter, force=True)
         log.info("[FeatureStoreProcess] Shutting down.")
 
     def _read_input_queue(self):
         """
-        Blocks on the input queue for the next message, then handles it.
+        Drains the next micro-batch from the input queue, then handles it.
         """
         try:
-            log.debug("Waiting for next data ingestion...")
-            next_input_message = self.input_queue.get()
-            self._handle_message(next_input_message)
+            batch = self._drain_batch()
+            if batch:
+                FEATURE_STORE_MESSAGES.inc(len(batch))
+                self._handle_batch([decode_message(msg) for msg in batch])
         except Exception as e:
-            log.error(f"Error when handling message for vectorization: {e}", exc_info=True)
+            log.error(f"Error when handling batch for vectorization: {e}", exc_info=True)
+
+    def _drain_batch(self) -> List[Dict[str, Any]]:
+        """
+        Collect messages until batch_max_size is reached or batch_max_latency has
+        passed since the first one arrived. Returns an empty list if nothing arrived
+        within one latency window, so the stop event is checked regularly.
+        """
+        max_size = self.config.feature_store.batch_max_size
+        max_latency = self.config.feature_store.batch_max_latency_sec
+
+        try:
+            batch = [self.input_queue.get(timeout=max_latency)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + max_latency
+        while len(batch) < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.input_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _coalesce(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep only the newest message per (type, location_id), in arrival order.
+        Columnar messages are all kept: each one is a distinct interval for every
+        location, not a newer version of the previous one.
+        """
+        latest: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+        for i, msg in enumerate(batch):
+            adapter = self.vectorizers.get(msg.get("type"))
+            key = (msg.get("type"), i if adapter is not None and adapter.columnar else msg.get("location_id"))
+            latest.pop(key, None)
+            latest[key] = msg
+        return list(latest.values())
 
     def _handle_message(self, msg: Dict[str, Any]):
-        msg_type = msg.get("type")
-        if not msg_type:
-            log.error("Message missing 'type' field. Cannot vectorize.")
-            return
-
-        adapter = self.vectorizers.get(msg_type)
-        if not adapter:
-            log.error(f"No vectorizer found for '{msg_type}'. Known: {list(self.vectorizers.keys())}")
-            return
-
-        location_id = msg.get("location_id")
-
-        # If there is a location, then use that as a subkey inside of message type
-        # otherwise just use message type as a global scope
-        if location_id:
-            past_vector_data = self.shared_feature_store.get(msg_type, {}).get(location_id)
-        else:
-            past_vector_data = self.shared_feature_store.get(msg_type)
-
-        # Expect the adapter's vectorize() to return a vector of features and
-        # a set of horizons to be updated due to the new data
-        horizons, feature_vector = adapter.vectorize(msg, past_data=past_vector_data)
-
-        # For each horizon in the result, store in shared_feature_store
-        for horizon in horizons:
-
-            # Then we emit a message to run inference for each horizon
-            update_msg = {
-                "type": "inference",
-                "horizon": horizon,
-                "location_id": location_id,
-                "msg_type": msg_type
-            }
-
-            if location_id:
-                if msg_type not in self.shared_feature_store:
-                    self.shared_feature_store[msg_type] = {}
-                self.shared_feature_store[msg_type][location_id] = feature_vector
-                self.output_queue.put(update_msg)
-            else:
-                self.shared_feature_store[msg_type] = feature_vector
+        self._handle_batch([msg])
+
+    def _handle_batch(self, batch: List[Dict[str, Any]]):
+        messages = self._coalesce(batch)
+        if len(messages) < len(batch):
+            log.debug(f"Coalesced {len(batch)} messages down to {len(messages)}")
+
+        by_type: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for msg in messages:
+            msg_type = msg.get("type")
+            if not msg_type:
+                log.error("Message missing 'type' field. Cannot vectorize.")
+                continue
+            by_type[msg_type].append(msg)
+
+        emitted = 0
+        unchanged = 0
+        for msg_type, type_messages in by_type.items():
+            adapter = self.vectorizers.get(msg_type)
+            if not adapter:
+                log.error(f"No vectorizer found for '{msg_type}'. Known: {list(self.vectorizers.keys())}")
+                continue
+            changed, fingerprints = self._filter_unchanged(msg_type, adapter, type_messages)
+            unchanged += len(type_messages) - len(changed)
+            if changed and adapter.columnar:
+                emitted += self._vectorize_columnar(msg_type, adapter, changed, fingerprints)
+            elif changed:
+                emitted += self._vectorize_messages(msg_type, adapter, changed, fingerprints)
+
+        log.info(f"Vectorized batch of {len(batch)} messages ({unchanged} unchanged), emitted {emitted} updates")
+
+    def _filter_unchanged(self, msg_type: str, adapter: FeatureAdapter,
+                          messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Drop messages whose content matches what was last vectorized for their location."""
+        changed, fingerprints = [], []
+        for msg in messages:
+            try:
+                fingerprint = adapter.fingerprint(msg)
+            except Exception as e:
+                log.debug(f"Could not fingerprint '{msg_type}' message, vectorizing anyway: {e}")
+                fingerprint = None
+            if fingerprint is not None and self._fingerprints.get((msg_type, msg.get("location_id"))) == fingerprint:
+                continue
+            changed.append(msg)
+            fingerprints.append(fingerprint)
+        return changed, fingerprints
+
+    def _vectorize_messages(self, msg_type: str, adapter: FeatureAdapter, messages: List[Dict[str, Any]],
+                            fingerprints: List[str]) -> int:
+        # Messages without a location are stored in the tensor's global row
+        past_vector_data = [
+            self.shared_feature_store.read_latest(msg_type, msg.get("location_id")) for msg in messages
+        ]
+
+        # Expect the adapter's vectorize_batch() to return a block of feature vectors
+        # and, per message, the set of horizons to be updated due to the new data
+        start = time.monotonic()
+        try:
+            horizons_per_msg, block = adapter.vectorize_batch(messages, past_data=past_vector_data)
+        except Exception as e:
+            if len(messages) == 1:
+                log.error(f"Error when vectorizing '{msg_type}' for {messages[0].get('location_id')}: {e}", exc_info=True)
+                return 0
+            # One bad payload shouldn't cost the whole batch, retry message by message
+            log.warning(f"Batch vectorization failed for '{msg_type}', falling back to per-message: {e}")
+            return sum(
+                self._vectorize_messages(msg_type, adapter, [msg], [fingerprint])
+                for msg, fingerprint in zip(messages, fingerprints)
+            )
+
+        VECTORIZE_LATENCY.labels(msg_type).observe(time.monotonic() - start)
+        VECTORIZE_BATCH_SIZE.labels(msg_type).observe(len(messages))
+
+        emitted = 0
+        for msg, fingerprint, horizons, feature_vector in zip(messages, fingerprints, horizons_per_msg, block):
+            location_id = msg.get("location_id")
+            # Only remember the fingerprint once the features are actually stored
+            if fingerprint is not None:
+                self._fingerprints[(msg_type, location_id)] = fingerprint
+
+            # For each horizon in the result, store in shared_feature_store
+            for horizon in horizons:
+                if not self.shared_feature_store.write(msg_type, location_id, horizon, feature_vector):
+                    continue
+
+                # Then we emit one message to run inference per touched (location, horizon)
+                update_msg = {
+                    "type": "inference",
+                    "horizon": horizon,
+                    "location_id": location_id,
+                    "msg_type": msg_type,
+                    "shard": self.shard,
+                }
                 self.output_queue.put(update_msg)
-            log.info(f"Emitted update => {update_msg}")
+                emitted += 1
 
-        # Optionally archive
-        self._archive_data(adapter, msg)
+            # Optionally archive
+            if self.archive:
+                self._archive_data(adapter, msg, feature_vector)
+        FEATURE_STORE_UPDATES.labels(msg_type).inc(emitted)
+        return emitted
 
-    def _archive_data(self, adapter: FeatureAdapter, msg: Dict[str, Any]):
-        """Stub for archiving data if needed."""
+    def _vectorize_columnar(self, msg_type: str, adapter: FeatureAdapter, messages: List[Dict[str, Any]],
+                            fingerprints: List[str]) -> int:
+        """
+        Columnar messages carry every location at once. Each row goes into the
+        tensor, but only one update handle per horizon is emitted, scoped to all
+        locations (location_id None), instead of one per location. With several
+        shards, ShardRouter split the message and this shard only holds part of
+        it, so the handle lists the locations written here in location_ids.
+        """
+        partial = self.config.feature_store.shards > 1 and msg_type in COLUMNAR_FIELDS
+        emitted = 0
+        for msg, fingerprint in zip(messages, fingerprints):
+            start = time.monotonic()
+            try:
+                location_ids, horizons, block = adapter.vectorize_columnar(msg)
+            except Exception as e:
+                log.error(f"Error when vectorizing columnar '{msg_type}' message: {e}", exc_info=True)
+                continue
+            VECTORIZE_LATENCY.labels(msg_type).observe(time.monotonic() - start)
+            VECTORIZE_BATCH_SIZE.labels(msg_type).observe(len(location_ids))
+            if fingerprint is not None:
+                self._fingerprints[(msg_type, msg.get("location_id"))] = fingerprint
+
+            for horizon in horizons:
+                written = [
+                    location_id for location_id, feature_vector in zip(location_ids, block)
+                    if self.shared_feature_store.write(msg_type, location_id, horizon, feature_vector)
+                ]
+                FEATURE_STORE_UPDATES.labels(msg_type).inc(len(written))
+                if written:
+                    update_msg = {
+                        "type": "inference",
+                        "horizon": horizon,
+                        "location_id": None,
+                        "msg_type": msg_type,
+                        "shard": self.shard,
+                    }
+                    if partial:
+                        update_msg["location_ids"] = [str(location_id) for location_id in written]
+                    self.output_queue.put(update_msg)
+                    emitted += 1
+
+            if self.archive:
+                self._archive_data(adapter, msg, block)
+        return emitted
+
+    def _archive_data(self, adapter: FeatureAdapter, msg: Dict[str, Any], feature_vector):
+        """Hand the message and its features to the adapter's columnar archive."""
         try:
-            archived_format = adapter.archive(msg)
-            log.debug(f"Archived data for {msg.get('type')} => {archived_format}")
+            adapter.archive(msg, feature_vector)
         except NotImplementedError:
             pass
         except Exception as e:
             log.error(f"Failed archiving data: {e}", exc_info=True)
+
+    def _flush_archive(self, adapter: FeatureAdapter, force: bool = False):
+        try:
+            adapter.flush_archive(force=force)
+        except Exception as e:
+            log.error(f"Failed flushing {adapter.message_type} archive: {e}", exc_info=True)
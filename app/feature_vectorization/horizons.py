@@ -4,4 +4,15 @@ from enum import Enum
 class Horizon(Enum):
     five_minute = "FIVE_MINUTE"
     one_hour = "ONE_HOUR"
-    one_day = "ONE_DAY"
\ No newline at end of file
+    one_day = "ONE_DAY"
+
+    @property
+    def seconds(self) -> int:
+        return HORIZON_SECONDS[self]
+
+
+HORIZON_SECONDS = {
+    Horizon.five_minute: 5 * 60,
+    Horizon.one_hour: 60 * 60,
+    Horizon.one_day: 24 * 60 * 60,
+}
@@ -0,0 +1,286 @@
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .archive import TMP_PREFIX, _write_table_atomically
+from ..config import Config
+from ..logging_helper import setup_logging
+from ..utils.token_bucket import TokenBucket
+
+log = logging.getLogger(__name__)
+
+HOURLY_PREFIX = "hourly-"
+DAILY_PREFIX = "daily-"
+
+FULL = "full"
+HOURLY = "hourly"
+DAILY = "daily"
+
+
+def _visible_files(directory: str) -> List[os.DirEntry]:
+    return [
+        entry for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.endswith(".parquet") and not entry.name.startswith(TMP_PREFIX)
+    ]
+
+
+def partition_tier(directory: str) -> str:
+    """Resolution of an hour partition, from the prefixes of the files in it."""
+    names = [entry.name for entry in _visible_files(directory)]
+    if names and all(name.startswith(DAILY_PREFIX) for name in names):
+        return DAILY
+    if names and all(name.startswith(HOURLY_PREFIX) for name in names):
+        return HOURLY
+    return FULL
+
+
+def downsample_table(table: pa.Table, bucket_sec: int) -> pa.Table:
+    """
+    Aggregate rows into (location_id, bucket_sec) buckets. event_time becomes the
+    bucket start, floating point and list<float> columns are averaged and every
+    other column keeps the last value in the bucket.
+    """
+    event_time = table.column("event_time").to_numpy()
+    bucket = np.floor(event_time / bucket_sec) * bucket_sec
+    keys = pd.DataFrame({"location_id": table.column("location_id").to_pandas(), "bucket": bucket})
+    group_ids = keys.groupby(["location_id", "bucket"], sort=True, dropna=False).ngroup().to_numpy()
+
+    order = np.argsort(group_ids, kind="stable")
+    sorted_ids = group_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    lasts = starts + counts - 1
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks().take(pa.array(order))
+        if name == "event_time":
+            columns[name] = pa.array(bucket[order][starts], type=column.type)
+        elif pa.types.is_floating(column.type):
+            values = column.to_numpy(zero_copy_only=False).astype(np.float64)
+            columns[name] = pa.array(np.add.reduceat(values, starts) / counts, type=column.type)
+        elif pa.types.is_list(column.type) and pa.types.is_floating(column.type.value_type) and column.null_count == 0:
+            width = len(column[0])
+            values = column.flatten().to_numpy(zero_copy_only=False).astype(np.float64).reshape(-1, width)
+            means = (np.add.reduceat(values, starts, axis=0) / counts[:, None]).astype(np.float32)
+            columns[name] = pa.array(list(means), type=column.type)
+        else:
+            columns[name] = column.take(pa.array(lasts))
+    return pa.table(columns)
+
+
+class PartitionSizeTracker:
+    """
+    Tracks the on-disk size of every hour partition in the archive without a full
+    `du` walk: a partition's files are only re-stat'ed when its directory mtime
+    changes, which every create, rename and delete in it does.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        # hour partition directory -> (directory mtime_ns, bytes)
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+
+    def refresh(self) -> int:
+        seen = set()
+        for type_entry in self._scandir(self.root):
+            if not type_entry.is_dir() or type_entry.name.startswith(("_", ".")):
+                continue
+            for date_entry in self._scandir(type_entry.path):
+                if not date_entry.is_dir() or not date_entry.name.startswith("date="):
+                    continue
+                for hour_entry in self._scandir(date_entry.path):
+                    if not hour_entry.is_dir() or not hour_entry.name.startswith("hour="):
+                        continue
+                    seen.add(hour_entry.path)
+                    mtime = hour_entry.stat().st_mtime_ns
+                    cached = self._sizes.get(hour_entry.path)
+                    if cached is None or cached[0] != mtime:
+                        self._sizes[hour_entry.path] = (mtime, sum(f.stat().st_size for f in os.scandir(hour_entry.path)))
+        for stale in set(self._sizes) - seen:
+            del self._sizes[stale]
+        return self.total_bytes
+
+    @staticmethod
+    def _scandir(path: str):
+        try:
+            return list(os.scandir(path))
+        except FileNotFoundError:
+            return []
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._sizes.values())
+
+    def partitions(self) -> List[Tuple[float, str]]:
+        """(hour start epoch seconds, directory) of every tracked partition, oldest first."""
+        found = []
+        for path in self._sizes:
+            hour_dir = os.path.basename(path)
+            date_dir = os.path.basename(os.path.dirname(path))
+            hour_start = datetime.strptime(f"{date_dir[5:]} {hour_dir[5:]}", "%Y-%m-%d %H").replace(
+                tzinfo=timezone.utc).timestamp()
+            found.append((hour_start, path))
+        return sorted(found)
+
+    def update(self, path: str):
+        """Re-measure a single partition after it was rewritten."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            self._sizes[path] = (mtime, sum(f.stat().st_size for f in os.scandir(path)))
+        except FileNotFoundError:
+            self.forget(path)
+
+    def forget(self, path: str):
+        self._sizes.pop(path, None)
+
+
+class DiskBudgetManager:
+    """
+    Keeps the archive under general.max_disk.
+
+    Once usage passes retention.high_watermark of the budget, partitions are
+    downsampled oldest first until usage drops below retention.low_watermark:
+    partitions older than retention.full_resolution_days become hourly aggregates,
+    then partitions older than retention.hourly_resolution_days are rolled up into
+    one daily aggregate per date. Only if that is still not enough are the oldest
+    partitions deleted. All rewrite I/O goes through a token bucket so retention
+    never competes with live ingestion for disk bandwidth.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config.retention
+        self.root = config.training.training_data_volume_path
+        self.max_disk_bytes = config.general.max_disk_bytes
+        self.compression = config.archive.compression
+        self.tracker = PartitionSizeTracker(self.root)
+        throttle = config.retention.io_throttle_bytes_per_sec_value
+        self.io_bucket = TokenBucket(rate=throttle, capacity=throttle)
+
+    @property
+    def high_watermark_bytes(self) -> int:
+        return int(self.max_disk_bytes * self.config.high_watermark)
+
+    @property
+    def low_watermark_bytes(self) -> int:
+        return int(self.max_disk_bytes * self.config.low_watermark)
+
+    def enforce(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        used = self.tracker.refresh()
+        if used <= self.high_watermark_bytes:
+            return used
+
+        log.warning(f"Archive uses {used / 1e9:.2f} GB of a {self.max_disk_bytes / 1e9:.2f} GB budget, downsampling")
+        full_cutoff = now - self.config.full_resolution_days * 86400
+        hourly_cutoff = now - self.config.hourly_resolution_days * 86400
+
+        for hour_start, path in self.tracker.partitions():
+            if hour_start >= full_cutoff or self._under_budget():
+                break
+            if partition_tier(path) == FULL:
+                self._downsample_hourly(path)
+
+        if not self._under_budget():
+            for date_dir in self._date_dirs_before(hourly_cutoff):
+                if self._under_budget():
+                    break
+                self._rollup_daily(date_dir)
+
+        if not self._under_budget():
+            for _, path in self.tracker.partitions():
+                if self._under_budget():
+                    break
+                log.warning(f"Deleting archive partition {path} to stay within max_disk")
+                shutil.rmtree(path, ignore_errors=True)
+                self.tracker.forget(path)
+
+        used = self.tracker.refresh()
+        log.info(f"Archive now uses {used / 1e9:.2f} GB")
+        return used
+
+    def _under_budget(self) -> bool:
+        return self.tracker.total_bytes <= self.low_watermark_bytes
+
+    def _read_throttled(self, files: List[str]) -> pa.Table:
+        tables = []
+        for path in files:
+            self.io_bucket.consume(os.path.getsize(path))
+            tables.append(pq.read_table(path))
+        return pa.concat_tables(tables, promote_options="default")
+
+    def _replace_files(self, table: pa.Table, directory: str, prefix: str, old_files: List[str]):
+        new_path = _write_table_atomically(
+            table, directory, f"{prefix}{int(time.time() * 1000)}.parquet", self.compression, max(table.num_rows, 1)
+        )
+        self.io_bucket.consume(os.path.getsize(new_path))
+        for path in old_files:
+            if path != new_path:
+                os.remove(path)
+        for path in {directory} | {os.path.dirname(path) for path in old_files}:
+            self.tracker.update(path)
+
+    def _downsample_hourly(self, directory: str):
+        files = [entry.path for entry in _visible_files(directory)]
+        if not files:
+            return
+        table = self._read_throttled(files)
+        self._replace_files(downsample_table(table, 3600), directory, HOURLY_PREFIX, files)
+        log.info(f"Downsampled {directory} to hourly ({table.num_rows} rows)")
+
+    def _date_dirs_before(self, cutoff: float) -> List[str]:
+        dates = {}
+        for hour_start, path in self.tracker.partitions():
+            if hour_start + 3600 <= cutoff:
+                date_dir = os.path.dirname(path)
+                dates.setdefault(date_dir, hour_start)
+        return sorted(dates, key=dates.get)
+
+    def _rollup_daily(self, date_dir: str):
+        hour_dirs = [entry.path for entry in os.scandir(date_dir) if entry.is_dir() and entry.name.startswith("hour=")]
+        if len(hour_dirs) == 1 and partition_tier(hour_dirs[0]) == DAILY:
+            return
+        files = [entry.path for hour_dir in hour_dirs for entry in _visible_files(hour_dir)]
+        if not files:
+            return
+        table = self._read_throttled(files)
+        target_dir = os.path.join(date_dir, "hour=00")
+        self._replace_files(downsample_table(table, 86400), target_dir, DAILY_PREFIX, files)
+        for hour_dir in hour_dirs:
+            if hour_dir != target_dir:
+                shutil.rmtree(hour_dir, ignore_errors=True)
+                self.tracker.forget(hour_dir)
+        log.info(f"Rolled {date_dir} up to a daily aggregate ({table.num_rows} rows)")
+
+
+class RetentionProcess(mp.Process):
+    """Runs the DiskBudgetManager every retention.check_interval_sec in the background."""
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+        self._stop_event = mp.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        setup_logging()
+        log.info("[RetentionProcess] Starting...")
+        manager = DiskBudgetManager(self.config)
+        while not self._stop_event.is_set():
+            try:
+                manager.enforce()
+            except Exception as e:
+                log.error(f"Retention pass failed: {e}", exc_info=True)
+            self._stop_event.wait(self.config.retention.check_interval_sec)
+        log.info("[RetentionProcess] Exiting...")
@@ -0,0 +1,82 @@
+import bisect
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .shared_feature_tensor import GLOBAL_LOCATION
+from ..messages import COLUMNAR_FIELDS, decode_message, encode_message, message_header, take_locations
+
+
+def _hash(key: str) -> int:
+    # Stable across processes and restarts, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+class ConsistentHashRing:
+    """
+    Maps location_ids onto shards. Each shard owns virtual_nodes points on a hash
+    ring and a location belongs to the first point at or after its own hash, so
+    changing the number of shards only moves about 1/shards of the locations.
+    Messages without a location are owned by the shard of the tensor's global row.
+    """
+
+    def __init__(self, shards: int, virtual_nodes: int = 64):
+        if shards < 1:
+            raise ValueError("A hash ring needs at least one shard")
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}-{i}"), shard) for shard in range(shards) for i in range(virtual_nodes))
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+        # The set of locations is bounded (pricing nodes, source routes), so lookups are cached
+        self._cache: Dict[Any, int] = {}
+
+    def shard(self, location_id: Optional[Any]) -> int:
+        owner = self._cache.get(location_id)
+        if owner is None:
+            key = GLOBAL_LOCATION if location_id is None else str(location_id)
+            index = bisect.bisect_left(self._points, _hash(key)) % len(self._points)
+            owner = self._cache[location_id] = self._owners[index]
+        return owner
+
+
+class ShardRouter:
+    """
+    Queue-like front of a sharded feature store: ingestion threads put() into it as
+    into their output queue and each message goes to the input channel of the
+    FeatureStoreProcess owning its location_id. Routing happens in the producer, so
+    it costs a header read and adds no hop.
+
+    Every (type, location) stays on one channel, so its messages are vectorized in
+    order, each shard keeps the fingerprints of its own locations, and every row of
+    the shared tensor has a single writer, which its seqlocks rely on. Columnar
+    messages (location_id None with per-location arrays) are split, each shard
+    receiving the rows of the locations it owns.
+    """
+
+    def __init__(self, channels: List[Any], virtual_nodes: int = 64):
+        self.channels = list(channels)
+        self.ring = ConsistentHashRing(len(self.channels), virtual_nodes)
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        header = message_header(item) if isinstance(item, (bytes, bytearray)) else item
+        location_id = header.get("location_id")
+        if location_id is None and header.get("type") in COLUMNAR_FIELDS and len(self.channels) > 1:
+            msg = decode_message(item)
+            for shard, part in self.split(msg).items():
+                self.channels[shard].put(part if isinstance(item, dict) else encode_message(part), block, timeout)
+            return
+        self.channels[self.ring.shard(location_id)].put(item, block, timeout)
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def split(self, msg: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """The rows of a columnar message owned by each shard, as one message per shard."""
+        location_ids = msg["data"]["location_ids"]
+        owners = np.fromiter((self.ring.shard(location_id) for location_id in location_ids),
+                             dtype=np.int64, count=len(location_ids))
+        return {int(shard): take_locations(msg, owners == shard) for shard in np.unique(owners)}
+
+    def qsize(self) -> int:
+        return sum(channel.qsize() for channel in self.channels)
@@ -0,0 +1,196 @@
+import logging
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .horizons import Horizon
+
+log = logging.getLogger(__name__)
+
+# Row used for message types that are not tied to a location (location_id is None)
+GLOBAL_LOCATION = "__global__"
+
+
+class SharedFeatureTensor:
+    """
+    Feature store backed by a single multiprocessing.shared_memory block.
+
+    Holds a preallocated float32 tensor of shape
+    (msg_types, horizons, locations, max_feature_vector_size) plus a uint64
+    version counter per (msg_type, horizon, location) row and the horizon last
+    written per (msg_type, location). Every process that
+    unpickles this object maps the same block, so reads are plain memory reads
+    instead of a Manager round-trip.
+
+    Each row is a seqlock: the (single) writer bumps the version to odd, writes
+    the row, then bumps it to even. Readers retry until they see the same even
+    version before and after copying. Version 0 means the row was never written.
+    """
+
+    def __init__(self, msg_types: Dict[str, int], location_ids: List[str], name: Optional[str] = None):
+        """
+        :param msg_types: message type -> feature vector size for that type
+        :param location_ids: every location_id that can be stored
+        :param name: attach to an existing block instead of creating one
+        """
+        self.msg_types = dict(msg_types)
+        self.location_ids = [GLOBAL_LOCATION] + [loc for loc in location_ids if loc != GLOBAL_LOCATION]
+        self.horizons = list(Horizon)
+
+        self.type_index = {msg_type: i for i, msg_type in enumerate(self.msg_types)}
+        self.horizon_index = {horizon: i for i, horizon in enumerate(self.horizons)}
+        self.location_index = {location_id: i for i, location_id in enumerate(self.location_ids)}
+        self.width = max(self.msg_types.values())
+
+        self._owner = name is None
+        self._attach(name)
+        self._unknown_locations = set()
+
+    def _layout(self) -> Tuple[Tuple[int, ...], int, int, int]:
+        row_shape = (len(self.msg_types), len(self.horizons), len(self.location_ids))
+        features_nbytes = int(np.prod(row_shape)) * self.width * np.dtype(np.float32).itemsize
+        # Keep the version counters 8-byte aligned
+        versions_offset = (features_nbytes + 7) // 8 * 8
+        versions_nbytes = int(np.prod(row_shape)) * np.dtype(np.uint64).itemsize
+        last_horizon_offset = versions_offset + versions_nbytes
+        last_horizon_nbytes = len(self.msg_types) * len(self.location_ids) * np.dtype(np.uint8).itemsize
+        return row_shape, versions_offset, last_horizon_offset, last_horizon_offset + last_horizon_nbytes
+
+    def _attach(self, name: Optional[str]):
+        row_shape, versions_offset, last_horizon_offset, total_nbytes = self._layout()
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=total_nbytes)
+            log.info(f"Allocated {total_nbytes / 1e6:.1f} MB shared feature tensor {self.shm.name} "
+                     f"for {len(self.msg_types)} types x {len(self.location_ids)} locations")
+        else:
+            # Attaching processes are multiprocessing children of the owner and share
+            # its resource tracker, so only the owner's close() unlinks the block.
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.features = np.ndarray(row_shape + (self.width,), dtype=np.float32, buffer=self.shm.buf)
+        self.versions = np.ndarray(row_shape, dtype=np.uint64, buffer=self.shm.buf, offset=versions_offset)
+        self.last_horizon = np.ndarray((row_shape[0], row_shape[2]), dtype=np.uint8, buffer=self.shm.buf,
+                                       offset=last_horizon_offset)
+        if name is None:
+            self.features.fill(0)
+            self.versions.fill(0)
+            self.last_horizon.fill(0)
+
+    def __getstate__(self):
+        return {"msg_types": self.msg_types, "location_ids": self.location_ids, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["msg_types"], state["location_ids"], name=state["name"])
+
+    def close(self):
+        # Drop our views first, the buffer can't be released while they exist
+        self.features = None
+        self.versions = None
+        self.last_horizon = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+    def row_index(self, msg_type: str, location_id: Optional[str], horizon: Horizon) -> Optional[Tuple[int, int, int]]:
+        location_row = self.location_index.get(location_id or GLOBAL_LOCATION)
+        if location_row is None:
+            if location_id not in self._unknown_locations:
+                self._unknown_locations.add(location_id)
+                log.warning(f"Location {location_id} is not in the feature tensor index, dropping its features")
+            return None
+        return self.type_index[msg_type], self.horizon_index[horizon], location_row
+
+    def write(self, msg_type: str, location_id: Optional[str], horizon: Horizon, vector) -> bool:
+        """Write one feature vector. Must only be called by the single writer of this row."""
+        idx = self.row_index(msg_type, location_id, horizon)
+        if idx is None:
+            return False
+        version = self.versions[idx]
+        self.versions[idx] = version + 1
+        row = self.features[idx]
+        n = len(vector)
+        row[:n] = vector
+        row[n:] = 0.0
+        self.versions[idx] = version + 2
+        self.last_horizon[idx[0], idx[2]] = idx[1]
+        return True
+
+    def read(self, msg_type: str, location_id: Optional[str], horizon: Horizon) -> Optional[np.ndarray]:
+        """Consistent copy of one feature vector, or None if it was never written."""
+        idx = self.row_index(msg_type, location_id, horizon)
+        if idx is None:
+            return None
+        row = self.features[idx]
+        while True:
+            before = self.versions[idx]
+            if before == 0:
+                return None
+            if before % 2:
+                # The writer holds the row, let it finish instead of spinning
+                time.sleep(0)
+                continue
+            vector = row[:self.msg_types[msg_type]].copy()
+            if self.versions[idx] == before:
+                return vector
+
+    def read_latest(self, msg_type: str, location_id: Optional[str]) -> Optional[np.ndarray]:
+        """The most recently written vector for (msg_type, location_id) over all horizons."""
+        idx = self.row_index(msg_type, location_id, self.horizons[0])
+        if idx is None:
+            return None
+        type_row, _, location_row = idx
+        return self.read(msg_type, location_id, self.horizons[self.last_horizon[type_row, location_row]])
+
+    @property
+    def feature_width(self) -> int:
+        """Width of a feature_matrix() row: every message type's vector side by side."""
+        return sum(self.msg_types.values())
+
+    def feature_matrix(self, horizon: Horizon, location_ids: List[str]) -> np.ndarray:
+        """
+        (len(location_ids), feature_width) float32 matrix for one horizon, with every
+        message type's vector for each location concatenated in msg_types order. A
+        location that has no vector of its own for a type (e.g. types that are only
+        stored globally) gets that type's global row. Rows caught mid-write are
+        re-read through the seqlock.
+        """
+        rows = np.fromiter((self.location_index[loc] for loc in location_ids), dtype=np.int64,
+                           count=len(location_ids))
+        horizon_row = self.horizon_index[horizon]
+        blocks = []
+        for msg_type, size in self.msg_types.items():
+            type_row = self.type_index[msg_type]
+            features = self.features[type_row, horizon_row, :, :size]
+            versions = self.versions[type_row, horizon_row]
+
+            before = versions[rows]
+            block = features[rows]
+            torn = (before != versions[rows]) | (before % 2 == 1)
+            missing = before == 0
+            for i in np.flatnonzero(torn):
+                vector = self.read(msg_type, location_ids[i], horizon)
+                if vector is not None:
+                    block[i] = vector
+                    # Written while being copied, it has a vector of its own now
+                    missing[i] = False
+
+            if missing.any():
+                global_vector = self.read(msg_type, None, horizon)
+                block[missing] = 0.0 if global_vector is None else global_vector
+            blocks.append(block)
+        return np.concatenate(blocks, axis=1)
+
+    def view(self, msg_type: str, horizon: Horizon) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Zero-copy (locations, feature_vector_size) view of every location's vector for
+        msg_type/horizon, plus the matching version counters. Rows may be mid-write;
+        callers that need consistency should compare versions before and after use.
+        """
+        type_row = self.type_index[msg_type]
+        horizon_row = self.horizon_index[horizon]
+        return (
+            self.features[type_row, horizon_row, :, :self.msg_types[msg_type]],
+            self.versions[type_row, horizon_row],
+        )
@@ -1,26 +1,113 @@
 import multiprocessing as mp
 import logging
+import queue
+import threading
+from collections import defaultdict
 from datetime import datetime, timezone
 import time
-import os
-import pandas as pd
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .model import ForecastModel, LinearForecastModel
+from .model_registry import ModelRegistry
+from ..feature_vectorization.horizons import Horizon
+from ..feature_vectorization.shared_feature_tensor import SharedFeatureTensor
+from ..logging_helper import setup_logging
+from ..observability.metrics import INFERENCE_BATCH_SIZE, INFERENCE_LATENCY
+from ..observability.prometheus import start_process_metrics_server
 
 log = logging.getLogger(__name__)
 
+
+class ModelReloader(threading.Thread):
+    """
+    Background thread of the inference engine watching the model registry. When a
+    horizon's CURRENT pointer moves it memory-maps the new version, scores a canary
+    batch from the shared feature tensor with it and, if the output is well formed,
+    stages it. The engine swaps staged models in between batches, so loading never
+    blocks scoring.
+    """
+
+    def __init__(self, registry: ModelRegistry, shared_feature_store: SharedFeatureTensor,
+                 canary_size: int, interval_sec: float):
+        super().__init__(name="ModelReloader", daemon=True)
+        self.registry = registry
+        self.shared_feature_store = shared_feature_store
+        self.canary_locations = shared_feature_store.location_ids[1:1 + canary_size]
+        self.interval_sec = interval_sec
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._staged: Dict[Horizon, Tuple[str, ForecastModel]] = {}
+        # Last version accepted or rejected per horizon. Versions that failed to load
+        # or validate aren't recorded, so they are retried on the next pass.
+        self._seen: Dict[Horizon, str] = {}
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.check_for_new_versions()
+            except Exception as e:
+                log.error(f"Error checking for new model versions: {e}", exc_info=True)
+            self.stop_event.wait(self.interval_sec)
+
+    def check_for_new_versions(self):
+        for horizon in Horizon:
+            version = self.registry.current_version(horizon)
+            if version is None or version == self._seen.get(horizon):
+                continue
+            try:
+                model = self.registry.load(horizon, version, mmap_mode="r", with_statistics=False)
+                accepted = self.validate(horizon, version, model)
+            except Exception as e:
+                # e.g. files still being written, try again on the next pass
+                log.error(f"Failed to load {horizon.value} model {version}, will retry: {e}")
+                continue
+            self._seen[horizon] = version
+            if accepted:
+                with self._lock:
+                    self._staged[horizon] = (version, model)
+
+    def validate(self, horizon: Horizon, version: str, model: ForecastModel) -> bool:
+        if model.n_features != self.shared_feature_store.feature_width:
+            log.warning(f"Rejected {horizon.value} model {version}: expects {model.n_features} features, "
+                        f"feature tensor has {self.shared_feature_store.feature_width}")
+            return False
+        canary = self.shared_feature_store.feature_matrix(horizon, self.canary_locations)
+        forecast = model.predict(canary)
+        if forecast.shape != (len(canary), model.n_outputs) or not np.all(np.isfinite(forecast)):
+            log.warning(f"Rejected {horizon.value} model {version}: canary batch produced "
+                        f"{forecast.shape} output or non-finite values")
+            return False
+        return True
+
+    def take_staged(self) -> Dict[Horizon, Tuple[str, ForecastModel]]:
+        with self._lock:
+            staged, self._staged = self._staged, {}
+        return staged
+
+
 class InferenceEngineProcess(mp.Process):
     """
-    - Receives update handles (location_id, horizon) from FeatureStoreProcess.
-    - Uses a simple TTL approach to decide if it should re-run inference.
-    - If re-run is required, fetches the vector from shared_feature_store.
+    - Receives update handles (location_id, horizon) from FeatureStoreProcess and
+      accumulates them as pending (location, horizon) keys.
+    - A key is only re-scored once its horizon's minimum refresh window
+      (inference.min_refresh_seconds) has passed since it was last scored; until then
+      it stays pending.
+    - Ready keys are grouped by horizon, their feature matrix is gathered from the
+      shared feature tensor and the horizon's model scores all of them in one call.
+    - Models are hot-swapped: a ModelReloader thread loads and validates newly
+      published versions, and they replace the live ones only between batches, so a
+      batch always finishes on the version it started with.
     """
 
     def __init__(
         self,
         config,
-        shared_feature_store: Dict[Any, Any],  # manager dict of features
+        shared_feature_store: SharedFeatureTensor,  # shared memory feature tensor
         input_queue: mp.Queue,
-        output_queue: mp.Queue = None
+        output_queue: mp.Queue = None,
+        clock: Callable[[], float] = time.monotonic,
     ):
         super().__init__()
         self.config = config
@@ -28,12 +115,54 @@ class InferenceEngineProcess(mp.Process):
         self.input_queue = input_queue
         self.output_queue = output_queue
         self._stop_event = mp.Event()
+        # Time source for the refresh windows, replay swaps in a virtual event-time clock
+        self.clock = clock
+
+        # Track last inference time (clock seconds) for each (location, horizon)
+        self.last_inference_time: Dict[Tuple[str, Horizon], float] = {}
+        # (location, horizon) keys with new features that have not been scored yet
+        self.pending: set = set()
 
-        # Track last inference time for each horizon/location
-        self.last_inference_time = {}
+        self.models: Dict[Horizon, ForecastModel] = {}
+        self.model_versions: Dict[Horizon, Optional[str]] = {}
+        self.model_reloader: Optional[ModelReloader] = None
+
+    def start_model_reloader(self, background: bool = True):
+        """
+        Score with untrained models until the reloader stages published versions.
+        Without background, the current versions are loaded once and never reloaded.
+        """
+        for horizon in Horizon:
+            self.models[horizon] = LinearForecastModel.untrained(self.shared_feature_store.feature_width)
+            self.model_versions[horizon] = None
+        self.model_reloader = ModelReloader(
+            ModelRegistry(self.config.training.model_path, self.config.training.keep_model_versions),
+            self.shared_feature_store,
+            canary_size=self.config.inference.canary_size,
+            interval_sec=self.config.inference.model_poll_interval_sec,
+        )
+        if background:
+            self.model_reloader.start()
+        else:
+            self.model_reloader.check_for_new_versions()
+            self.reload_model()
 
     def reload_model(self):
-        pass
+        """Swap in any model versions the reloader has validated since the last batch."""
+        for horizon, (version, model) in self.model_reloader.take_staged().items():
+            previous = self.model_versions[horizon]
+            self.models[horizon] = model
+            self.model_versions[horizon] = version
+            log.info(f"[InferenceEngineProcess] Swapped {horizon.value} model {previous} -> {version} "
+                     f"({model.memory_bytes / 1e6:.1f} MB mapped)")
+            self._log_model_memory()
+
+    def _log_model_memory(self):
+        loaded = ", ".join(
+            f"{horizon.value}={self.model_versions[horizon]} ({model.memory_bytes / 1e6:.1f} MB)"
+            for horizon, model in self.models.items()
+        )
+        log.info(f"[InferenceEngineProcess] Loaded models: {loaded}")
 
     def load_inference_coords(self):
         pass
@@ -41,63 +170,98 @@ class InferenceEngineProcess(mp.Process):
     def stop(self):
         self._stop_event.set()
 
-    def get_iso_ne_points(self):
-        iso_ne_csv_path = os.path.join(os.getcwd(), "data", "reference", "iso_ne_nodes_april_2025.csv")
-        df = pd.read_csv(iso_ne_csv_path)
-        df = df.dropna(subset=["Latitude", "Longitude"])
-        return list(zip(df["Latitude"], df["Longitude"]))
-
     def run(self):
+        setup_logging()
+        start_process_metrics_server(self.config, "inference")
         log.info("[InferenceEngineProcess] Starting...")
+        self.start_model_reloader()
         while not self._stop_event.is_set():
             self._check_for_updates()
-            time.sleep(1)
+            self.reload_model()
+            self._run_ready_batches()
+        self.model_reloader.stop_event.set()
+        self.model_reloader.join()
         log.info("[InferenceEngineProcess] Exiting...")
 
     def _check_for_updates(self):
         """
-        Blocking read of the input message queue. Each message:
+        Drain update handles from the input queue for up to one batch latency window.
+        Each message:
           {
             "type": "inference",
+            "msg_type": "...",
             "location_id": "...",
-            "horizon": "..."
+            "horizon": Horizon
           }
-        Decide if we want to run inference. If so, fetch vector from shared_feature_store.
+        A handle without a location_id (a globally scoped feature changed) marks every
+        location dirty for that horizon, unless it lists the locations it covers in
+        location_ids (a columnar message split across feature store shards).
         """
-        msg = self.input_queue.get()
+        max_size = self.config.inference.batch_max_size
+        deadline = time.monotonic() + self.config.inference.batch_max_latency_sec
+        received = 0
+        while received < max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                msg = self.input_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            received += 1
+            self._mark_pending(msg)
 
-        self._perform_inference(msg)
-        self._update_last_inference_time(msg)
-
-    def _update_last_inference_time(self, msg):
-        if 'location_id' in msg:
-            self.last_inference_time[msg['msg_type']][msg['location_id']] = datetime.now(tz=timezone.utc)
+    def _mark_pending(self, msg: Dict[str, Any]):
+        horizon = msg["horizon"]
+        location_id = msg.get("location_id")
+        if msg.get("location_ids") is not None:
+            self.pending.update((loc, horizon) for loc in msg["location_ids"])
+        elif location_id is None:
+            self.pending.update((loc, horizon) for loc in self.shared_feature_store.location_ids[1:])
         else:
-            self.last_inference_time[msg['msg_type']] = datetime.now(tz=timezone.utc)
+            self.pending.add((location_id, horizon))
 
-    def _perform_inference(self, msg):
-        """
-        Fetch the vector from shared_feature_store and run a mock forecast.
-        """
+    def _is_due(self, key: Tuple[str, Horizon], now: float) -> bool:
+        last = self.last_inference_time.get(key)
+        if last is None:
+            return True
+        return now - last >= self.config.inference.min_refresh_seconds.get(key[1].value, 0)
 
-        horizon = msg["horizon"]
-        feature_vector = self.shared_feature_store.get(key)
+    def _run_ready_batches(self):
+        now = self.clock()
+        ready: Dict[Horizon, List[str]] = defaultdict(list)
+        for key in self.pending:
+            if self._is_due(key, now):
+                ready[key[1]].append(key[0])
 
-        if feature_vector is None:
-            log.warning(f"[InferenceEngineProcess] No vector found for {key}. Skipping.")
-            return
+        for horizon, location_ids in ready.items():
+            self._perform_inference(horizon, location_ids)
+            for location_id in location_ids:
+                key = (location_id, horizon)
+                self.pending.discard(key)
+                self.last_inference_time[key] = now
 
-        # Example placeholder logic
-        log.info(f"[InferenceEngineProcess] Running inference for {key} with features: {feature_vector}")
-        forecast = [round(random.uniform(50, 100), 2) for _ in range(3)]
-        log.info(f"[InferenceEngineProcess] Forecast result for {key} => {forecast}")
+    def _perform_inference(self, horizon: Horizon, location_ids: List[str]):
+        """
+        Build one feature matrix for every ready location at this horizon and score it
+        with a single model call.
+        """
+        start = time.monotonic()
+        features = self.shared_feature_store.feature_matrix(horizon, location_ids)
+        forecast = self.models[horizon].predict(features)
+        elapsed = time.monotonic() - start
+        INFERENCE_LATENCY.labels(horizon.value).observe(elapsed)
+        INFERENCE_BATCH_SIZE.labels(horizon.value).observe(len(location_ids))
+        log.info(f"[InferenceEngineProcess] Scored {len(location_ids)} locations for {horizon.value} "
+                 f"with model {self.model_versions[horizon]} in {elapsed:.3f} seconds")
 
-        # Optional: send results downstream
+        # Optional: send results downstream, one message per horizon batch
         if self.output_queue:
             result_msg = {
-                "location_id": location_id,
                 "horizon": horizon,
+                "location_ids": location_ids,
                 "forecast": forecast,
-                "timestamp": datetime.utcnow().isoformat()
+                "model_version": self.model_versions[horizon],
+                "timestamp": datetime.now(tz=timezone.utc).isoformat()
             }
             self.output_queue.put(result_msg)
@@ -0,0 +1,111 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+
+class ForecastModel(ABC):
+    """
+    A model scoring a whole feature matrix at once: (locations, features) in,
+    (locations, outputs) out.
+    """
+    n_features: int
+    n_outputs: int
+
+    @abstractmethod
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        pass
+
+
+class LinearForecastModel(ForecastModel):
+    """
+    Linear model over the concatenated feature vectors of a location.
+
+    Trained incrementally as a ridge regression: partial_fit() folds each mini-batch
+    into the running normal equations (X'X and X'y, with an intercept column) and
+    re-solves, so warm-starting from a saved model continues exactly where the last
+    fit stopped. decay() down-weights everything seen so far, letting the model
+    track drift across retrain cycles.
+    """
+    ARRAYS = ("weights", "bias", "xtx", "xty")
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, xtx: Optional[np.ndarray] = None,
+                 xty: Optional[np.ndarray] = None, n_samples: float = 0, l2_penalty: float = 1.0):
+        self.weights = weights
+        self.bias = bias
+        self.n_features, self.n_outputs = weights.shape
+        self.l2_penalty = l2_penalty
+        self.xtx = xtx if xtx is not None else np.zeros((self.n_features + 1, self.n_features + 1))
+        self.xty = xty if xty is not None else np.zeros((self.n_features + 1, self.n_outputs))
+        self.n_samples = n_samples
+
+    @classmethod
+    def untrained(cls, n_features: int, n_outputs: int = 1, l2_penalty: float = 1.0) -> "LinearForecastModel":
+        return cls(
+            weights=np.zeros((n_features, n_outputs), dtype=np.float32),
+            bias=np.zeros(n_outputs, dtype=np.float32),
+            l2_penalty=l2_penalty,
+        )
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return features @ self.weights + self.bias
+
+    def partial_fit(self, features: np.ndarray, targets: np.ndarray, refit: bool = True):
+        design = np.hstack([features.astype(np.float64), np.ones((len(features), 1))])
+        targets = targets.reshape(len(targets), -1).astype(np.float64)
+        self.xtx += design.T @ design
+        self.xty += design.T @ targets
+        self.n_samples += len(features)
+        if refit:
+            self.refit()
+
+    def decay(self, factor: float):
+        self.xtx *= factor
+        self.xty *= factor
+        self.n_samples *= factor
+
+    def refit(self):
+        penalty = self.l2_penalty * np.eye(self.n_features + 1)
+        penalty[-1, -1] = 0.0  # never shrink the intercept
+        solution = np.linalg.solve(self.xtx + penalty, self.xty)
+        self.weights = solution[:-1].astype(np.float32)
+        self.bias = solution[-1].astype(np.float32)
+
+    def save(self, directory: str):
+        """Write the model, including its training statistics, as one .npy file per array."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "params.json"), "w") as f:
+            json.dump({"n_samples": self.n_samples, "l2_penalty": self.l2_penalty}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = None,
+             with_statistics: bool = True) -> "LinearForecastModel":
+        """
+        Load a saved model. mmap_mode="r" maps the arrays instead of reading them, and
+        with_statistics=False skips the normal equations, which scoring never needs.
+        """
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in (cls.ARRAYS if with_statistics else ("weights", "bias"))
+        }
+        with open(os.path.join(directory, "params.json"), "r") as f:
+            params = json.load(f)
+        model = cls(
+            weights=arrays["weights"],
+            bias=arrays["bias"],
+            xtx=arrays.get("xtx"),
+            xty=arrays.get("xty"),
+            n_samples=params["n_samples"],
+            l2_penalty=params["l2_penalty"],
+        )
+        if not with_statistics:
+            model.xtx = model.xty = None
+        return model
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS if getattr(self, name) is not None)
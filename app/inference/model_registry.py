@@ -0,0 +1,81 @@
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .model import LinearForecastModel
+from ..feature_vectorization.horizons import Horizon
+
+log = logging.getLogger(__name__)
+
+CURRENT_POINTER = "CURRENT"
+VERSION_PREFIX = "v"
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on disk, one directory per horizon:
+
+        <root>/<HORIZON>/v20240101T000000.000000/{weights,bias,xtx,xty}.npy, params.json
+        <root>/<HORIZON>/CURRENT   -> name of the live version
+
+    A version directory is fully written under a dot-prefixed name and renamed into
+    place before CURRENT is atomically replaced, so readers only ever see complete
+    versions and a consistent pointer.
+    """
+
+    def __init__(self, root: str, keep_versions: int = 3):
+        self.root = root
+        self.keep_versions = keep_versions
+
+    def horizon_dir(self, horizon: Horizon) -> str:
+        return os.path.join(self.root, horizon.value)
+
+    def version_dir(self, horizon: Horizon, version: str) -> str:
+        return os.path.join(self.horizon_dir(horizon), version)
+
+    def current_version(self, horizon: Horizon) -> Optional[str]:
+        try:
+            with open(os.path.join(self.horizon_dir(horizon), CURRENT_POINTER), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self, horizon: Horizon) -> List[str]:
+        if not os.path.isdir(self.horizon_dir(horizon)):
+            return []
+        return sorted(name for name in os.listdir(self.horizon_dir(horizon)) if name.startswith(VERSION_PREFIX))
+
+    def publish(self, horizon: Horizon, model: LinearForecastModel) -> str:
+        version = VERSION_PREFIX + datetime.now(tz=timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+        tmp_dir = self.version_dir(horizon, f".{version}")
+        model.save(tmp_dir)
+        os.rename(tmp_dir, self.version_dir(horizon, version))
+
+        pointer = os.path.join(self.horizon_dir(horizon), CURRENT_POINTER)
+        with open(f"{pointer}.tmp", "w") as f:
+            f.write(version)
+        os.replace(f"{pointer}.tmp", pointer)
+        log.info(f"Published {horizon.value} model {version}")
+
+        self.prune(horizon)
+        return version
+
+    def load(self, horizon: Horizon, version: Optional[str] = None, mmap_mode: Optional[str] = None,
+             with_statistics: bool = True) -> Optional[LinearForecastModel]:
+        version = version or self.current_version(horizon)
+        if version is None:
+            return None
+        return LinearForecastModel.load(self.version_dir(horizon, version), mmap_mode=mmap_mode,
+                                        with_statistics=with_statistics)
+
+    def prune(self, horizon: Horizon):
+        """
+        Remove all but the newest keep_versions versions. Processes still mapping a
+        removed version keep reading it until they swap; the files go away on unmap.
+        """
+        current = self.current_version(horizon)
+        for version in self.versions(horizon)[:-self.keep_versions]:
+            if version != current:
+                shutil.rmtree(self.version_dir(horizon, version), ignore_errors=True)
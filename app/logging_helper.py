@@ -19,6 +19,12 @@ def setup_logging():
                 "stream": sys.stdout,
             },
         },
+        "loggers": {
+            # Logs every poll it runs, warns on every skipped one and reports polls
+            # cancelled at shutdown as failures. The ingestion engine logs poll
+            # failures itself and counts skips as a metric.
+            "apscheduler": {"level": "CRITICAL"},
+        },
         "root": {
             "level": "INFO",
             "handlers": ["console"],
@@ -1,5 +1,4 @@
 import time
-import multiprocessing as mp
 import logging
 import yaml
 
@@ -9,15 +8,34 @@ from .logging_helper import setup_logging
 from .data_integration.data_integration_manager import IngestionProcess
 from .feature_vectorization.feature_store import FeatureStoreProcess
 from .feature_vectorization.feature_adapter import FeatureAdapter
+from .feature_vectorization.retention import RetentionProcess
+from .feature_vectorization.sharding import ShardRouter
+from .feature_vectorization.shared_feature_tensor import SharedFeatureTensor
+from .data_integration.reference_data import load_iso_location_ids
 from .feature_vectorization.adapters import (
+    LmpFeatureAdapter,
+    NaturalGasFeatureAdapter,
     WeatherFeatureAdapter
 )
 from .inference.inference_process import InferenceEngineProcess
+from .observability.metrics import CHANNEL_EVENTS, QUEUE_DEPTH
+from .observability.prometheus import start_process_metrics_server
+from .utils.channel import PipelineManager
 # from utils.cleanup import CleanupManager
 # from models.training import TrainingManager
 
 log = logging.getLogger(__name__)
 
+
+def sample_channel(name: str, channel, previous: dict) -> dict:
+    """Export a channel's depth and the overflow events since the previous sample."""
+    stats = channel.stats()
+    QUEUE_DEPTH.labels(name).set(stats["depth"] + stats["priority_depth"])
+    for event in ("dropped", "coalesced", "blocked"):
+        CHANNEL_EVENTS.labels(name, event).inc(stats[event] - previous.get(event, 0))
+    return stats
+
+
 def main():
     # Setup logging
     setup_logging()
@@ -27,41 +45,56 @@ def main():
     log.info("Loading config...")
     config = load_config()
     log.info(f"Loaded config:\n {yaml.dump(config.model_dump(), sort_keys=False)}")
+    start_process_metrics_server(config, "main")
 
     # Create a Manager for shared data structures
-    manager = mp.Manager()
-
-    # Queues
-    data_queue = manager.Queue()   # Ingestion -> Feature Store
-    inference_queue = manager.Queue() # Feature Store -> Inference Engine
+    manager = PipelineManager()
+    manager.start()
 
-    # Shared dictionary to hold feature vectors
-    shared_feature_store = manager.dict()
+    # Bounded channels, see config.channels for their overflow policies
+    shards = config.feature_store.shards
+    data_queues = [manager.BoundedChannel(**config.channels.data.model_dump()) for _ in range(shards)]   # Ingestion -> Feature Store shards
+    inference_queue = manager.BoundedChannel(**config.channels.inference.model_dump()) # Feature Store -> Inference Engine
 
     # Feature vector adapters
     vectorizers = {
         "weather": WeatherFeatureAdapter(config),
+        "lmp": LmpFeatureAdapter(config),
+        "natural_gas": NaturalGasFeatureAdapter(config),
         # "load_forecast": LoadForecastFeatureAdapter(),
         # "generation": GenerationMixFeatureAdapter(),
         # ...
     }
 
+    # Shared memory tensor to hold feature vectors, sized up front for every
+    # adapter and every known location
+    shared_feature_store = SharedFeatureTensor(
+        msg_types={msg_type: adapter.feature_vector_size for msg_type, adapter in vectorizers.items()},
+        location_ids=load_iso_location_ids(config.general.iso, config.general.nodes_path),
+    )
+
     log.info("Starting Data Integration...")
     ingestion_process = IngestionProcess(
-        output_queue=data_queue,
+        # Routes every message to the feature store shard owning its location
+        output_queue=ShardRouter(data_queues, config.feature_store.virtual_nodes),
         config=config
     )
     ingestion_process.start()
 
-    log.info("Starting Feature Store...")
-    feature_store_process = FeatureStoreProcess(
-        config=config,
-        input_queue=data_queue,
-        output_queue=inference_queue,
-        shared_feature_store=shared_feature_store,
-        vectorizers = vectorizers
-    )
-    feature_store_process.start()
+    log.info(f"Starting Feature Store ({shards} shards)...")
+    feature_store_processes = [
+        FeatureStoreProcess(
+            config=config,
+            input_queue=data_queues[shard],
+            output_queue=inference_queue,
+            shared_feature_store=shared_feature_store,
+            vectorizers = vectorizers,
+            shard=shard,
+        )
+        for shard in range(shards)
+    ]
+    for feature_store_process in feature_store_processes:
+        feature_store_process.start()
 
     log.info("Starting Inference Engine...")
     inference_process = InferenceEngineProcess(
@@ -76,12 +109,23 @@ def main():
     retraining_process = RetrainProcess(
         config=config,
         output_queue=inference_queue,
+        feature_widths={msg_type: adapter.feature_vector_size for msg_type, adapter in vectorizers.items()},
     )
+    retraining_process.start()
+
+    log.info("Starting Retention Process...")
+    retention_process = RetentionProcess(config=config)
+    retention_process.start()
 
     log.info("All processes started.")
+    channels = {f"data_queue_{shard}": channel for shard, channel in enumerate(data_queues)}
+    channels["inference_queue"] = inference_queue
+    channel_stats = {name: {} for name in channels}
     try:
         while True:
             # Possibly handle other logic or check optional forecast outputs
+            for name, channel in channels.items():
+                channel_stats[name] = sample_channel(name, channel, channel_stats[name])
             time.sleep(1)
     except KeyboardInterrupt:
         log.info("Shutting down...")
@@ -90,12 +134,23 @@ def main():
     ingestion_process.stop()
     ingestion_process.join()
 
-    feature_store_process.stop()
-    feature_store_process.join()
+    for feature_store_process in feature_store_processes:
+        feature_store_process.stop()
+    for feature_store_process in feature_store_processes:
+        feature_store_process.join()
 
     inference_process.stop()
     inference_process.join()
 
+    retraining_process.stop()
+    retraining_process.join()
+
+    retention_process.stop()
+    retention_process.join()
+
+    shared_feature_store.close()
+    manager.shutdown()
+
     log.info("All processes stopped.")
 
 if __name__ == "__main__":
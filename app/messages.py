@@ -0,0 +1,241 @@
+"""
+Wire format of the messages ingestion threads put on the data channel.
+
+A message is still {"type", "location_id", "ingestion_timestamp", "data"}, but it
+travels as bytes: a fixed header, then a body laid out by the schema of its type.
+Types with a schema pack their numbers as raw float arrays, which the decoder
+turns back into NumPy arrays without a per-value step. Types without one fall back
+to a pickled body.
+
+    header    version u8 | ingestion_timestamp f64 (epoch seconds) | type length u8 |
+              location_id length u16 (0xFFFF for None) | type | location_id
+    weather   lat f64 | lon f64 | update_time f64 (NaN if unknown) | periods u8 |
+              grid_id length u16 | grid_id | period_start f64[periods] |
+              values f32[periods x len(WEATHER_PERIOD_FIELDS)]
+    lmp       interval_start f64 | nodes u32 | location_ids length u32 |
+              location_ids ("\\x1f" separated) | one f32[nodes] per LMP_COMPONENTS
+
+Weather messages carry the forecast periods already extracted into numbers, not the
+NWS JSON. The raw forecast only goes to the archive, written by the polling thread
+once per grid cell update.
+
+Decoded arrays are read-only views of the message bytes.
+"""
+import pickle
+import re
+import struct
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+WIRE_VERSION = 1
+HEADER = struct.Struct("<BdBH")
+NO_LOCATION = 0xFFFF
+LOCATION_SEPARATOR = "\x1f"
+
+WEATHER_HEADER = struct.Struct("<dddBH")
+LMP_HEADER = struct.Struct("<dII")
+
+# Per-period weather values, in the order of a message's value columns
+WEATHER_PERIOD_FIELDS = (
+    "temperature", "probability_of_precipitation", "wind_speed_avg", "wind_speed_max", "wind_direction",
+    "is_daytime", "temperature_trend", "rain", "snow", "cloud", "storm",
+)
+# Price components of an LMP interval message, in feature vector order
+LMP_COMPONENTS = ("lmp", "energy", "congestion", "loss")
+# Columnar types: the data fields holding one value per entry of data["location_ids"]
+COLUMNAR_FIELDS = {"lmp": LMP_COMPONENTS}
+
+WIND_SPEED_PATTERN = re.compile(r'\d+')
+RAIN_PATTERN = re.compile(r'rain')
+SNOW_PATTERN = re.compile(r'snow')
+CLOUD_PATTERN = re.compile(r'cloud|overcast')
+STORM_PATTERN = re.compile(r'thunder|storm|lightning')
+
+WIND_DIRECTION_DEGREES = {
+    'N': 0, 'NNE': 22.5, 'NE': 45, 'ENE': 67.5,
+    'E': 90, 'ESE': 112.5, 'SE': 135, 'SSE': 157.5,
+    'S': 180, 'SSW': 202.5, 'SW': 225, 'WSW': 247.5,
+    'W': 270, 'WNW': 292.5, 'NW': 315, 'NNW': 337.5
+}
+TEMPERATURE_TRENDS = {"rising": 1, "falling": -1}
+
+
+# windSpeed and shortForecast come from a small vocabulary ("5 to 10 mph",
+# "Chance Rain Showers", ...), so each distinct string is only ever parsed once.
+@lru_cache(maxsize=4096)
+def _wind_speeds(wind_str: str) -> Tuple[float, float]:
+    speeds = [int(s) for s in WIND_SPEED_PATTERN.findall(wind_str)]
+    if not speeds:
+        return 0.0, 0.0
+    return sum(speeds) / len(speeds), float(max(speeds))
+
+
+@lru_cache(maxsize=4096)
+def _condition_flags(short_forecast: str) -> Tuple[int, int, int, int]:
+    forecast = short_forecast.lower()
+    return (
+        1 if RAIN_PATTERN.search(forecast) else 0,
+        1 if SNOW_PATTERN.search(forecast) else 0,
+        1 if CLOUD_PATTERN.search(forecast) else 0,
+        1 if STORM_PATTERN.search(forecast) else 0,
+    )
+
+
+def _safe_float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(timestamp).timestamp() if timestamp else None
+
+
+def weather_period_values(periods: List[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pull the fields the weather features use out of NWS forecast periods: start
+    times as epoch seconds and a (periods, len(WEATHER_PERIOD_FIELDS)) float32 block.
+    """
+    starts = np.zeros(len(periods), dtype=np.float64)
+    values = np.zeros((len(periods), len(WEATHER_PERIOD_FIELDS)), dtype=np.float32)
+    for p, period in enumerate(periods):
+        starts[p] = _epoch(period.get("startTime")) or np.nan
+        values[p, 0] = _safe_float(period.get("temperature"))
+        values[p, 1] = _safe_float((period.get("probabilityOfPrecipitation") or {}).get("value"), 0)
+        values[p, 2:4] = _wind_speeds(period.get("windSpeed") or "0 mph")
+        values[p, 4] = WIND_DIRECTION_DEGREES.get((period.get("windDirection") or "N").upper(), 0.0)
+        values[p, 5] = 1 if period.get("isDaytime", False) else 0
+        values[p, 6] = TEMPERATURE_TRENDS.get((period.get("temperatureTrend") or "").lower(), 0)
+        values[p, 7:11] = _condition_flags(period.get("shortForecast") or "")
+    return starts, values
+
+
+def weather_forecast_data(forecast: dict) -> Dict[str, Any]:
+    """The forecast part of a weather message's data: update_time, period_start and periods."""
+    starts, values = weather_period_values(forecast.get("periods") or [])
+    return {
+        "update_time": _epoch(forecast.get("updateTime") or forecast.get("generatedAt")),
+        "period_start": starts,
+        "periods": values,
+    }
+
+
+def take_locations(msg: Dict[str, Any], rows: np.ndarray) -> Dict[str, Any]:
+    """A copy of a columnar message keeping only the given rows (index or mask) of its per-location arrays."""
+    data = dict(msg["data"])
+    for field in ("location_ids", *COLUMNAR_FIELDS[msg["type"]]):
+        data[field] = np.asarray(data[field])[rows]
+    return {**msg, "data": data}
+
+
+def _encode_weather(data: Dict[str, Any]) -> bytes:
+    grid_id = (data.get("grid_id") or "").encode()
+    starts = np.ascontiguousarray(data["period_start"], dtype=np.float64)
+    values = np.ascontiguousarray(data["periods"], dtype=np.float32)
+    update_time = data.get("update_time")
+    return b"".join((
+        WEATHER_HEADER.pack(data["lat"], data["lon"], np.nan if update_time is None else update_time,
+                            len(starts), len(grid_id)),
+        grid_id,
+        starts.tobytes(),
+        values.tobytes(),
+    ))
+
+
+def _decode_weather(buffer: memoryview) -> Dict[str, Any]:
+    lat, lon, update_time, n, grid_id_length = WEATHER_HEADER.unpack_from(buffer)
+    offset = WEATHER_HEADER.size
+    grid_id = bytes(buffer[offset:offset + grid_id_length]).decode()
+    offset += grid_id_length
+    starts = np.frombuffer(buffer, dtype=np.float64, count=n, offset=offset)
+    offset += starts.nbytes
+    values = np.frombuffer(buffer, dtype=np.float32, count=n * len(WEATHER_PERIOD_FIELDS), offset=offset)
+    return {
+        "lat": lat,
+        "lon": lon,
+        "grid_id": grid_id or None,
+        "update_time": None if np.isnan(update_time) else update_time,
+        "period_start": starts,
+        "periods": values.reshape(n, len(WEATHER_PERIOD_FIELDS)),
+    }
+
+
+def _encode_lmp(data: Dict[str, Any]) -> bytes:
+    location_ids = LOCATION_SEPARATOR.join(str(location_id) for location_id in data["location_ids"]).encode()
+    n = len(data["location_ids"])
+    return b"".join((
+        LMP_HEADER.pack(data["interval_start"], n, len(location_ids)),
+        location_ids,
+        *(np.ascontiguousarray(data[component], dtype=np.float32).tobytes() for component in LMP_COMPONENTS),
+    ))
+
+
+def _decode_lmp(buffer: memoryview) -> Dict[str, Any]:
+    interval_start, n, location_ids_length = LMP_HEADER.unpack_from(buffer)
+    offset = LMP_HEADER.size
+    location_ids = bytes(buffer[offset:offset + location_ids_length]).decode()
+    offset += location_ids_length
+    data = {
+        "interval_start": interval_start,
+        "location_ids": np.array(location_ids.split(LOCATION_SEPARATOR) if n else [], dtype=str),
+    }
+    for component in LMP_COMPONENTS:
+        data[component] = np.frombuffer(buffer, dtype=np.float32, count=n, offset=offset)
+        offset += 4 * n
+    return data
+
+
+SCHEMAS = {
+    "weather": (_encode_weather, _decode_weather),
+    "lmp": (_encode_lmp, _decode_lmp),
+}
+
+
+def encode_message(msg: Dict[str, Any]) -> bytes:
+    """Serialize an ingestion message. ingestion_timestamp must be epoch seconds."""
+    msg_type = msg["type"].encode()
+    location_id = msg.get("location_id")
+    location_bytes = b"" if location_id is None else str(location_id).encode()
+    schema = SCHEMAS.get(msg["type"])
+    body = schema[0](msg["data"]) if schema else pickle.dumps(msg["data"], protocol=pickle.HIGHEST_PROTOCOL)
+    return b"".join((
+        HEADER.pack(WIRE_VERSION, float(msg["ingestion_timestamp"]), len(msg_type),
+                    NO_LOCATION if location_id is None else len(location_bytes)),
+        msg_type,
+        location_bytes,
+        body,
+    ))
+
+
+def _read_header(buffer: memoryview) -> Tuple[Dict[str, Any], int]:
+    version, timestamp, type_length, location_length = HEADER.unpack_from(buffer)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported message wire version {version}")
+    offset = HEADER.size
+    msg_type = bytes(buffer[offset:offset + type_length]).decode()
+    offset += type_length
+    location_id = None
+    if location_length != NO_LOCATION:
+        location_id = bytes(buffer[offset:offset + location_length]).decode()
+        offset += location_length
+    return {"type": msg_type, "location_id": location_id, "ingestion_timestamp": timestamp}, offset
+
+
+def message_header(encoded: bytes) -> Dict[str, Any]:
+    """type, location_id and ingestion_timestamp of an encoded message, without decoding its body."""
+    return _read_header(memoryview(encoded))[0]
+
+
+def decode_message(encoded: Any) -> Dict[str, Any]:
+    """Deserialize a message from encode_message(). Messages that are already dicts pass through."""
+    if isinstance(encoded, dict):
+        return encoded
+    buffer = memoryview(encoded)
+    msg, offset = _read_header(buffer)
+    schema = SCHEMAS.get(msg["type"])
+    msg["data"] = schema[1](buffer[offset:]) if schema else pickle.loads(buffer[offset:])
+    return msg
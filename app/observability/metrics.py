@@ -0,0 +1,71 @@
+"""
+Pipeline metrics. Each process records into its own default registry and serves it
+on its own port (see prometheus.start_process_metrics_server). Hot paths record one
+sample per batch rather than per message.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+SOURCE_POLL_DURATION = Histogram(
+    "source_poll_duration_seconds",
+    "Wall time of one poll of an external data source",
+    ["source"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+SOURCE_POLL_INTERVAL = Gauge(
+    "source_poll_interval_seconds",
+    "Current poll interval of an external data source",
+    ["source"],
+)
+SOURCE_POLLS_SKIPPED = Counter(
+    "source_polls_skipped_total",
+    "Scheduled polls skipped because the previous poll of the source was still running",
+    ["source"],
+)
+SOURCE_REQUESTS = Counter(
+    "source_requests_total",
+    "Requests made to an external data source, by HTTP status or outcome",
+    ["source", "status"],
+)
+QUEUE_DEPTH = Gauge(
+    "pipeline_queue_depth",
+    "Messages waiting in an inter-process queue",
+    ["queue"],
+)
+CHANNEL_EVENTS = Counter(
+    "pipeline_channel_events_total",
+    "Overflow handling in an inter-process channel: messages dropped, coalesced, or puts that blocked",
+    ["queue", "event"],
+)
+VECTORIZE_LATENCY = Histogram(
+    "adapter_vectorize_seconds",
+    "Wall time of one vectorize_batch call of a feature adapter",
+    ["msg_type"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+VECTORIZE_BATCH_SIZE = Histogram(
+    "adapter_vectorize_batch_size",
+    "Messages per vectorize_batch call of a feature adapter",
+    ["msg_type"],
+    buckets=(1, 8, 32, 128, 512, 2048, 8192),
+)
+FEATURE_STORE_MESSAGES = Counter(
+    "feature_store_messages_total",
+    "Raw messages drained from the ingestion queue by the feature store",
+)
+FEATURE_STORE_UPDATES = Counter(
+    "feature_store_updates_total",
+    "(location, horizon) feature rows written to the shared feature tensor",
+    ["msg_type"],
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "inference_batch_size",
+    "Locations scored in one model call",
+    ["horizon"],
+    buckets=(1, 8, 32, 128, 512, 2048, 8192, 32768),
+)
+INFERENCE_LATENCY = Histogram(
+    "inference_batch_seconds",
+    "Wall time to gather features and score one inference batch",
+    ["horizon"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
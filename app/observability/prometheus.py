@@ -1,5 +1,35 @@
+import logging
+
 from prometheus_client import start_http_server
 
+log = logging.getLogger(__name__)
+
+# Every process serves its own registry, on observability.metrics_base_port + offset
+PROCESS_PORT_OFFSETS = {
+    "main": 0,
+    "ingestion": 1,
+    "feature_store": 2,
+    "inference": 3,
+}
+# Further instances of a process (feature store shards) are served this many ports apart
+INSTANCE_PORT_STRIDE = 10
+
 def start_metrics_server(port: int = 8000):
     start_http_server(port)
-    print(f"[Metrics] Prometheus metrics available at http://localhost:{port}/metrics")
+    log.info(f"[Metrics] Prometheus metrics available at http://localhost:{port}/metrics")
+
+def process_metrics_port(base_port: int, process: str, instance: int = 0) -> int:
+    return base_port + PROCESS_PORT_OFFSETS[process] + instance * INSTANCE_PORT_STRIDE
+
+def start_process_metrics_server(config, process: str, instance: int = 0):
+    """
+    Start the metrics endpoint of one pipeline process. Must be called from inside
+    that process (i.e. in run()), since each process only exposes its own samples.
+    """
+    if not config.observability.metrics_enabled:
+        return
+    port = process_metrics_port(config.observability.metrics_base_port, process, instance)
+    try:
+        start_metrics_server(port)
+    except OSError as e:
+        log.warning(f"[Metrics] Could not serve {process} metrics on port {port}: {e}")
@@ -0,0 +1,269 @@
+"""
+Replay archived ingestion messages through the feature pipeline in event-time order,
+as fast as the CPU allows. Used for backtests and to rebuild feature history after an
+adapter change:
+
+    python -m app.replay --start 2025-04-01 --end 2025-05-01 --archive-to /data/replay
+
+Archive partitions are decoded in parallel worker processes, a bounded number ahead
+of the consumer, and the per-type streams are merged by event time. The feature
+store and (with --inference) the inference engine run in this process on a virtual
+clock that follows event time, so refresh windows behave as they did live.
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+import numpy as np
+
+from .config import Config, load_config
+from .data_integration.reference_data import load_iso_location_ids
+from .feature_vectorization.adapters import LmpFeatureAdapter, NaturalGasFeatureAdapter, WeatherFeatureAdapter
+from .feature_vectorization.archive import ArchiveReader, ColumnarArchiveWriter
+from .feature_vectorization.feature_adapter import FeatureAdapter
+from .feature_vectorization.feature_store import FeatureStoreProcess
+from .feature_vectorization.shared_feature_tensor import SharedFeatureTensor
+from .inference.inference_process import InferenceEngineProcess
+from .logging_helper import setup_logging
+
+log = logging.getLogger(__name__)
+
+class VirtualClock:
+    """A clock that only moves when told to, used in place of wall time during replay."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def advance_to(self, event_time: float):
+        # Never step backwards, refresh windows assume a monotonic clock
+        self._now = max(self._now, event_time)
+
+    def now(self) -> float:
+        return self._now
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """ISO date or datetime to epoch seconds, naive values taken as UTC."""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def decode_partition(root: str, adapter_class: Type[FeatureAdapter], msg_type: str, partition: Tuple[str, str],
+                     start: Optional[float], end: Optional[float]) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Read one archive partition back into (event_time, message) pairs, in event-time
+    order. Takes the adapter class rather than the adapter: the live adapter holds the
+    archive buffers of the replay output and would be pickled with every partition.
+    """
+    reader = ArchiveReader(root)
+    table = reader.read(msg_type, columns=adapter_class.replay_columns, start=start, end=end,
+                        filter=ArchiveReader.partition_filter(*partition))
+    if table is None or table.num_rows == 0:
+        return []
+    return adapter_class.messages_from_table(table, msg_type)
+
+
+def prefetch(executor: Executor, fn: Callable, items: Iterable, depth: int) -> Iterator[Any]:
+    """executor.map, but with at most depth results decoded ahead of the consumer."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, *item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def replay_stream(executor: Executor, root: str, adapter: FeatureAdapter, start: Optional[float],
+                  end: Optional[float], depth: int) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    reader = ArchiveReader(root)
+    partitions = [p for p in reader.partitions(adapter.message_type) if _partition_in_range(p, start, end)]
+    log.info(f"Replaying {len(partitions)} '{adapter.message_type}' partitions")
+    adapter_class = type(adapter)
+    for messages in prefetch(executor, decode_partition,
+                             ((root, adapter_class, adapter.message_type, p, start, end) for p in partitions), depth):
+        yield from messages
+
+
+def _partition_in_range(partition: Tuple[str, str], start: Optional[float], end: Optional[float]) -> bool:
+    hour_start = datetime.strptime(f"{partition[0]} {partition[1]}", "%Y-%m-%d %H").replace(
+        tzinfo=timezone.utc).timestamp()
+    return (start is None or hour_start + 3600 > start) and (end is None or hour_start < end)
+
+
+def batches(stream: Iterator[Tuple[float, Dict[str, Any]]], max_size: int) -> Iterator[List[Tuple[float, Dict[str, Any]]]]:
+    """
+    Cut the merged stream into feature store batches. A batch closes before a
+    (type, location) repeats, so coalescing never drops a historical snapshot.
+    """
+    batch, keys = [], set()
+    for event_time, msg in stream:
+        key = (msg["type"], msg["location_id"])
+        if key in keys or len(batch) >= max_size:
+            yield batch
+            batch, keys = [], set()
+        batch.append((event_time, msg))
+        keys.add(key)
+    if batch:
+        yield batch
+
+
+class ForecastSink:
+    """Queue-like sink archiving replayed forecasts, one row per location, as msg_type "forecast"."""
+
+    def __init__(self, config: Config, root: str, clock: VirtualClock):
+        self.clock = clock
+        self.writer = ColumnarArchiveWriter(
+            root=root,
+            msg_type="forecast",
+            row_group_size=config.archive.row_group_size,
+            flush_interval_sec=config.archive.flush_interval_sec,
+            compression=config.archive.compression,
+        )
+
+    def put(self, result: Dict[str, Any]):
+        payload = json.dumps({"horizon": result["horizon"].value, "model_version": result["model_version"]})
+        for location_id, forecast in zip(result["location_ids"], result["forecast"]):
+            self.writer.append({
+                "event_time": self.clock.now(),
+                "location_id": location_id,
+                "payload": payload,
+                "features": np.asarray(forecast, dtype=np.float32).ravel().tolist(),
+            })
+        self.writer.flush_if_due()
+
+    def close(self):
+        self.writer.close()
+
+
+def drain(handles: queue.SimpleQueue) -> Iterator[Dict[str, Any]]:
+    while True:
+        try:
+            yield handles.get_nowait()
+        except queue.Empty:
+            return
+
+
+def replay(config: Config, msg_types: List[str], start: Optional[float] = None, end: Optional[float] = None,
+           workers: int = os.cpu_count(), archive_to: Optional[str] = None, inference: bool = False,
+           forecasts_to: Optional[str] = None) -> Dict[str, Any]:
+    source_root = config.training.training_data_volume_path
+    if archive_to is not None and os.path.abspath(archive_to) == os.path.abspath(source_root):
+        raise ValueError("Replaying into the source archive would duplicate every row, pick another --archive-to")
+
+    # Adapters archive under training_data_volume_path, point them at the replay output
+    output_config = config.model_copy(deep=True)
+    output_config.training.training_data_volume_path = archive_to or source_root
+    vectorizers = {
+        "weather": WeatherFeatureAdapter(output_config),
+        "lmp": LmpFeatureAdapter(output_config),
+        "natural_gas": NaturalGasFeatureAdapter(output_config),
+    }
+    vectorizers = {msg_type: vectorizers[msg_type] for msg_type in msg_types}
+
+    clock = VirtualClock()
+    shared_feature_store = SharedFeatureTensor(
+        msg_types={msg_type: adapter.feature_vector_size for msg_type, adapter in vectorizers.items()},
+        location_ids=load_iso_location_ids(config.general.iso, config.general.nodes_path),
+    )
+    handles = queue.SimpleQueue()
+    feature_store = FeatureStoreProcess(
+        config=config,
+        input_queue=None,
+        output_queue=handles,
+        shared_feature_store=shared_feature_store,
+        vectorizers=vectorizers,
+        archive=archive_to is not None,
+    )
+    sink = ForecastSink(config, forecasts_to, clock) if inference and forecasts_to else None
+    engine = None
+    if inference:
+        engine = InferenceEngineProcess(config, shared_feature_store, input_queue=None, output_queue=sink,
+                                        clock=clock.now)
+        engine.start_model_reloader(background=False)
+
+    stats = {"messages": 0, "batches": 0, "first_event": None, "last_event": None}
+    wall_start = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            streams = [replay_stream(executor, source_root, vectorizers[msg_type], start, end, depth=2 * workers)
+                       for msg_type in msg_types]
+            merged = heapq.merge(*streams, key=lambda pair: pair[0])
+            for batch in batches(merged, config.feature_store.batch_max_size):
+                clock.advance_to(batch[-1][0])
+                feature_store._handle_batch([msg for _, msg in batch])
+                if engine is not None:
+                    for handle in drain(handles):
+                        engine._mark_pending(handle)
+                    engine._run_ready_batches()
+                else:
+                    for _ in drain(handles):
+                        pass
+                for adapter in vectorizers.values():
+                    feature_store._flush_archive(adapter)
+
+                stats["messages"] += len(batch)
+                stats["batches"] += 1
+                stats["first_event"] = stats["first_event"] or batch[0][0]
+                stats["last_event"] = batch[-1][0]
+    finally:
+        for adapter in vectorizers.values():
+            feature_store._flush_archive(adapter, force=True)
+        if sink is not None:
+            sink.close()
+        shared_feature_store.close()
+
+    stats["wall_seconds"] = time.monotonic() - wall_start
+    if stats["messages"]:
+        event_span = stats["last_event"] - stats["first_event"]
+        log.info(f"Replayed {stats['messages']} messages in {stats['batches']} batches covering "
+                 f"{event_span / 3600:.1f}h of event time in {stats['wall_seconds']:.1f}s "
+                 f"({stats['messages'] / stats['wall_seconds']:.0f} msg/s, "
+                 f"{event_span / max(stats['wall_seconds'], 1e-9):.0f}x real time)")
+    else:
+        log.info("Nothing to replay in the requested range")
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", help="Replay events at or after this UTC date/time")
+    parser.add_argument("--end", help="Replay events before this UTC date/time")
+    parser.add_argument("--types", nargs="+", default=["weather"], help="Message types to replay")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Partition decoding processes")
+    parser.add_argument("--archive-to", help="Archive root for the re-vectorized messages, off if unset")
+    parser.add_argument("--inference", action="store_true", help="Score replayed features with the current models")
+    parser.add_argument("--forecasts-to", help="Archive root for replayed forecasts (with --inference)")
+    return parser.parse_args()
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    config = load_config()
+    replay(
+        config,
+        msg_types=args.types,
+        start=parse_time(args.start),
+        end=parse_time(args.end),
+        workers=args.workers,
+        archive_to=args.archive_to,
+        inference=args.inference,
+        forecasts_to=args.forecasts_to,
+    )
+
+
+if __name__ == "__main__":
+    main()
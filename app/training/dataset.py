@@ -0,0 +1,226 @@
+import logging
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ..config import Config
+from ..feature_vectorization.archive import ArchiveReader
+from ..feature_vectorization.horizons import Horizon
+
+log = logging.getLogger(__name__)
+
+
+def features_block(column: pa.ChunkedArray, width: int) -> np.ndarray:
+    """(rows, width) float32 view of an archived list<float> features column; null rows become zeros."""
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if column.null_count:
+        column = column.fill_null(pa.scalar([0.0] * width, type=column.type))
+    return column.flatten().to_numpy(zero_copy_only=False).astype(np.float32, copy=False).reshape(-1, width)
+
+
+class TrainingMatrices:
+    """
+    Memory-mapped training set: features (n_rows, n_features) and targets (n_rows,)
+    float32 arrays on disk. Only the mini-batch being served is ever in RAM.
+    """
+
+    def __init__(self, directory: str, n_rows: int, n_features: int):
+        self.directory = directory
+        self.n_rows = n_rows
+        self.n_features = n_features
+
+    @property
+    def features(self) -> np.memmap:
+        return np.memmap(os.path.join(self.directory, "features.f32"), dtype=np.float32, mode="r",
+                         shape=(self.n_rows, self.n_features))
+
+    @property
+    def targets(self) -> np.memmap:
+        return np.memmap(os.path.join(self.directory, "targets.f32"), dtype=np.float32, mode="r",
+                         shape=(self.n_rows,))
+
+    def iter_minibatches(self, batch_size: int, shuffle: bool = True,
+                         seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (features, targets) mini-batches. Shuffling is done over whole batches
+        so every read is still a contiguous slice of the memmap.
+        """
+        if self.n_rows == 0:
+            return
+        features, targets = self.features, self.targets
+        starts = np.arange(0, self.n_rows, batch_size)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(starts)
+        for start in starts:
+            end = min(start + batch_size, self.n_rows)
+            yield np.asarray(features[start:end]), np.asarray(targets[start:end])
+
+
+class StreamingDatasetBuilder:
+    """
+    Builds training matrices from the archive without holding the history in RAM.
+
+    Rows come from the primary feature type (the first in feature_types), one per
+    archived snapshot. Each row is extended with the latest snapshot of every other
+    feature type at or before it (per location, or global for types archived
+    without a location), and labelled with the realized target_column of
+    target_type at the same location one horizon later.
+
+    The archive is walked one hour partition at a time in chunks of at most
+    chunk_rows rows, derived from general.max_ram, and each chunk is appended to a
+    memory-mapped matrix on disk.
+    """
+
+    def __init__(self, config: Config, feature_types: List[str], horizon: Horizon, target_type: str = "lmp",
+                 target_column: str = "lmp", scratch_dir: Optional[str] = None,
+                 feature_widths: Optional[Dict[str, int]] = None):
+        self.reader = ArchiveReader(config.training.training_data_volume_path)
+        self.feature_types = feature_types
+        # Known vector sizes per type (the adapters'), so types without an archive yet are zero filled
+        self.feature_widths = feature_widths or {}
+        self.horizon = horizon
+        self.target_type = target_type
+        self.target_column = target_column
+        self.scratch_dir = scratch_dir or os.path.join(config.training.training_data_volume_path, "_scratch")
+
+        self.memory_budget_bytes = int(config.general.max_ram_bytes * config.training.dataset_memory_fraction)
+        self.target_tolerance_sec = config.training.target_tolerance_sec
+        self.feature_lookback_sec = config.training.feature_lookback_sec
+
+    def feature_width(self, msg_type: str) -> int:
+        if msg_type in self.feature_widths:
+            return self.feature_widths[msg_type]
+        dataset = self.reader.dataset(msg_type)
+        if dataset is None:
+            raise ValueError(f"No archived data for feature type '{msg_type}'")
+        sample = dataset.head(1, columns=["features"]).column("features")[0].as_py()
+        return len(sample)
+
+    def chunk_rows(self, row_bytes: int) -> int:
+        # A chunk is alive roughly three times over: as Arrow, as NumPy and after the joins
+        return max(1, self.memory_budget_bytes // (3 * row_bytes))
+
+    def build(self, name: str, partitions: Optional[List[Tuple[str, str]]] = None,
+              start: Optional[float] = None, end: Optional[float] = None) -> TrainingMatrices:
+        """
+        Build the training matrices for the primary type's partitions (every one if not
+        given), optionally limited to [start, end) epoch seconds.
+        """
+        primary = self.feature_types[0]
+        widths = [self.feature_width(msg_type) for msg_type in self.feature_types]
+        n_features = sum(widths)
+        chunk_rows = self.chunk_rows(row_bytes=4 * (n_features + 1) + 64)
+        partitions = partitions if partitions is not None else self.reader.partitions(primary)
+
+        dataset = self.reader.dataset(primary)
+        time_filter = self.reader.time_filter(start, end)
+        capacity = sum(
+            dataset.count_rows(filter=self._and(self.reader.partition_filter(*p), time_filter)) for p in partitions
+        )
+
+        directory = os.path.join(self.scratch_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        features_out = np.memmap(os.path.join(directory, "features.f32"), dtype=np.float32, mode="w+",
+                                 shape=(max(capacity, 1), n_features))
+        targets_out = np.memmap(os.path.join(directory, "targets.f32"), dtype=np.float32, mode="w+",
+                                shape=(max(capacity, 1),))
+
+        log.info(f"Building {name} from {len(partitions)} partitions ({capacity} candidate rows, "
+                 f"{chunk_rows} rows per chunk)")
+        n_rows = 0
+        for partition in partitions:
+            for batch in dataset.to_batches(
+                columns=["event_time", "location_id", "features"],
+                filter=self._and(self.reader.partition_filter(*partition), time_filter),
+                batch_size=chunk_rows,
+            ):
+                if batch.num_rows == 0:
+                    continue
+                chunk_features, chunk_targets = self._build_chunk(batch, widths)
+                rows = len(chunk_targets)
+                features_out[n_rows:n_rows + rows] = chunk_features
+                targets_out[n_rows:n_rows + rows] = chunk_targets
+                n_rows += rows
+
+        features_out.flush()
+        targets_out.flush()
+        del features_out, targets_out
+        log.info(f"Built {name}: {n_rows} labelled rows x {n_features} features")
+        return TrainingMatrices(directory, n_rows, n_features)
+
+    @staticmethod
+    def _and(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return a & b
+
+    def _build_chunk(self, batch: pa.RecordBatch, widths: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        frame = pd.DataFrame({
+            "event_time": batch.column("event_time").to_numpy(),
+            "location_id": batch.column("location_id").to_pandas(),
+            "row": np.arange(batch.num_rows),
+        }).sort_values("event_time", kind="stable")
+        t0, t1 = frame["event_time"].iloc[0], frame["event_time"].iloc[-1]
+
+        blocks = [features_block(batch.column("features"), widths[0])[frame["row"].to_numpy()]]
+        for msg_type, width in zip(self.feature_types[1:], widths[1:]):
+            blocks.append(self._latest_features(frame, msg_type, width, t0, t1))
+
+        targets = self._realized_targets(frame, t0, t1)
+        labelled = ~np.isnan(targets)
+        return np.concatenate(blocks, axis=1)[labelled], targets[labelled]
+
+    def _latest_features(self, frame: pd.DataFrame, msg_type: str, width: int, t0: float, t1: float) -> np.ndarray:
+        """As-of join: the latest msg_type snapshot at or before each row's event_time."""
+        table = self.reader.read(msg_type, columns=["event_time", "location_id", "features"],
+                                 start=t0 - self.feature_lookback_sec, end=t1 + 1)
+        out = np.zeros((len(frame), width), dtype=np.float32)
+        if table is None or table.num_rows == 0:
+            return out
+
+        snapshots = pd.DataFrame({
+            "event_time": table.column("event_time").to_numpy(),
+            "location_id": table.column("location_id").to_pandas(),
+            "snapshot_row": np.arange(table.num_rows),
+        }).sort_values("event_time", kind="stable")
+        is_global = table.column("location_id").null_count == table.num_rows
+        merged = pd.merge_asof(
+            frame[["event_time", "location_id"]],
+            snapshots.drop(columns="location_id") if is_global else snapshots,
+            on="event_time",
+            by=None if is_global else "location_id",
+            direction="backward",
+        )
+        found = merged["snapshot_row"].notna().to_numpy()
+        snapshot_rows = merged["snapshot_row"].to_numpy()[found].astype(np.int64)
+        out[found] = features_block(table.column("features"), width)[snapshot_rows]
+        return out
+
+    def _realized_targets(self, frame: pd.DataFrame, t0: float, t1: float) -> np.ndarray:
+        """target_column at each row's location, at the first interval at or after event_time + horizon."""
+        offset = self.horizon.seconds
+        table = self.reader.read(self.target_type, columns=["event_time", "location_id", self.target_column],
+                                 start=t0 + offset, end=t1 + offset + self.target_tolerance_sec + 1)
+        if table is None or table.num_rows == 0:
+            return np.full(len(frame), np.nan, dtype=np.float32)
+
+        realized = pd.DataFrame({
+            "target_time": table.column("event_time").to_numpy(),
+            "location_id": table.column("location_id").to_pandas(),
+            "target": table.column(self.target_column).to_numpy(zero_copy_only=False),
+        }).sort_values("target_time", kind="stable")
+        lookup = frame[["event_time", "location_id"]].assign(target_time=frame["event_time"] + offset)
+        merged = pd.merge_asof(
+            lookup,
+            realized,
+            on="target_time",
+            by="location_id",
+            direction="forward",
+            tolerance=self.target_tolerance_sec,
+        )
+        return merged["target"].to_numpy(dtype=np.float32, na_value=np.nan)
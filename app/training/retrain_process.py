@@ -1,35 +1,154 @@
+import json
 import multiprocessing as mp
-from typing import Dict, Any
-from datetime import datetime, timedelta, timezone
+import os
+import shutil
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
 import time
-from pytimeparse import parse
 import logging
 
+from app.config import Config
+from app.feature_vectorization.archive import ArchiveReader
+from app.feature_vectorization.horizons import Horizon
+from app.inference.model import LinearForecastModel
+from app.inference.model_registry import ModelRegistry
 from app.logging_helper import setup_logging
+from app.training.dataset import StreamingDatasetBuilder
+from app.utils.atomic_json import write_json_atomically
 
 log = logging.getLogger(__name__)
 
 class RetrainProcess(mp.Process):
+    """
+    Periodically warm-start retrains one model per horizon on archive partitions it
+    has not consumed yet.
+
+    A watermark of the last consumed hour partition is kept per horizon. A partition
+    only becomes eligible once its realized targets can exist (the hour has closed
+    and one horizon plus the target tolerance has passed), so nothing is consumed
+    before it can be labelled. Each cycle reports rows, partitions and wall/CPU time
+    per horizon, and appends them to the retrain history for tuning
+    training.training_interval.
+    """
 
     def __init__(self,
-                 config,
-                 output_queue: mp.Queue):
+                 config: Config,
+                 output_queue: mp.Queue,
+                 feature_types: Optional[List[str]] = None,
+                 feature_widths: Optional[Dict[str, int]] = None):
         super().__init__()
-        self.training_interval_seconds = parse(config.training_interval)
-        self.last_retrain = datetime.now(tz=timezone.utc)
+        self.config = config
+        self.output_queue = output_queue
+        # Must match the order the inference engine concatenates feature types in
+        self.feature_types = feature_types or list(feature_widths or {}) or ["weather"]
+        # Vector size per type, types that aren't archived (yet) are zero filled like in the feature tensor
+        self.feature_widths = feature_widths
+        self.training_interval_seconds = config.training.training_interval_seconds
+        self.state_dir = os.path.join(config.training.training_data_volume_path, "_state")
+        self.watermark_path = os.path.join(self.state_dir, "retrain_watermark.json")
+        self.history_path = os.path.join(self.state_dir, "retrain_history.jsonl")
+        self.registry = ModelRegistry(config.training.model_path, config.training.keep_model_versions)
+        self._stop_event = mp.Event()
+
+    def stop(self):
+        self._stop_event.set()
 
     def run(self):
         setup_logging()
-        while True:
-            if self.should_retrain():
+        log.info("[RetrainProcess] Starting...")
+        while not self._stop_event.is_set():
+            try:
                 self.retrain()
-            time.sleep(self.training_interval_seconds)
+            except Exception as e:
+                log.error(f"Retrain cycle failed: {e}", exc_info=True)
+            self._stop_event.wait(self.training_interval_seconds)
+        log.info("[RetrainProcess] Exiting...")
+
+    def load_watermarks(self) -> Dict[str, Tuple[str, str]]:
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path, "r") as f:
+            return {horizon: tuple(partition) for horizon, partition in json.load(f).items()}
 
-    def should_retrain(self):
-        return datetime.now(tz=timezone.utc) - self.last_retrain > timedelta(seconds=self.training_interval_seconds)
+    def save_watermarks(self, watermarks: Dict[str, Tuple[str, str]]):
+        write_json_atomically(self.watermark_path, watermarks)
+
+    def new_partitions(self, horizon: Horizon, watermark: Optional[Tuple[str, str]],
+                       now: float) -> List[Tuple[str, str]]:
+        """Partitions after the watermark whose targets are complete by now."""
+        reader = ArchiveReader(self.config.training.training_data_volume_path)
+        settled_before = now - horizon.seconds - self.config.training.target_tolerance_sec
+        eligible = []
+        for date, hour in reader.partitions(self.feature_types[0]):
+            if watermark is not None and (date, hour) <= watermark:
+                continue
+            hour_end = datetime.strptime(f"{date} {hour}", "%Y-%m-%d %H").replace(
+                tzinfo=timezone.utc).timestamp() + 3600
+            if hour_end > settled_before:
+                break
+            eligible.append((date, hour))
+        return eligible
 
     def retrain(self):
-        # Probably going to want to have some kind of data archived onto a mounted disk volume
-        # We will also need to have "True" target values stored for each interval as well as what we predicted
-        # Not sure...
-        pass
\ No newline at end of file
+        now = time.time()
+        watermarks = self.load_watermarks()
+        for horizon in Horizon:
+            partitions = self.new_partitions(horizon, watermarks.get(horizon.value), now)
+            if not partitions:
+                log.info(f"No new partitions to train {horizon.value} on")
+                continue
+            stats = self.retrain_horizon(horizon, partitions)
+            watermarks[horizon.value] = partitions[-1]
+            self.save_watermarks(watermarks)
+            self.record_cycle(stats)
+
+    def retrain_horizon(self, horizon: Horizon, partitions: List[Tuple[str, str]]) -> Dict[str, Any]:
+        wall_start, cpu_start = time.monotonic(), time.process_time()
+        builder = StreamingDatasetBuilder(self.config, self.feature_types, horizon,
+                                          target_type=self.config.training.target_type,
+                                          target_column=self.config.training.target_column,
+                                          feature_widths=self.feature_widths)
+        matrices = builder.build(name=horizon.value, partitions=partitions)
+        build_seconds = time.monotonic() - wall_start
+
+        model = self.load_model(horizon, matrices.n_features)
+        version = self.registry.current_version(horizon)
+        if matrices.n_rows:
+            model.decay(self.config.training.forgetting_factor)
+            for features, targets in matrices.iter_minibatches(self.config.training.batch_size):
+                model.partial_fit(features, targets, refit=False)
+            model.refit()
+            version = self.registry.publish(horizon, model)
+        shutil.rmtree(matrices.directory, ignore_errors=True)
+
+        stats = {
+            "horizon": horizon.value,
+            "version": version,
+            "finished_at": datetime.now(tz=timezone.utc).isoformat(timespec="seconds"),
+            "partitions": len(partitions),
+            "first_partition": "/".join(partitions[0]),
+            "last_partition": "/".join(partitions[-1]),
+            "rows": matrices.n_rows,
+            "features": matrices.n_features,
+            "effective_samples": model.n_samples,
+            "build_seconds": round(build_seconds, 3),
+            "fit_seconds": round(time.monotonic() - wall_start - build_seconds, 3),
+            "cpu_seconds": round(time.process_time() - cpu_start, 3),
+        }
+        log.info(f"Retrained {horizon.value} on {stats['rows']} rows from {stats['partitions']} partitions in "
+                 f"{stats['build_seconds']}s build + {stats['fit_seconds']}s fit ({stats['cpu_seconds']}s CPU)")
+        return stats
+
+    def load_model(self, horizon: Horizon, n_features: int) -> LinearForecastModel:
+        model = self.registry.load(horizon)
+        if model is not None:
+            if model.n_features == n_features:
+                return model
+            log.warning(f"Saved {horizon.value} model has {model.n_features} features, "
+                        f"data has {n_features}: training from scratch")
+        return LinearForecastModel.untrained(n_features, l2_penalty=self.config.training.l2_penalty)
+
+    def record_cycle(self, stats: Dict[str, Any]):
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(self.history_path, "a") as f:
+            f.write(json.dumps(stats) + "\n")
@@ -0,0 +1,15 @@
+import json
+import os
+from typing import Any
+
+
+def write_json_atomically(path: str, obj: Any):
+    """
+    Write obj as JSON to path through a temporary file renamed over it, so readers
+    and a crash mid-write only ever see the previous or the new content.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
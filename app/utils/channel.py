@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from multiprocessing.managers import SyncManager
+from typing import Any, Dict, Iterable, Optional
+
+from ..messages import message_header
+
+POLICIES = ("block", "drop_oldest", "coalesce")
+
+
+class BoundedChannel:
+    """
+    Bounded FIFO between two pipeline stages. Duck-types the queue.Queue methods the
+    stages use (put, put_nowait, get, get_nowait, qsize, empty) and is shared between
+    processes through PipelineManager, like a manager.Queue().
+
+    When a lane is full, policy decides what put() does:
+      block        wait for room, pushing back on the producer
+      drop_oldest  discard the oldest queued message
+      coalesce     a message whose key_fields match a queued one replaces it in place,
+                   so only the latest update per key survives; a new key on a full
+                   lane discards the oldest message
+
+    Messages whose priority_field is one of priority_values go into their own lane
+    of the same capacity, which get() always serves first. A burst of bulk messages
+    then neither delays them nor fills the space they need.
+    """
+
+    def __init__(self, maxsize: int, policy: str = "block", key_fields: Iterable[str] = (),
+                 priority_field: str = "type", priority_values: Iterable[Any] = ()):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {', '.join(POLICIES)}")
+        if policy == "coalesce" and not key_fields:
+            raise ValueError("The coalesce policy needs key_fields")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key_fields = tuple(key_fields)
+        self.priority_field = priority_field
+        self.priority_values = set(priority_values)
+
+        # Priority lane first. Keyed by message key when coalescing, else by arrival number.
+        self._lanes = (OrderedDict(), OrderedDict())
+        self._seq = count()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._stats = {"dropped": 0, "coalesced": 0, "blocked": 0}
+
+    def _lane(self, fields: Any) -> OrderedDict:
+        if self.priority_values and isinstance(fields, dict) and fields.get(self.priority_field) in self.priority_values:
+            return self._lanes[0]
+        return self._lanes[1]
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        # Encoded ingestion messages are routed on their header fields
+        fields = message_header(item) if isinstance(item, (bytes, bytearray)) else item
+        with self._lock:
+            lane = self._lane(fields)
+            key = next(self._seq)
+            if self.policy == "coalesce":
+                key = tuple(fields.get(field) for field in self.key_fields)
+                if key in lane:
+                    lane[key] = item
+                    self._stats["coalesced"] += 1
+                    return
+
+            if len(lane) >= self.maxsize:
+                if self.policy != "block":
+                    lane.popitem(last=False)
+                    self._stats["dropped"] += 1
+                elif not block:
+                    raise queue.Full
+                else:
+                    self._stats["blocked"] += 1
+                    deadline = None if timeout is None else time.monotonic() + timeout
+                    while len(lane) >= self.maxsize:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise queue.Full
+                        self._not_full.wait(remaining)
+
+            lane[key] = item
+            self._not_empty.notify()
+
+    def put_nowait(self, item: Any):
+        self.put(item, block=False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not (self._lanes[0] or self._lanes[1]):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise queue.Empty
+                self._not_empty.wait(remaining)
+            lane = self._lanes[0] or self._lanes[1]
+            _, item = lane.popitem(last=False)
+            # Producers blocked on either lane re-check their own
+            self._not_full.notify_all()
+            return item
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._lanes[0]) + len(self._lanes[1])
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def stats(self) -> Dict[str, int]:
+        """Current depth per lane and the running overflow counts."""
+        with self._lock:
+            return {"depth": len(self._lanes[1]), "priority_depth": len(self._lanes[0]), **self._stats}
+
+
+class PipelineManager(SyncManager):
+    """SyncManager that can also serve BoundedChannels to every pipeline process."""
+
+
+PipelineManager.register("BoundedChannel", BoundedChannel)
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill at `rate` per second up to `capacity`.
+
+    reserve() always succeeds and returns how long the caller has to wait before
+    using what it took, so concurrent callers queue up fairly instead of spinning.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def consume(self, tokens: float = 1.0):
+        """Blocking acquire, for use from regular threads."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire(self, tokens: float = 1.0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
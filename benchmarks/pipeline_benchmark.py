@@ -0,0 +1,341 @@
+"""
+End-to-end throughput benchmark of IngestionProcess -> FeatureStoreProcess ->
+InferenceEngineProcess against the local upstream stub, at several node counts.
+
+    python -m benchmarks.pipeline_benchmark --nodes 1000 10000 50000 --duration 60
+    python -m benchmarks.pipeline_benchmark --nodes 50000 --shards 4
+
+Every stage is measured through the Prometheus metrics it already exports, as the
+difference between a scrape at the end of the warmup and one at the end of the run:
+- messages per second: raw messages drained by the feature store, messages
+  vectorized and locations scored
+- stage latency (p50/p99): wall time of one poll, one vectorize_batch call and one
+  inference batch, interpolated from the histogram buckets
+- peak RSS: VmHWM of every process (Linux only)
+
+Results are written as JSON to benchmarks/results/ (or --output) so runs can be
+diffed across commits.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.config import Config, HostLimitConfig
+from app.data_integration.data_integration_manager import IngestionProcess
+from app.data_integration.reference_data import load_iso_location_ids
+from app.feature_vectorization.adapters import LmpFeatureAdapter, WeatherFeatureAdapter
+from app.feature_vectorization.feature_store import FeatureStoreProcess
+from app.feature_vectorization.shared_feature_tensor import SharedFeatureTensor
+from app.feature_vectorization.sharding import ShardRouter
+from app.inference.inference_process import InferenceEngineProcess
+from app.logging_helper import setup_logging
+from app.observability.prometheus import process_metrics_port
+from app.utils.channel import PipelineManager
+from benchmarks.stub_server import StubServerProcess
+
+log = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Synthetic nodes are spread over roughly the ISO-NE footprint
+LATITUDE_RANGE = (41.0, 47.4)
+LONGITUDE_RANGE = (-73.7, -66.9)
+
+MetricsSnapshot = Dict[Tuple[str, frozenset], float]
+
+
+def write_synthetic_nodes(n_nodes: int, directory: str, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    nodes = pd.DataFrame({
+        "Node/Unit ID": np.arange(1_000_000, 1_000_000 + n_nodes),
+        "Latitude": rng.uniform(*LATITUDE_RANGE, n_nodes).round(4),
+        "Longitude": rng.uniform(*LONGITUDE_RANGE, n_nodes).round(4),
+    })
+    path = os.path.join(directory, f"nodes_{n_nodes}.csv")
+    nodes.to_csv(path, index=False)
+    return path
+
+
+def benchmark_config(args, workdir: str, nodes_path: str, stub_url: str):
+    config = Config()
+    config.general.nodes_path = nodes_path
+    config.data_ingestion.noaa_base_url = stub_url
+    config.data_ingestion.iso_ne_base_url = f"{stub_url}/api/v1.1"
+    # The stub doesn't serve Yahoo Finance
+    config.data_ingestion.enable_natural_gas_data = False
+    config.data_ingestion.nws_points_cache_path = os.path.join(workdir, "nws_points.json")
+    config.data_ingestion.weather_poll_interval_sec = args.poll_interval
+    config.data_ingestion.host_limits = {}
+    config.data_ingestion.default_host_limit = HostLimitConfig(
+        requests_per_second=args.upstream_rps,
+        burst=args.upstream_rps,
+        max_concurrency=args.upstream_concurrency,
+    )
+    config.training.training_data_volume_path = os.path.join(workdir, "training")
+    config.training.model_path = os.path.join(workdir, "models")
+    # Measure capacity, not the refresh throttle
+    config.inference.min_refresh_seconds = {horizon: 0 for horizon in config.inference.min_refresh_seconds}
+    config.observability.metrics_enabled = True
+    config.observability.metrics_base_port = args.metrics_port
+    config.feature_store.shards = args.shards
+    return config
+
+
+def scrape(port: int) -> MetricsSnapshot:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=10) as response:
+        text = response.read().decode()
+    return {
+        (sample.name, frozenset(sample.labels.items())): sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+    }
+
+
+def diff(end: MetricsSnapshot, start: MetricsSnapshot) -> MetricsSnapshot:
+    return {key: value - start.get(key, 0.0) for key, value in end.items()}
+
+
+def merge(snapshots: List[MetricsSnapshot]) -> MetricsSnapshot:
+    """Sum the samples of several instances of one process, e.g. the feature store shards."""
+    merged = defaultdict(float)
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            merged[key] += value
+    return dict(merged)
+
+
+def counter_total(snapshot: MetricsSnapshot, name: str) -> float:
+    return sum(value for (sample_name, _), value in snapshot.items() if sample_name == name)
+
+
+def bucket_quantile(q: float, buckets: List[Tuple[float, float]]) -> Optional[float]:
+    """Same linear interpolation within the matching bucket as PromQL's histogram_quantile."""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if upper_bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+
+def histogram_summary(snapshot: MetricsSnapshot, name: str, label: str) -> Dict[str, dict]:
+    buckets = defaultdict(list)
+    sums, counts = {}, {}
+    for (sample_name, labels), value in snapshot.items():
+        labels = dict(labels)
+        key = labels.get(label, "all")
+        if sample_name == f"{name}_bucket":
+            buckets[key].append((float(labels["le"]), value))
+        elif sample_name == f"{name}_sum":
+            sums[key] = value
+        elif sample_name == f"{name}_count":
+            counts[key] = value
+
+    summary = {}
+    for key, count in counts.items():
+        ordered = sorted(buckets[key])
+        summary[key] = {
+            "count": int(count),
+            "mean": sums[key] / count if count else None,
+            "p50": bucket_quantile(0.5, ordered),
+            "p99": bucket_quantile(0.99, ordered),
+        }
+    return summary
+
+
+def peak_rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_scale(args, n_nodes: int) -> dict:
+    log.info(f"Benchmarking {n_nodes} nodes...")
+    workdir = tempfile.mkdtemp(prefix=f"pipeline_benchmark_{n_nodes}_")
+    nodes_path = write_synthetic_nodes(n_nodes, workdir, seed=args.seed)
+
+    stub = StubServerProcess(args.stub_port, nodes_path, args.latency_ms, args.error_rate,
+                             update_interval_sec=args.poll_interval)
+    stub.start()
+    stub.ready.wait()
+    config = benchmark_config(args, workdir, nodes_path, stub.base_url)
+
+    manager = PipelineManager()
+    manager.start()
+    data_queues = [manager.BoundedChannel(**config.channels.data.model_dump()) for _ in range(args.shards)]
+    inference_queue = manager.BoundedChannel(**config.channels.inference.model_dump())
+    vectorizers = {"weather": WeatherFeatureAdapter(config), "lmp": LmpFeatureAdapter(config)}
+    shared_feature_store = SharedFeatureTensor(
+        msg_types={msg_type: adapter.feature_vector_size for msg_type, adapter in vectorizers.items()},
+        location_ids=load_iso_location_ids(config.general.iso, nodes_path),
+    )
+    # (process, instance) -> process
+    processes = {
+        ("ingestion", 0): IngestionProcess(
+            output_queue=ShardRouter(data_queues, config.feature_store.virtual_nodes), config=config),
+        **{
+            ("feature_store", shard): FeatureStoreProcess(
+                config=config,
+                input_queue=data_queues[shard],
+                output_queue=inference_queue,
+                shared_feature_store=shared_feature_store,
+                vectorizers=vectorizers,
+                shard=shard,
+            )
+            for shard in range(args.shards)
+        },
+        ("inference", 0): InferenceEngineProcess(
+            config=config,
+            shared_feature_store=shared_feature_store,
+            input_queue=inference_queue,
+        ),
+    }
+    for process in processes.values():
+        process.start()
+    ports = {key: process_metrics_port(args.metrics_port, *key) for key in processes}
+    pids = {**{process.name if key[0] == "feature_store" else key[0]: process.pid
+               for key, process in processes.items()},
+            "stub": stub.pid, "queue_manager": manager._process.pid}
+
+    max_queue_depth = {"data_queue": 0, "inference_queue": 0}
+    peak_rss = {}
+
+    def sample_until(deadline: float):
+        while time.monotonic() < deadline:
+            max_queue_depth["data_queue"] = max(
+                max_queue_depth["data_queue"], sum(data_queue.qsize() for data_queue in data_queues))
+            max_queue_depth["inference_queue"] = max(max_queue_depth["inference_queue"], inference_queue.qsize())
+            for name, pid in pids.items():
+                rss = peak_rss_bytes(pid)
+                if rss is not None:
+                    peak_rss[name] = max(peak_rss.get(name, 0), rss)
+            time.sleep(0.5)
+
+    try:
+        sample_until(time.monotonic() + args.warmup)
+        start = {key: scrape(port) for key, port in ports.items()}
+        window_start = time.monotonic()
+        sample_until(window_start + args.duration)
+        end = {key: scrape(port) for key, port in ports.items()}
+        window = time.monotonic() - window_start
+        channel_stats = {
+            **{f"data_queue_{shard}": data_queue.stats() for shard, data_queue in enumerate(data_queues)},
+            "inference_queue": inference_queue.stats(),
+        }
+    finally:
+        for process in processes.values():
+            process.stop()
+            process.join()
+        shared_feature_store.close()
+        manager.shutdown()
+        stub.terminate()
+        stub.join()
+
+    ingestion = diff(end["ingestion", 0], start["ingestion", 0])
+    feature_store = merge([diff(end[key], start[key]) for key in ports if key[0] == "feature_store"])
+    inference = diff(end["inference", 0], start["inference", 0])
+    upstream_requests = defaultdict(float)
+    for (sample_name, labels), value in ingestion.items():
+        if sample_name == "source_requests_total":
+            upstream_requests[dict(labels)["status"]] += value
+
+    return {
+        "nodes": n_nodes,
+        "shards": args.shards,
+        "locations": len(shared_feature_store.location_ids) - 1,
+        "window_sec": round(window, 3),
+        "messages_per_sec": {
+            "ingested": counter_total(feature_store, "feature_store_messages_total") / window,
+            "vectorized": counter_total(feature_store, "adapter_vectorize_batch_size_sum") / window,
+            "feature_updates": counter_total(feature_store, "feature_store_updates_total") / window,
+            "scored": counter_total(inference, "inference_batch_size_sum") / window,
+        },
+        "stage_latency_sec": {
+            "poll": histogram_summary(ingestion, "source_poll_duration_seconds", "source"),
+            "vectorize": histogram_summary(feature_store, "adapter_vectorize_seconds", "msg_type"),
+            "inference": histogram_summary(inference, "inference_batch_seconds", "horizon"),
+        },
+        "upstream_requests": dict(upstream_requests),
+        "max_queue_depth": max_queue_depth,
+        "channel_stats": channel_stats,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--duration", type=float, default=60, help="Measured window per run, seconds")
+    parser.add_argument("--warmup", type=float, default=15, help="Unmeasured lead-in per run, seconds")
+    parser.add_argument("--poll-interval", type=float, default=10, help="Weather poll interval, seconds")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Mean stub response latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that are 503s")
+    parser.add_argument("--upstream-rps", type=float, default=5_000)
+    parser.add_argument("--upstream-concurrency", type=int, default=500)
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--metrics-port", type=int, default=9100)
+    parser.add_argument("--shards", type=int, default=1, help="Feature store processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file, defaults to benchmarks/results/pipeline-<utc time>.json")
+    return parser.parse_args()
+
+
+def main():
+    setup_logging()
+    args = parse_args()
+    started_at = datetime.now(tz=timezone.utc)
+    runs = [run_scale(args, n_nodes) for n_nodes in args.nodes]
+
+    results = {
+        "benchmark": "pipeline",
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": runs,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    log.info(f"Wrote benchmark results to {output}")
+    for run in runs:
+        rates = ", ".join(f"{stage}={rate:,.0f}/s" for stage, rate in run["messages_per_sec"].items())
+        log.info(f"{run['nodes']} nodes: {rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local stand-in for api.weather.gov and the ISO-NE web services, serving the payloads
+under benchmarks/fixtures with configurable latency and error rate.
+
+- /points/{lat},{lon} maps the coordinate onto a synthetic grid of
+  GRID_CELL_DEGREES cells and points at that cell's forecast route.
+- /gridpoints/{office}/{x},{y}/forecast serves the recorded forecast, restamped
+  with a new updateTime every update_interval_sec so each poll carries new data.
+- /api/v1.1/fiveminutelmp/current/all serves one five-minute LMP per node.
+"""
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+
+import pandas as pd
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+# Roughly the 2.5 km NWS forecast grid
+GRID_CELL_DEGREES = 0.025
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, name), "r") as f:
+        return json.load(f)
+
+
+class StubUpstream:
+
+    def __init__(self, base_url: str, nodes_path: str, latency_ms: float = 0.0, error_rate: float = 0.0,
+                 update_interval_sec: float = 10.0, seed: int = 0):
+        self.base_url = base_url
+        self.latency_sec = latency_ms / 1000
+        self.error_rate = error_rate
+        self.update_interval_sec = update_interval_sec
+        self.random = random.Random(seed)
+        self.points = load_fixture("nws_points.json")
+        self.forecast = load_fixture("nws_forecast.json")
+        self.node_ids = pd.read_csv(nodes_path, usecols=["Node/Unit ID"])["Node/Unit ID"].astype(str).tolist()
+        self.lmp_template = load_fixture("isone_fiveminutelmp_current_all.json")["FiveMinLmps"]["FiveMinLmp"][-1]
+        # Serialized once per update window, every grid cell gets the same body
+        self._forecast_epoch = None
+        self._forecast_body = None
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._upstream_conditions])
+        app.router.add_get("/points/{coords}", self.handle_points)
+        app.router.add_get("/gridpoints/{office}/{cell}/forecast", self.handle_forecast)
+        app.router.add_get("/api/v1.1/fiveminutelmp/current/all", self.handle_five_minute_lmp)
+        return app
+
+    @web.middleware
+    async def _upstream_conditions(self, request, handler):
+        if self.latency_sec:
+            await asyncio.sleep(self.random.uniform(0.5, 1.5) * self.latency_sec)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.json_response({"status": 503, "title": "Service Unavailable"}, status=503)
+        return await handler(request)
+
+    async def handle_points(self, request: web.Request) -> web.Response:
+        lat, lon = (float(value) for value in request.match_info["coords"].split(","))
+        grid_x = int((lon + 180) / GRID_CELL_DEGREES)
+        grid_y = int((lat + 90) / GRID_CELL_DEGREES)
+        office = self.points["gridId"]
+        cell_url = f"{self.base_url}/gridpoints/{office}/{grid_x},{grid_y}"
+        return web.json_response({
+            **self.points,
+            "@id": f"{self.base_url}/points/{lat},{lon}",
+            "gridX": grid_x,
+            "gridY": grid_y,
+            "forecast": f"{cell_url}/forecast",
+            "forecastHourly": f"{cell_url}/forecast/hourly",
+            "forecastGridData": cell_url,
+        })
+
+    async def handle_forecast(self, request: web.Request) -> web.Response:
+        epoch = int(time.time() // self.update_interval_sec)
+        if epoch != self._forecast_epoch:
+            update_time = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(epoch * self.update_interval_sec))
+            self._forecast_body = json.dumps({**self.forecast, "updateTime": update_time, "generatedAt": update_time})
+            self._forecast_epoch = epoch
+        return web.Response(text=self._forecast_body, content_type="application/ld+json")
+
+    async def handle_five_minute_lmp(self, request: web.Request) -> web.Response:
+        interval = int(time.time() // 300) * 300
+        begin_date = time.strftime("%Y-%m-%dT%H:%M:%S.000+00:00", time.gmtime(interval))
+        lmps = []
+        for node_id in self.node_ids:
+            energy = self.lmp_template["EnergyComponent"]
+            loss = round(self.random.uniform(-1, 1), 2)
+            congestion = round(self.random.choice((0.0, 0.0, 0.0, self.random.uniform(0, 5))), 2)
+            lmps.append({
+                **self.lmp_template,
+                "BeginDate": begin_date,
+                "Location": {"$": node_id, "@LocId": node_id, "@LocType": "NETWORK NODE"},
+                "LmpTotal": round(energy + loss + congestion, 2),
+                "CongestionComponent": congestion,
+                "LossComponent": loss,
+            })
+        return web.json_response({"FiveMinLmps": {"FiveMinLmp": lmps}})
+
+
+class StubServerProcess(mp.Process):
+    """Runs StubUpstream in its own process so it doesn't compete with the harness for the GIL."""
+
+    def __init__(self, port: int, nodes_path: str, latency_ms: float, error_rate: float,
+                 update_interval_sec: float):
+        super().__init__(daemon=True)
+        self.port = port
+        self.nodes_path = nodes_path
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.update_interval_sec = update_interval_sec
+        self.ready = mp.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def run(self):
+        stub = StubUpstream(self.base_url, self.nodes_path, self.latency_ms, self.error_rate,
+                            self.update_interval_sec)
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(stub.app(), access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", self.port, backlog=4096).start())
+        self.ready.set()
+        loop.run_forever()